@@ -1,3 +1,17 @@
+import codecs
+import re
+from array import array
+from bisect import bisect_right
+
+from sly import Lexer
+from sly.lex import Token
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+
 class UCLexer(Lexer):
     """A lexer for the uC language."""
 
@@ -64,6 +78,14 @@ class UCLexer(Lexer):
     # String containing ignored characters (between tokens)
     ignore = ' \t'
 
+    # Streaming input (file objects and mmap) is read in chunks of this
+    # many characters, bytes are decoded with _encoding
+    chunk_size = 1 << 20
+    _encoding = 'utf-8'
+    # Tokens starting with these characters may extend up to the next
+    # line (strings, chars and // comments), see _tokenize_stream
+    _line_bounded = '"\'/'
+
     # Other ignored patterns
     ignore_newline = r'\n+'
     ignore_comment = r'(\/\*)[\s\S]*?(\*\/)|(\/\/).*\n'
@@ -105,16 +127,142 @@ class UCLexer(Lexer):
       t.type = self.keywords.get(t.value, "ID")
       return t
 
-    # Define a rule so we can track line numbers
+    # Define a rule so we can track line numbers, and the line starts
+    # used by find_tok_column
     def ignore_newline(self, t):
       self.lineno += len(t.value)
+      if len(t.value) == 1:
+        self._line_starts.append(t.index + 1)
+      else:
+        self._line_starts.extend(range(t.index + 1, t.index + len(t.value) + 1))
  
     def ignore_comment(self, t):
-      self.lineno += t.value.count("\n")
+      newlines = t.value.count("\n")
+      if newlines:
+        self.lineno += newlines
+        self._line_starts.extend(t.index + m.end() for m in re.finditer('\n', t.value))
+
+    def tokenize(self, text, lineno=1, index=0):
+        """Tokenize text, building the index of line start offsets
+        used by find_tok_column as the newlines are consumed. Text may
+        also be a file object or an mmap, which is then read in chunks.
+        """
+        if not isinstance(text, str):
+            return self._tokenize_stream(text, lineno, index, {}, self._master_re)
+        self._line_starts = self._first_line_starts(text, index)
+        return super().tokenize(text, lineno, index)
+
+    @staticmethod
+    def _first_line_starts(text, index):
+        """The line starts before the newline rules run from index: 0 and
+        the start of the line of index, the only one find_tok_column needs
+        for the tokens after it."""
+        last_cr = text.rfind('\n', 0, index)
+        return [0, last_cr + 1] if last_cr >= 0 else [0]
+
+    def _tokenize_stream(self, f, lineno, index, dispatch, default):
+        """Tokenize the contents of f keeping only a window of the input
+        in memory. A match is accepted once the window holds at least one
+        character after it, two newlines after line-bounded tokens and the
+        end of an open block comment, so the tokens are the same as the
+        ones of the whole text. Memory is proportional to the chunk size
+        plus the longest token, and the line index keeps 8 bytes per line.
+        """
+        data = f.read(0)
+        decode = codecs.getincrementaldecoder(self._encoding)().decode if isinstance(data, bytes) else None
+        self._line_starts = array('q', [0])
+        ignore = self.ignore
+        ignored_tokens = self._ignored_tokens
+        token_funcs = self._token_funcs
+        line_bounded = self._line_bounded
+        buf = ''        # window of the input
+        n = 0           # len(buf)
+        base = index    # offset of buf[0] in the input
+        i = 0           # current position in buf
+        safe = -1       # last position of buf followed by two newlines
+        eof = False
+        try:
+            while True:
+                if i >= n:
+                    if eof:
+                        return
+                    want = True
+                else:
+                    c = buf[i]
+                    if c in ignore:
+                        i += 1
+                        continue
+
+                    master = dispatch.get(c, default)
+                    m = master.match(buf, i) if master is not None else None
+                    want = (m.end() >= n if m else i + 2 >= n) or c in line_bounded and (
+                        i > safe or c == '/' and buf.startswith('/*', i) and buf.find('*/', i + 2) < 0)
+                    want = want and not eof
+
+                if want:
+                    # Drop the consumed text and read at least as much
+                    # as is left, so long tokens are read in O(n)
+                    data = f.read(max(self.chunk_size, len(buf) - i))
+                    eof = not data
+                    if decode is not None:
+                        data = decode(data, eof)
+                    base += i
+                    buf = buf[i:] + data
+                    n = len(buf)
+                    i = 0
+                    self.text = buf
+                    last_cr = buf.rfind('\n')
+                    safe = buf.rfind('\n', 0, last_cr) if last_cr > 0 else -1
+                    continue
+
+                tok = Token()
+                tok.lineno = lineno
+                tok.index = base + i
+                if m:
+                    i = m.end()
+                    tok.end = base + i
+                    tok.value = m.group()
+                    tok.type = m.lastgroup
+
+                    if tok.type in token_funcs:
+                        self.index = base + i
+                        self.lineno = lineno
+                        tok = token_funcs[tok.type](self, tok)
+                        i = self.index - base
+                        lineno = self.lineno
+                        if not tok:
+                            continue
+
+                    if tok.type in ignored_tokens:
+                        continue
+
+                    yield tok
+
+                else:
+                    # A lexing error
+                    self.index = base + i
+                    self.lineno = lineno
+                    tok.type = 'ERROR'
+                    tok.value = buf[i:]
+                    tok = self.error(tok)
+                    if tok is not None:
+                        tok.end = self.index
+                        yield tok
+
+                    i = self.index - base
+                    lineno = self.lineno
+        finally:
+            self.text = buf
+            self.index = base + i
+            self.lineno = lineno
 
     def find_tok_column(self, token):
         """Find the column of the token in its line."""
-        last_cr = self.text.rfind('\n', 0, token.index)
+        starts = self._line_starts
+        # a token just lexed is on the last line started
+        last_cr = starts[-1] - 1
+        if last_cr >= token.index:
+            last_cr = starts[bisect_right(starts, token.index) - 1] - 1
         if last_cr < 0: last_cr = 0
         return token.index - last_cr + 1
 
@@ -127,6 +275,8 @@ class UCLexer(Lexer):
     def _make_tok_location(self, token):
         return token.lineno, self.find_tok_column(token)
 
+    _make_location = _make_tok_location
+
     # Error handling rule
     def error(self, t):
         msg = "Illegal character %s" % repr(t.value[0])
@@ -143,6 +293,96 @@ class UCLexer(Lexer):
         msg = "Unterminated character const"
         self._error(msg, t)    
 
+    def tokenize_packed(self, text, lineno=1, index=0):
+        """Tokenize text (or a file object) into a PackedTokens stream.
+        The tokens of a str are packed by the lexer loop itself, see
+        _tokenize_packed; a stream is tokenized and then packed."""
+        if isinstance(text, str):
+            return self._tokenize_packed(text, lineno, index, {}, self._master_re)
+        packed = PackedTokens(self.tokens)
+        append = packed.append
+        for tok in self.tokenize(text, lineno, index):
+            append(tok)
+        # the line index of a stream is an array('q')
+        packed.line_starts.fromlist(self._line_starts.tolist())
+        return packed
+
+    def _tokenize_packed(self, text, lineno, index, dispatch, default):
+        """Lexer loop that appends each match to the arrays of a
+        PackedTokens. A Token object is only built for the rules with a
+        function (ID, newlines and comments) and for errors."""
+        packed = PackedTokens(self.tokens)
+        packed.line_starts.extend(self._first_line_starts(text, index))
+        self._line_starts = packed.line_starts
+        types, linenos, indexes, values = packed.types, packed.linenos, packed.indexes, packed.values
+        strings, string_codes, type_codes = packed.strings, packed._string_codes, packed._type_codes
+        ignore = self.ignore
+        ignored_tokens = self._ignored_tokens
+        token_funcs = self._token_funcs
+        n = len(text)
+        self.text = text
+        try:
+            while index < n:
+                c = text[index]
+                if c in ignore:
+                    index += 1
+                    continue
+
+                start = index
+                line = lineno
+                master = dispatch.get(c, default)
+                m = master.match(text, index) if master is not None else None
+                if m:
+                    index = m.end()
+                    value = m.group()
+                    type = m.lastgroup
+                    if type in token_funcs:
+                        tok = Token()
+                        tok.lineno = lineno
+                        tok.index = start
+                        tok.end = index
+                        tok.value = value
+                        tok.type = type
+                        self.index = index
+                        self.lineno = lineno
+                        tok = token_funcs[type](self, tok)
+                        index = self.index
+                        lineno = self.lineno
+                        if not tok:
+                            continue
+                        type, value = tok.type, tok.value
+                    if type in ignored_tokens:
+                        continue
+                else:
+                    # A lexing error, UCLexer has no literals
+                    tok = Token()
+                    tok.lineno = lineno
+                    tok.index = index
+                    tok.type = 'ERROR'
+                    tok.value = text[index:]
+                    self.index = index
+                    self.lineno = lineno
+                    tok = self.error(tok)
+                    index = self.index
+                    lineno = self.lineno
+                    if tok is None:
+                        continue
+                    type, value = tok.type, tok.value
+
+                code = string_codes.get(value)
+                if code is None:
+                    code = string_codes[value] = len(strings)
+                    strings.append(value)
+                types.append(type_codes[type])
+                linenos.append(line)
+                indexes.append(start)
+                values.append(code)
+        finally:
+            self.text = text
+            self.index = index
+            self.lineno = lineno
+        return packed
+
     # Scanner (used only for test)
     def scan(self, text):
         output = ""
@@ -150,3 +390,245 @@ class UCLexer(Lexer):
             print(tok)
             output += str(tok) + "\n"
         return output
+
+
+def _first_chars(pattern):
+    """Return the set of characters a match of the regular expression
+    pattern can start with, or None when it can not be determined.
+    """
+    def first(items):
+        chars = set()
+        for op, av in items:
+            if op is sre_parse.LITERAL:
+                return chars | {chr(av)}, False
+            elif op is sre_parse.IN:
+                for setop, setav in av:
+                    if setop is sre_parse.LITERAL:
+                        chars.add(chr(setav))
+                    elif setop is sre_parse.RANGE:
+                        chars.update(map(chr, range(setav[0], setav[1] + 1)))
+                    else:
+                        return None, False
+                return chars, False
+            elif op is sre_parse.SUBPATTERN:
+                sub, nullable = first(av[-1])
+                if sub is None:
+                    return None, False
+                chars |= sub
+                if not nullable:
+                    return chars, False
+            elif op is sre_parse.BRANCH:
+                nullable = False
+                for branch in av[1]:
+                    sub, branch_nullable = first(branch)
+                    if sub is None:
+                        return None, False
+                    chars |= sub
+                    nullable = nullable or branch_nullable
+                if not nullable:
+                    return chars, False
+            elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+                sub, nullable = first(av[2])
+                if sub is None:
+                    return None, False
+                chars |= sub
+                if av[0] > 0 and not nullable:
+                    return chars, False
+            elif op in (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+                continue  # zero-width, does not consume the first character
+            else:
+                return None, False
+        return chars, True
+
+    try:
+        chars, nullable = first(sre_parse.parse(pattern))
+    except Exception:
+        return None
+    return None if nullable else chars
+
+
+class UCDispatchLexer(UCLexer):
+    """A UCLexer that dispatches on the first character of the token.
+
+    The rules of UCLexer are split, keeping their order, into one master
+    regex per first character, so each match only tries the patterns that
+    can start at that character. Tokens and error calls are the same as
+    the ones produced by UCLexer.
+    """
+
+    tokens = UCLexer.tokens
+
+    _dispatch = None
+
+    @classmethod
+    def _build_dispatch(cls):
+        rules = []
+        for tokname, value in cls._rules:
+            if tokname.startswith('ignore_'):
+                tokname = tokname[7:]
+            pattern = value if isinstance(value, str) else value.pattern
+            rules.append((tokname, '(?P<%s>%s)' % (tokname, pattern), _first_chars(pattern)))
+
+        compiled = {}
+        def master_re(c):
+            parts = tuple(part for _, part, chars in rules if chars is None or c in chars)
+            if parts not in compiled:
+                compiled[parts] = re.compile('|'.join(parts), cls.reflags) if parts else None
+            return compiled[parts]
+
+        cls._dispatch = {chr(c): master_re(chr(c)) for c in range(128)}
+        cls._dispatch_default = master_re(None)
+
+    def tokenize(self, text, lineno=1, index=0):
+        cls = type(self)
+        if cls._dispatch is None:
+            cls._build_dispatch()
+        if not isinstance(text, str):
+            return self._tokenize_stream(text, lineno, index, self._dispatch, self._dispatch_default)
+        self._line_starts = self._first_line_starts(text, index)
+        return self._tokenize(text, lineno, index)
+
+    def tokenize_packed(self, text, lineno=1, index=0):
+        cls = type(self)
+        if cls._dispatch is None:
+            cls._build_dispatch()
+        if isinstance(text, str):
+            return self._tokenize_packed(text, lineno, index, self._dispatch, self._dispatch_default)
+        return super().tokenize_packed(text, lineno, index)
+
+    def _tokenize(self, text, lineno, index):
+        dispatch = self._dispatch
+        default = self._dispatch_default
+        ignore = self.ignore
+        ignored_tokens = self._ignored_tokens
+        token_funcs = self._token_funcs
+        self.text = text
+        try:
+            while True:
+                try:
+                    c = text[index]
+                except IndexError:
+                    return
+                if c in ignore:
+                    index += 1
+                    continue
+
+                tok = Token()
+                tok.lineno = lineno
+                tok.index = index
+                master = dispatch.get(c, default)
+                m = master.match(text, index) if master is not None else None
+                if m:
+                    tok.end = index = m.end()
+                    tok.value = m.group()
+                    tok.type = m.lastgroup
+
+                    if tok.type in token_funcs:
+                        self.index = index
+                        self.lineno = lineno
+                        tok = token_funcs[tok.type](self, tok)
+                        index = self.index
+                        lineno = self.lineno
+                        if not tok:
+                            continue
+
+                    if tok.type in ignored_tokens:
+                        continue
+
+                    yield tok
+
+                else:
+                    # A lexing error, UCLexer has no literals
+                    self.index = index
+                    self.lineno = lineno
+                    tok.type = 'ERROR'
+                    tok.value = text[index:]
+                    tok = self.error(tok)
+                    if tok is not None:
+                        tok.end = self.index
+                        yield tok
+
+                    index = self.index
+                    lineno = self.lineno
+        finally:
+            self.text = text
+            self.index = index
+            self.lineno = lineno
+
+
+class PackedTokens:
+    """A token stream stored in parallel arrays instead of one Token
+    object per token: type codes, lines, offsets and indexes into a table
+    of interned values. It also keeps the line starts of the text, so the
+    parser can resolve columns without the original text.
+
+    Iterating it yields PackedToken views, created one at a time, that
+    UCParser.parse accepts in place of the lexer's Token objects.
+    """
+
+    def __init__(self, type_names):
+        self.type_names = tuple(type_names)
+        self.types = array('H')
+        self.linenos = array('I')
+        self.indexes = array('I')
+        self.values = array('I')
+        self.strings = []
+        self.line_starts = array('I')
+        self._type_codes = {name: code for code, name in enumerate(self.type_names)}
+        self._string_codes = {}
+
+    def append(self, tok):
+        code = self._string_codes.get(tok.value)
+        if code is None:
+            code = self._string_codes[tok.value] = len(self.strings)
+            self.strings.append(tok.value)
+        self.types.append(self._type_codes[tok.type])
+        self.linenos.append(tok.lineno)
+        self.indexes.append(tok.index)
+        self.values.append(code)
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, i):
+        if not -len(self) <= i < len(self):
+            raise IndexError('token index out of range')
+        return PackedToken(self, i % len(self))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield PackedToken(self, i)
+
+
+class PackedToken:
+    """View of the i-th token of a PackedTokens stream, with the same
+    attributes as a sly Token."""
+
+    __slots__ = ('_tokens', '_i')
+
+    def __init__(self, tokens, i):
+        self._tokens = tokens
+        self._i = i
+
+    @property
+    def type(self):
+        return self._tokens.type_names[self._tokens.types[self._i]]
+
+    @property
+    def value(self):
+        return self._tokens.strings[self._tokens.values[self._i]]
+
+    @property
+    def lineno(self):
+        return self._tokens.linenos[self._i]
+
+    @property
+    def index(self):
+        return self._tokens.indexes[self._i]
+
+    @property
+    def end(self):
+        return self.index + len(self.value)
+
+    def __repr__(self):
+        return f'Token(type={self.type!r}, value={self.value!r}, lineno={self.lineno}, index={self.index}, end={self.end})'
@@ -1,9 +1,82 @@
+from uc_parsetab import build_lrtables
+
+# The text of the label of each kind of node of the parse tree, formatted
+# with its value (if any), then the line and column of its first token
+LABEL_FORMATS = {
+    'type': 'type: %s @ %d:%d',
+    'id': 'id: %s @ %d:%d',
+    'array_decl': 'array_decl @ %d:%d',
+    'func_decl': 'func_decl @ %d:%d',
+    'binary_op': 'binary_op: %s @ %d:%d',
+    'unary_op': 'unary_op: %s',
+    'unary_operator': '%s @ %d:%d',
+    'string': 'constant: string, %s @ %d:%d',
+    'int': 'constant: int, %s @ %d:%d',
+    'char': 'constant: char, %s @ %d:%d',
+    'assign': 'assign: = @ %d:%d',
+    'compound': 'compound @ %d:%d',
+    'empty_statement': 'empty_statement @ %d:%d',
+    'if': 'if @ %d:%d',
+    'while': 'while @ %d:%d',
+    'for': 'for @ %d:%d',
+    'break': 'break @ %d:%d',
+    'return': 'return @ %d:%d',
+    'assert': 'assert @ %d:%d',
+    'print': 'print @ %d:%d',
+    'read': 'read @ %d:%d',
+}
+
+
+class Label:
+    """Label of a node of a tree parsed with lazy_labels: its kind, value,
+    line and column, which unpack as a tuple. The column is found and the
+    text formatted only when the label is rendered; str() gives the label
+    the parser makes without lazy_labels. unary_op labels have no line."""
+
+    __slots__ = ('kind', 'value', 'line', 'index', 'line_starts')
+
+    def __init__(self, kind, value, line, index, line_starts):
+        self.kind = kind
+        self.value = value
+        self.line = line
+        self.index = index
+        self.line_starts = line_starts
+
+    @property
+    def column(self):
+        # as UCLexer.find_tok_column
+        if self.line is None:
+            return None
+        starts = self.line_starts
+        last_cr = starts[bisect_right(starts, self.index) - 1] - 1
+        if last_cr < 0: last_cr = 0
+        return self.index - last_cr + 1
+
+    def __iter__(self):
+        return iter((self.kind, self.value, self.line, self.column))
+
+    def __repr__(self):
+        return 'Label(%r, %r, %r, %r)' % tuple(self)
+
+    def __str__(self):
+        text = LABEL_FORMATS[self.kind]
+        if self.line is None:
+            return text % (self.value,)
+        if self.value is None:
+            return text % (self.line, self.column)
+        return text % (self.value, self.line, self.column)
+
+
 class UCParser(Parser):
     """A parser for the uC language."""
 
     # Get the token list from the lexer (required)
     tokens = UCLexer.tokens
 
+    # The dangling else, shifted as in C. sly only warns about a different
+    # number of conflicts
+    expected_shift_reduce = 1
+
     precedence = (
         ('left', 'ID'),       
         ('left', 'INT', 'VOID', 'CHAR', 'ASSERT', 'INT_CONST', 'CHAR_CONST','STRING_LITERAL'), 
@@ -26,19 +99,47 @@ class UCParser(Parser):
         ('left', 'COMMA', 'SEMI')  
     )
 
-    def __init__(self, error_func=lambda msg, x, y: print("Lexical error: %s at %d:%d" % (msg, x, y), file=sys.stdout)):
+    def __init__(self, error_func=lambda msg, x, y: print("Lexical error: %s at %d:%d" % (msg, x, y), file=sys.stdout), lexer_class=UCLexer, lazy_labels=False):
         """Create a new Parser.
         An error function for the lexer.
+        The lexer class, UCLexer or UCDispatchLexer.
+        With lazy_labels the nodes are labeled with Label objects instead
+        of their text, for callers that do not print the whole tree.
         """
-        self.lexer = UCLexer(error_func)
+        self.lexer = lexer_class(error_func)
+        self._label = self._lazy_label if lazy_labels else self._format_label
 
     def parse(self, text, lineno=1, index=0):
+        if isinstance(text, PackedTokens):
+            # columns are resolved with the line starts of the packed text
+            self.lexer._line_starts = text.line_starts
+            return super().parse(iter(text))
         return super().parse(self.lexer.tokenize(text, lineno, index))
 
+    # The LALR tables are loaded from an on-disk cache when the grammar
+    # did not change, see uc_parsetab.py
+    @classmethod
+    def _Parser__build_lrtables(cls):
+        return build_lrtables(cls)
+
     # Internal auxiliary methods
     def _token_coord(self, p):
         return self.lexer._make_location(p)
 
+    def _format_label(self, kind, p, value=None):
+        # the label of a node, at the first token of p if p is given
+        text = LABEL_FORMATS[kind]
+        if p is None:
+            return text % (value,)
+        if value is None:
+            return text % self._token_coord(p)
+        return text % ((value,) + self._token_coord(p))
+
+    def _lazy_label(self, kind, p, value=None):
+        if p is None:
+            return Label(kind, value, None, None, None)
+        return Label(kind, value, p.lineno, p.index, self.lexer._line_starts)
+
     # Error handling rule
     def error(self, p):
         if p:
@@ -81,7 +182,7 @@ class UCParser(Parser):
     # <<< YOUR CODE HERE >>>
     @_('VOID', 'CHAR', 'INT')
     def type_specifier(self, p):
-        return ('type: %s @ %d:%d' % ((p[0],) + self._token_coord(p)))
+        return (self._label('type', p, p[0]))
 
 
     # <declarator> ::= <identifier>
@@ -95,15 +196,15 @@ class UCParser(Parser):
 
     @_('ID')
     def declarator(self, p):
-        return ('var_decl', ('id: %s @ %d:%d' % ((p.ID,)+self._token_coord(p))))
+        return ('var_decl', (self._label('id', p, p.ID)))
 
     @_('declarator LBRACKET [ constant_expression ] RBRACKET')
     def declarator(self, p):
-        return ('array_decl @ %d:%d' % self._token_coord(p), p.declarator, p.constant_expression)
+        return (self._label('array_decl', p), p.declarator, p.constant_expression)
 
     @_('declarator LPAREN [ parameter_list ] RPAREN')
     def declarator(self, p):
-        return ('func_decl @ %d:%d' % self._token_coord(p), p.declarator, p.parameter_list)
+        return (self._label('func_decl', p), p.declarator, p.parameter_list)
     # <constant_expression> ::= <binary_expression>
     # <<< YOUR CODE HERE >>>
     @_('binary_expression')
@@ -143,7 +244,7 @@ class UCParser(Parser):
        'binary_expression AND binary_expression',
        'binary_expression OR binary_expression')
     def binary_expression(self, p):
-        return ('binary_op: %s @ %d:%d' % ((p[1],)+self._token_coord(p)), p.binary_expression0, p.binary_expression1)
+        return (self._label('binary_op', p, p[1]), p.binary_expression0, p.binary_expression1)
 
     # <unary_expression> ::= <postfix_expression>
     #                      | <unary_operator> <unary_expression>
@@ -157,7 +258,7 @@ class UCParser(Parser):
 
     @_('unary_operator unary_expression')
     def unary_expression(self, p):
-        return ('unary_op: %s'% p.unary_operator, p.unary_expression)
+        return (self._label('unary_op', None, p.unary_operator), p.unary_expression)
 
     # <postfix_expression> ::= <primary_expression>
     #                        | <postfix_expression> "[" <expression> "]"
@@ -189,7 +290,7 @@ class UCParser(Parser):
                  #  | expression
     @_('ID')
     def primary_expression(self, p):
-        return ('id: %s @ %d:%d' % ((p.ID,) + self._token_coord(p)))
+        return (self._label('id', p, p.ID))
 
     @_('constant')
     def primary_expression(self, p):
@@ -197,7 +298,7 @@ class UCParser(Parser):
 
     @_('STRING_LITERAL')
     def primary_expression(self, p):
-        return ('constant: string, %s @ %d:%d' % ((p.STRING_LITERAL,) + self._token_coord(p)))
+        return (self._label('string', p, p.STRING_LITERAL))
 
     @_('LPAREN expression RPAREN')
     def primary_expression(self, p):
@@ -208,11 +309,11 @@ class UCParser(Parser):
       
     @_('INT_CONST')
     def constant(self, p):
-        return ('constant: int, %s @ %d:%d' % ((p.INT_CONST,) + self._token_coord(p)))
+        return (self._label('int', p, p.INT_CONST))
 
     @_('CHAR_CONST')
     def constant(self, p):
-        return ('constant: char, %s @ %d:%d' % ((p.CHAR_CONST,) + self._token_coord(p)))
+        return (self._label('char', p, p.CHAR_CONST))
     # <expression> ::= <assignment_expression>
     #                | <expression> "," <assignment_expression>
     # <<< YOUR CODE HERE >>>
@@ -255,7 +356,7 @@ class UCParser(Parser):
 
     @_('unary_expression EQUALS assignment_expression')
     def assignment_expression(self, p):
-        return ('assign: = @ %d:%d' % self._token_coord(p), p.unary_expression, p.assignment_expression)
+        return (self._label('assign', p), p.unary_expression, p.assignment_expression)
 
 
     # <unary_operator> ::= "+"
@@ -264,15 +365,15 @@ class UCParser(Parser):
     # <<< YOUR CODE HERE >>>
     @_('PLUS')
     def unary_operator(self, p):
-        return ('+ @ %d:%d' % self._token_coord(p))
+        return (self._label('unary_operator', p, '+'))
 
     @_('MINUS')
     def unary_operator(self, p):
-        return ('- @ %d:%d' % self._token_coord(p))
+        return (self._label('unary_operator', p, '-'))
 
     @_('NOT')
     def unary_operator(self, p):
-        return ('! @ %d:%d' % self._token_coord(p))
+        return (self._label('unary_operator', p, '!'))
 
 
     # <parameter_list> ::= <parameter_declaration>
@@ -345,7 +446,7 @@ class UCParser(Parser):
     # <<< YOUR CODE HERE >>>
     @_('LBRACE { declaration } { statement } RBRACE')
     def compound_statement(self, p):
-        return ('compound @ %d:%d' % self._token_coord(p), p.declaration, p.statement)
+        return (self._label('compound', p), p.declaration, p.statement)
 
     # <statement> ::= <expression_statement>
     #               | <compound_statement>
@@ -366,54 +467,54 @@ class UCParser(Parser):
         if p.expression is not None:
           return p.expression
         else:
-          return ('empty_statement @ %d:%d' % self._token_coord(p))
+          return (self._label('empty_statement', p))
 
     # <selection_statement> ::= "if" "(" <expression> ")" <statement>
     #                         | "if" "(" <expression> ")" <statement> "else" <statement>
     # <<< YOUR CODE HERE >>>
     @_('IF LPAREN expression RPAREN statement [ ELSE statement ]')
     def selection_statement(self, p):
-        return ('if @ %d:%d' % self._token_coord(p), p.expression, p.statement0, p.statement1)
+        return (self._label('if', p), p.expression, p.statement0, p.statement1)
     # <iteration_statement> ::= "while" "(" <expression> ")" <statement>
     #                         | "for" "(" {<expression>}? ";" {<expression>}? ";" {<expression>}? ")" <statement>
     #                         | "for" "(" <declaration> {<expression>}? ";" {<expression>}? ")" <statement>
     # <<< YOUR CODE HERE >>>
     @_('WHILE LPAREN expression RPAREN statement')
     def iteration_statement(self, p):
-        return ('while @ %d:%d' % self._token_coord(p), p.expression, p.statement)
+        return (self._label('while', p), p.expression, p.statement)
 
     @_('FOR LPAREN [ expression ] SEMI [ expression ] SEMI [ expression ] RPAREN statement')
     def iteration_statement(self, p):
-        return ('for @ %d:%d' % self._token_coord(p), p.expression0, p.expression1, p.expression2, p.statement)
+        return (self._label('for', p), p.expression0, p.expression1, p.expression2, p.statement)
 
     @_('FOR LPAREN declaration [ expression ] SEMI [ expression ] RPAREN statement')
     def iteration_statement(self, p):
-        return ('for @ %d:%d' % self._token_coord(p), ('decl_list', p.declaration), p.expression0, p.expression1, p.statement)
+        return (self._label('for', p), ('decl_list', p.declaration), p.expression0, p.expression1, p.statement)
 
     # <jump_statement> ::= "break" ";"
     #                    | "return" {<expression>}? ";"
     # <<< YOUR CODE HERE >>>
     @_('BREAK SEMI')
     def jump_statement(self, p):
-        return ('break @ %d:%d' % self._token_coord(p))
+        return (self._label('break', p))
 
     @_('RETURN [ expression ] SEMI')
     def jump_statement(self, p):
-        return ('return @ %d:%d' % self._token_coord(p), p.expression)
+        return (self._label('return', p), p.expression)
     # <assert_statement> ::= "assert" <expression> ";"
     # <<< YOUR CODE HERE >>>
     @_('ASSERT expression SEMI')
     def assert_statement(self, p):
-        return ('assert @ %d:%d' % self._token_coord(p), p.expression)
+        return (self._label('assert', p), p.expression)
 
     # <print_statement> ::= "print" "(" {<expression>}? ")" ";"
     # <<< YOUR CODE HERE >>>
     @_('PRINT LPAREN [ expression ] RPAREN SEMI')
     def print_statement(self, p):
-        return ('print @ %d:%d' % self._token_coord(p), p.expression)
+        return (self._label('print', p), p.expression)
 
     # <read_statement> ::= "read" "(" <argument_expression> ")" ";"
     # <<< YOUR CODE HERE >>>
     @_('READ LPAREN argument_expression RPAREN SEMI')
     def read_statement(self, p):
-        return ('read @ %d:%d' % self._token_coord(p), p.argument_expression)
+        return (self._label('read', p), p.argument_expression)
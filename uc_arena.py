@@ -0,0 +1,368 @@
+"""Struct-of-arrays representation of uC ASTs, for programs of millions of
+nodes.
+
+    arena = Arena.from_tree(program)
+    program = arena.root()
+    Visitor(collect=True).check(program)
+    program.show(buf=sys.stdout, showcoord=True)
+
+Node i of an arena is the i-th item of typed arrays: its class (kind),
+the child slot of its parent that holds it (slot), which of its own child
+slots are lists (lists), its first child and next sibling, the line and
+column of its Coord and the id of its uc_type in arena.types. The
+attributes (attr_names and ref_names: operators, names, constants and the
+ID of a declaration) are indices into arena.values, from values_start.
+
+Nodes are read through views: short-lived objects holding the arena and
+the index, whose classes are subclasses of the uc_ast_correto classes with
+the same names. Their slots, coord, children() and attrs read the arrays,
+so the visitors, show and represent_node run on them unchanged. The
+structure of a view is read-only; its attrs can be set, uc_type is stored
+in the type array and the other keys in a dictionary of the arena.
+"""
+from array import array
+from collections.abc import MutableMapping
+
+from uc_ast_correto import Coord, Node, child_names
+
+# encoding of arena.values: >= 0 strings, NONE, and nodes from NODE down
+NONE = -1
+NODE = -2
+
+
+def value_names(cls):
+    """The slots of the node class cls that hold attributes (attr_names and
+    ref_names), in the order of its slots."""
+    return tuple(name for name in cls.__slots__ if name in cls.attr_names or name in cls.ref_names)
+
+
+class _Attrs(MutableMapping):
+    """attrs of a view."""
+
+    __slots__ = ("_arena", "_index")
+
+    def __init__(self, arena, index):
+        self._arena = arena
+        self._index = index
+
+    def __getitem__(self, key):
+        arena = self._arena
+        if key == 'uc_type':
+            type_id = arena.type_id[self._index]
+            if type_id < 0:
+                raise KeyError(key)
+            return arena.types[type_id]
+        return arena.attrs[self._index][key]
+
+    def __setitem__(self, key, value):
+        arena = self._arena
+        if key == 'uc_type':
+            arena.type_id[self._index] = arena.intern_type(value)
+        else:
+            arena.attrs.setdefault(self._index, {})[key] = value
+
+    def __delitem__(self, key):
+        arena = self._arena
+        if key == 'uc_type':
+            if arena.type_id[self._index] < 0:
+                raise KeyError(key)
+            arena.type_id[self._index] = -1
+        else:
+            del arena.attrs[self._index][key]
+
+    def __iter__(self):
+        if self._arena.type_id[self._index] >= 0:
+            yield 'uc_type'
+        yield from self._arena.attrs.get(self._index, ())
+
+    def __len__(self):
+        return (self._arena.type_id[self._index] >= 0) + len(self._arena.attrs.get(self._index, ()))
+
+
+def _child_property(k):
+    # the children of a node are linked in the order of its slots
+    bit = 1 << k
+
+    def get(self):
+        arena = self._arena
+        index = self._index
+        slot = arena.slot
+        next_sibling = arena.next_sibling
+        child = arena.first_child[index]
+        while child >= 0 and slot[child] < k:
+            child = next_sibling[child]
+        classes = arena.classes
+        kind = arena.kind
+        if arena.lists[index] & bit:
+            items = []
+            while child >= 0 and slot[child] == k:
+                items.append(classes[kind[child]](arena, child))
+                child = next_sibling[child]
+            return items
+        if child >= 0 and slot[child] == k:
+            return classes[kind[child]](arena, child)
+        return None
+    return property(get)
+
+
+def _value_property(j):
+    def get(self):
+        arena = self._arena
+        return arena.value(arena.values[arena.values_start[self._index] + j])
+    return property(get)
+
+
+def _view_class(node_class):
+    """The class of the views of the nodes of node_class."""
+    names = child_names(node_class)
+    if len(names) > 16:
+        raise ValueError("%s has too many child slots for an Arena" % node_class.__name__)
+    namespace = {
+        "__slots__": ("_arena", "_index"),
+        "__module__": __name__,
+        "__doc__": "View of a %s in an Arena." % node_class.__name__,
+        "_child_names": names,
+    }
+    for k, name in enumerate(names):
+        namespace[name] = _child_property(k)
+    for j, name in enumerate(value_names(node_class)):
+        namespace[name] = _value_property(j)
+    cls = type(node_class.__name__, (_ViewBase, node_class), namespace)
+    # represent_node lists the slots of the AST class
+    cls.__slots__ = node_class.__slots__
+    return cls
+
+
+class _ViewClasses(dict):
+    # node class -> class of its views, shared by all the arenas
+    def __missing__(self, node_class):
+        view_class = self[node_class] = _view_class(node_class)
+        return view_class
+
+
+class _ViewBase:
+    __slots__ = ()
+
+    def __init__(self, arena, index):
+        self._arena = arena
+        self._index = index
+
+    def __eq__(self, other):
+        return (isinstance(other, _ViewBase) and self._arena is other._arena
+                and self._index == other._index)
+
+    def __hash__(self):
+        return hash((id(self._arena), self._index))
+
+    @property
+    def coord(self):
+        arena = self._arena
+        line = arena.line[self._index]
+        if line < 0:
+            return None
+        column = arena.column[self._index]
+        return Coord(line, None if column < 0 else column)
+
+    @property
+    def attrs(self):
+        return _Attrs(self._arena, self._index)
+
+    @staticmethod
+    def push_children(node, stack):
+        # the children of the view node for the visitors of uc_sema, in one
+        # pass over the siblings instead of one per child slot
+        arena = node._arena
+        classes = arena.classes
+        kind = arena.kind
+        next_sibling = arena.next_sibling
+        start = len(stack)
+        child = arena.first_child[node._index]
+        while child >= 0:
+            stack.append(classes[kind[child]](arena, child))
+            child = next_sibling[child]
+        stack[start:] = reversed(stack[start:])
+
+    def children(self):
+        arena = self._arena
+        slot = arena.slot
+        next_sibling = arena.next_sibling
+        lists = arena.lists[self._index]
+        names = self._child_names
+        nodelist = []
+        child = arena.first_child[self._index]
+        previous = -1
+        while child >= 0:
+            k = slot[child]
+            if lists >> k & 1:
+                position = position + 1 if k == previous else 0
+                nodelist.append(("%s[%d]" % (names[k], position), arena.view(child)))
+            else:
+                nodelist.append((names[k], arena.view(child)))
+            previous = k
+            child = next_sibling[child]
+        return tuple(nodelist)
+
+
+_view_classes = _ViewClasses()
+
+
+class Arena:
+    """The nodes of an AST in typed arrays, see the module documentation."""
+
+    def __init__(self):
+        self.kind = array('B')
+        self.slot = array('B')
+        self.lists = array('H')
+        self.first_child = array('i')
+        self.next_sibling = array('i')
+        self.line = array('i')
+        self.column = array('i')
+        self.type_id = array('i')
+        self.values_start = array('i')
+        self.values = array('i')
+        self.strings = []
+        self.types = []
+        # attrs of the nodes other than uc_type, by index
+        self.attrs = {}
+        self.classes = []
+        self._class_ids = {}
+        self._string_ids = {}
+        self._type_ids = {}
+
+    def __len__(self):
+        return len(self.kind)
+
+    def nbytes(self):
+        """Bytes used by the arrays."""
+        return sum(a.itemsize * len(a) for a in (
+            self.kind, self.slot, self.lists, self.first_child, self.next_sibling,
+            self.line, self.column, self.type_id, self.values_start, self.values))
+
+    def view(self, index):
+        """The view of node index."""
+        return self.classes[self.kind[index]](self, index)
+
+    def root(self):
+        return self.view(0)
+
+    def value(self, code):
+        """The attribute encoded in arena.values as code."""
+        if code >= 0:
+            return self.strings[code]
+        if code == NONE:
+            return None
+        return self.view(NODE - code)
+
+    def intern_type(self, uc_type):
+        """The id of uc_type in arena.types."""
+        type_id = self._type_ids.get(id(uc_type))
+        if type_id is None:
+            type_id = self._type_ids[id(uc_type)] = len(self.types)
+            self.types.append(uc_type)
+        return type_id
+
+    def _string(self, value):
+        code = self._string_ids.get(value)
+        if code is None:
+            code = self._string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        return code
+
+    def _new(self, node):
+        # the index of a new node with no children
+        cls = node.__class__
+        kind = self._class_ids.get(cls)
+        if kind is None:
+            kind = self._class_ids[cls] = len(self.classes)
+            self.classes.append(_view_classes[cls])
+        index = len(self.kind)
+        self.kind.append(kind)
+        self.slot.append(0)
+        self.lists.append(0)
+        self.first_child.append(-1)
+        self.next_sibling.append(-1)
+        coord = node.coord
+        if coord is None:
+            self.line.append(-1)
+            self.column.append(-1)
+        else:
+            self.line.append(coord.line)
+            self.column.append(-1 if coord.column is None else coord.column)
+        self.type_id.append(-1)
+        self.values_start.append(0)
+        return index
+
+    @classmethod
+    def from_tree(cls, root):
+        """The Arena of the tree of uc_ast_correto nodes under root (node 0).
+        The attrs of the nodes are not copied."""
+        arena = cls()
+        indices = {}
+        parented = set()
+        pending = []
+
+        def index_of(node):
+            index = indices.get(id(node))
+            if index is None:
+                index = indices[id(node)] = arena._new(node)
+                pending.append(node)
+            return index
+
+        index_of(root)
+        while pending:
+            node = pending.pop()
+            index = indices[id(node)]
+            node_class = node.__class__
+
+            arena.values_start[index] = len(arena.values)
+            for name in value_names(node_class):
+                value = getattr(node, name)
+                if value is None:
+                    arena.values.append(NONE)
+                elif isinstance(value, str):
+                    arena.values.append(arena._string(value))
+                elif isinstance(value, Node):
+                    arena.values.append(NODE - index_of(value))
+                else:
+                    raise TypeError("cannot store %r in an Arena" % (value,))
+
+            previous = -1
+            for k, name in enumerate(child_names(node_class)):
+                value = getattr(node, name)
+                if isinstance(value, list):
+                    arena.lists[index] |= 1 << k
+                    items = value
+                elif value is not None:
+                    items = (value,)
+                else:
+                    continue
+                for child in items:
+                    if id(child) in parented:
+                        raise ValueError("%s is a child of two nodes" % child.__class__.__name__)
+                    parented.add(id(child))
+                    child_index = index_of(child)
+                    arena.slot[child_index] = k
+                    if previous < 0:
+                        arena.first_child[index] = child_index
+                    else:
+                        arena.next_sibling[previous] = child_index
+                    previous = child_index
+        return arena
+
+    def preorder(self, index=0):
+        """The indices of the nodes under node index in pre-order, read from
+        the arrays without views."""
+        first_child = self.first_child
+        next_sibling = self.next_sibling
+        stack = [index]
+        while stack:
+            index = stack.pop()
+            yield index
+            child = first_child[index]
+            if child >= 0:
+                # the siblings are pushed in reverse to pop them in order
+                start = len(stack)
+                while child >= 0:
+                    stack.append(child)
+                    child = next_sibling[child]
+                stack[start:] = reversed(stack[start:])
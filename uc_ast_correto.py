@@ -1,55 +1,145 @@
+import io
 import sys
 
-def represent_node(obj, indent):
-    def _repr(obj, indent, printed_set):
-        """
-        Get the representation of an object, with dedicated pprint-like format for lists.
-        """
+_BLANKS = " " * 4096
+
+def _write_blanks(write, count):
+    # write count spaces without building a string of that length
+    while count > len(_BLANKS):
+        write(_BLANKS)
+        count -= len(_BLANKS)
+    if count:
+        write(_BLANKS[:count])
+
+def write_repr(obj, buf, indent=0):
+    """
+    Write the representation of an object to buf, with dedicated pprint-like format for lists.
+    The text is written piece by piece as the objects are expanded from an
+    explicit stack, so neither the whole text nor a deep recursion is needed.
+    """
+    write = buf.write
+    # avoid infinite recursion with printed_set
+    printed_set = set()
+    # strings to write, ints for a ",\n" separator followed by that many
+    # spaces and (object, indent) pairs still to represent, the next on top
+    stack = [(obj, indent)]
+    while stack:
+        item = stack.pop()
+        if item.__class__ is str:
+            write(item)
+            continue
+        if item.__class__ is int:
+            write(",\n")
+            _write_blanks(write, item)
+            continue
+        obj, indent = item
         if isinstance(obj, list):
             indent += 1
-            sep = ",\n" + (" " * indent)
-            final_sep = ",\n" + (" " * (indent - 1))
-            return (
-                "["
-                + (sep.join((_repr(e, indent, printed_set) for e in obj)))
-                + final_sep
-                + "]"
-            )
+            work = ["["]
+            for e in obj:
+                work += [(e, indent), indent]
+            if obj:
+                work.pop()
+            work += [indent - 1, "]"]
         elif isinstance(obj, Node):
             if obj in printed_set:
-                return ""
-            else:
-                printed_set.add(obj)
-            result = obj.__class__.__name__ + "("
+                continue
+            printed_set.add(obj)
             indent += len(obj.__class__.__name__) + 1
-            attrs = []
+            work = [obj.__class__.__name__ + "("]
             for name in obj.__slots__:
                 if name == "bind":
                     continue
-                value = getattr(obj, name)
-                value_str = _repr(value, indent + len(name) + 1, printed_set)
-                attrs.append(name + "=" + value_str)
-            sep = ",\n" + (" " * indent)
-            final_sep = ",\n" + (" " * (indent - 1))
-            result += sep.join(attrs)
-            result += ")"
-            return result
+                work += [name + "=", (getattr(obj, name), indent + len(name) + 1), indent]
+            if len(work) > 1:
+                work.pop()
+            work.append(")")
         elif isinstance(obj, str):
-            return obj
+            write(obj)
+            continue
         else:
-            return ""
+            continue
+        stack.extend(reversed(work))
 
-    # avoid infinite recursion with printed_set
-    printed_set = set()
-    return _repr(obj, indent, printed_set)
+def represent_node(obj, indent):
+    """
+    Get the representation of an object, with dedicated pprint-like format for lists.
+    """
+    buf = io.StringIO()
+    write_repr(obj, buf, indent)
+    return buf.getvalue()
+
+def child_names(cls):
+    """The slots of the node class cls that hold its children: a Node, a
+    list of Nodes or None, in the order of children()."""
+    return tuple(name for name in cls.__slots__
+                 if name not in cls.attr_names and name not in cls.ref_names)
+
+def iter_preorder(node, name=None):
+    """The nodes of the tree under node in pre-order, as (depth, name, node)
+    triples with the names of children(). The tree is walked with an
+    explicit stack, so its depth is not limited by the recursion limit."""
+    stack = [(0, name, node)]
+    while stack:
+        item = stack.pop()
+        yield item
+        depth = item[0] + 1
+        stack += [(depth, child_name, child) for child_name, child in reversed(item[2].children())]
+
+ENTER = "enter"
+EXIT = "exit"
+
+def iter_events(node, name=None):
+    """The ENTER and EXIT events of the nodes of the tree under node, as
+    (event, depth, name, node): a node is entered, then its children are
+    entered and exited in order, then it is exited."""
+    stack = [(ENTER, 0, name, node)]
+    while stack:
+        item = stack.pop()
+        yield item
+        event, depth, name, node = item
+        if event is ENTER:
+            stack.append((EXIT, depth, name, node))
+            depth += 1
+            stack += [(ENTER, depth, child_name, child) for child_name, child in reversed(node.children())]
+
+def iter_postorder(node, name=None):
+    """The nodes of the tree under node in post-order, as (depth, name,
+    node) triples."""
+    for event, depth, name, node in iter_events(node, name):
+        if event is EXIT:
+            yield depth, name, node
+
+class Coord:
+    """Coordinates of a syntactic element. Consists of:
+    - Line number
+    - (optional) column number, for the Lexer
+    """
+
+    __slots__ = ("line", "column")
+
+    def __init__(self, line, column=None):
+        self.line = line
+        self.column = column
+
+    def __str__(self):
+        if self.line and self.column is not None:
+            coord_str = "@ %s:%s" % (self.line, self.column)
+        elif self.line:
+            coord_str = "@ %s" % (self.line)
+        else:
+            coord_str = ""
+        return coord_str
 
 class Node:
     """Abstract base class for AST nodes."""
 
-    __slots__ = ("coord",)
+    __slots__ = ("coord", "attrs")
 
     def __init__(self, coord=None):
         self.coord = coord
+        # attributes decorated by the semantic analysis (uc_type, symtab, ...)
+        self.attrs = {}
 
     def children(self):
         """A sequence of all children that are Nodes"""
@@ -57,6 +147,9 @@ class Node:
 
     attr_names = ()
 
+    # slots that refer to a node that is a child of another node
+    ref_names = ()
+
     def __repr__(self):
         """Generates a python representation of the current node"""
         return represent_node(self, 0)
@@ -70,7 +163,7 @@ class Node:
         showcoord=False,
         _my_node_name=None,
     ):
-        """Pretty print the Node and all its attributes and children (recursively) to a buffer.
+        """Pretty print the Node and all its attributes and children (in pre-order) to a buffer.
         buf:
             Open IO buffer into which the Node is printed.
         offset:
@@ -82,36 +175,41 @@ class Node:
         showcoord:
             Do you want the coordinates of each Node to be displayed.
         """
-        lead = " " * offset
+        for depth, name, node in iter_preorder(self, _my_node_name):
+            node._show_node(buf, offset + 4 * depth, attrnames, nodenames, showcoord, name)
+
+    def _show_node(self, buf, offset, attrnames, nodenames, showcoord, _my_node_name):
+        """Print the line of the Node alone, see show. The line is written
+        in pieces, its attributes with write_repr."""
+        write = buf.write
+        _write_blanks(write, offset)
         if nodenames and _my_node_name is not None:
-            buf.write(lead + self.__class__.__name__ + " <" + _my_node_name + ">: ")
-            inner_offset = len(self.__class__.__name__ + " <" + _my_node_name + ">: ")
+            head = self.__class__.__name__ + " <" + _my_node_name + ">: "
         else:
-            buf.write(lead + self.__class__.__name__ + ":")
-            inner_offset = len(self.__class__.__name__ + ":")
+            head = self.__class__.__name__ + ":"
+        write(head)
+        inner_offset = offset + len(head) + 1
 
         if self.attr_names:
-            if attrnames:
-                nvlist = [
-                    (n, represent_node(getattr(self, n), offset+inner_offset+1+len(n)+1))
-                    for n in self.attr_names
-                    if getattr(self, n) is not None
-                ]
-                attrstr = ", ".join("%s=%s" % nv for nv in nvlist)
-            else:
-                vlist = [getattr(self, n) for n in self.attr_names]
-                attrstr = ", ".join(
-                    represent_node(v, offset + inner_offset + 1) for v in vlist
-                )
-            buf.write(" " + attrstr)
+            sep = " "
+            for n in self.attr_names:
+                value = getattr(self, n)
+                if attrnames:
+                    if value is None:
+                        continue
+                    write(sep + n + "=")
+                    write_repr(value, buf, inner_offset + len(n) + 1)
+                else:
+                    write(sep)
+                    write_repr(value, buf, inner_offset)
+                sep = ", "
+            if sep == " ":
+                write(sep)
 
         if showcoord:
             if self.coord and self.coord.line != 0:
-                buf.write(" %s" % self.coord)
-        buf.write("\n")
-
-        for (child_name, child) in self.children():
-            child.show(buf, offset + 4, attrnames, nodenames, showcoord, child_name)
+                write(" %s" % self.coord)
+        write("\n")
 
 class ArrayDecl(Node):
 
@@ -589,6 +687,9 @@ class VarDecl(Node):
      # <<< YOUR CODE HERE >>>
     __slots__ = ("declname", "type",)
 
+    # the declname is the ID of the Decl
+    ref_names = ("declname",)
+
     def __init__(self, declname=None, type=None, coord=None):
         super().__init__(coord)
         self.declname = declname
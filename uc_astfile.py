@@ -0,0 +1,283 @@
+"""Binary files of uC ASTs, to keep parsed programs between the stages of
+the compiler without parsing them again.
+
+    dump(program, f)        # write the AST to the binary file object f
+    ast = ASTFile(path)     # map a file written by dump
+    ast.function("main")    # load only the FuncDef of main
+    ast.program()           # load the whole Program
+
+The nodes are written in one pass and loaded from an mmap of the file only
+when they are asked for: loading one global declaration reads the records
+of its own nodes and nothing else. Shared nodes and Coords (a VarDecl and
+its Decl share the ID of the name) are stored once and loaded as the same
+object. The attrs decorated by the semantic analysis are not stored.
+
+Layout, little endian, offsets from the start of the file:
+
+    header    MAGIC, FORMAT_VERSION, then the count and offset of the
+              tables below
+    records   per node: class (u16), coord (i32, -1 for None) and a cell
+              (tag u8, value u32) for each slot of its class. Lists are
+              a count (u32) followed by their cells, before the record
+              that refers to them
+    strings   count + 1 offsets (u32) into the UTF-8 data that follows.
+              Identifiers, constants, operators and class names are
+              stored once and referred to by index
+    classes   per node class: name (string index), number of slots (u32)
+    coords    per Coord: line, column (i32, -1 for None)
+    nodes     the offset (u32) of the record of each node. Node 0 is the
+              root
+    functions per FuncDef: name (string index) and node index (u32)
+"""
+import gc
+import mmap
+import struct
+
+import uc_ast_correto
+from uc_ast_correto import Coord, FuncDef, Node
+
+MAGIC = b"UCAST\0"
+# Bump when the layout changes
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct("<6sH10I")
+CELL = struct.Struct("<BI")
+U32 = struct.Struct("<I")
+PAIR = struct.Struct("<II")
+COORD = struct.Struct("<ii")
+RECORD = struct.Struct("<Hi")
+
+# tags of the cells
+NONE, STR, NODE, LIST = range(4)
+
+
+def dump(program, f):
+    """Write the AST under the node program to the binary file object f.
+    Returns the nodes in the order of their indices in the file."""
+    strings = {}
+    classes = {}
+    coords = {}
+    coord_list = []
+    indices = {id(program): 0}
+    nodes = [program]
+    offsets = []
+    functions = []
+    data = bytearray()
+    base = HEADER.size
+
+    def string(value):
+        index = strings.get(value)
+        if index is None:
+            index = strings[value] = len(strings)
+        return index
+
+    def cell(value):
+        if value is None:
+            return CELL.pack(NONE, 0)
+        if isinstance(value, str):
+            return CELL.pack(STR, string(value))
+        if isinstance(value, Node):
+            index = indices.get(id(value))
+            if index is None:
+                index = indices[id(value)] = len(nodes)
+                nodes.append(value)
+            return CELL.pack(NODE, index)
+        if isinstance(value, list):
+            cells = [cell(item) for item in value]
+            offset = base + len(data)
+            data.extend(U32.pack(len(cells)))
+            data.extend(b"".join(cells))
+            return CELL.pack(LIST, offset)
+        raise TypeError("cannot store %r in an AST file" % (value,))
+
+    # nodes grows as the cells of the records refer to new nodes
+    for index, node in enumerate(nodes):
+        cls = node.__class__
+        class_index = classes.get(cls)
+        if class_index is None:
+            class_index = classes[cls] = len(classes)
+        coord = node.coord
+        if coord is None:
+            coord_index = -1
+        else:
+            coord_index = coords.get(id(coord))
+            if coord_index is None:
+                coord_index = coords[id(coord)] = len(coord_list)
+                coord_list.append(coord)
+        if cls is FuncDef:
+            functions.append((string(node.decl.name.name), index))
+        cells = b"".join([cell(getattr(node, name)) for name in cls.__slots__])
+        offsets.append(base + len(data))
+        data.extend(RECORD.pack(class_index, coord_index))
+        data.extend(cells)
+
+    class_names = [string(cls.__name__) for cls in classes]
+
+    tables = bytearray()
+
+    def table():
+        return base + len(data) + len(tables)
+
+    strings_offset = table()
+    encoded = [value.encode("utf-8") for value in strings]
+    position = strings_offset + U32.size * (len(encoded) + 1)
+    for value in encoded:
+        tables.extend(U32.pack(position))
+        position += len(value)
+    tables.extend(U32.pack(position))
+    tables.extend(b"".join(encoded))
+
+    classes_offset = table()
+    for cls, name in zip(classes, class_names):
+        tables.extend(PAIR.pack(name, len(cls.__slots__)))
+
+    coords_offset = table()
+    for coord in coord_list:
+        tables.extend(COORD.pack(coord.line, -1 if coord.column is None else coord.column))
+
+    nodes_offset = table()
+    tables.extend(b"".join(U32.pack(offset) for offset in offsets))
+
+    functions_offset = table()
+    tables.extend(b"".join(PAIR.pack(name, index) for name, index in functions))
+
+    f.write(HEADER.pack(MAGIC, FORMAT_VERSION,
+                        len(strings), strings_offset, len(classes), classes_offset,
+                        len(coord_list), coords_offset, len(nodes), nodes_offset,
+                        len(functions), functions_offset))
+    f.write(data)
+    f.write(tables)
+    return nodes
+
+
+class ASTFile:
+    """An AST file written by dump, mapped in memory. The nodes are loaded
+    when they are asked for, and each one only once."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size:
+            raise ValueError("%s: not a uC AST file" % path)
+        (magic, version,
+         self._nstrings, self._strings_offset, nclasses, classes_offset,
+         self._ncoords, self._coords_offset, self._nnodes, self._nodes_offset,
+         nfunctions, functions_offset) = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("%s: not a uC AST file of version %d" % (path, FORMAT_VERSION))
+
+        self._strings = [None] * self._nstrings
+        self._coords = [None] * self._ncoords
+        self._nodes = {}
+        self._functions = None
+        self._functions_table = (nfunctions, functions_offset)
+
+        # class, slots and the layout of the records of each node class
+        self._classes = []
+        for i in range(nclasses):
+            name, nslots = PAIR.unpack_from(self._map, classes_offset + i * PAIR.size)
+            cls = getattr(uc_ast_correto, self._string(name), None)
+            if not (isinstance(cls, type) and issubclass(cls, Node)) or len(cls.__slots__) != nslots:
+                raise ValueError("%s: written by another version of uc_ast_correto" % path)
+            self._classes.append((cls, cls.__slots__, struct.Struct("<Hi" + "BI" * nslots)))
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        """Number of nodes in the file."""
+        return self._nnodes
+
+    def _string(self, index):
+        value = self._strings[index]
+        if value is None:
+            start, end = PAIR.unpack_from(self._map, self._strings_offset + index * U32.size)
+            value = self._strings[index] = self._map[start:end].decode("utf-8")
+        return value
+
+    def _coord(self, index):
+        if index < 0:
+            return None
+        coord = self._coords[index]
+        if coord is None:
+            line, column = COORD.unpack_from(self._map, self._coords_offset + index * COORD.size)
+            coord = self._coords[index] = Coord(line, None if column < 0 else column)
+        return coord
+
+    def _record(self, index):
+        offset, = U32.unpack_from(self._map, self._nodes_offset + index * U32.size)
+        class_index, = struct.unpack_from("<H", self._map, offset)
+        cls, slots, layout = self._classes[class_index]
+        return cls, slots, layout.unpack_from(self._map, offset)
+
+    def node(self, index):
+        """The node of index with the nodes under it."""
+        node = self._nodes.get(index)
+        if node is not None:
+            return node
+
+        pending = []
+
+        def load(tag, value):
+            if tag == NODE:
+                node = self._nodes.get(value)
+                if node is None:
+                    cls, slots, fields = self._record(value)
+                    # the slots are filled from pending, without __init__
+                    node = self._nodes[value] = cls.__new__(cls)
+                    pending.append((node, slots, fields))
+                return node
+            if tag == STR:
+                return self._string(value)
+            if tag == LIST:
+                count, = U32.unpack_from(self._map, value)
+                start = value + U32.size
+                return [load(*cell) for cell in CELL.iter_unpack(self._map[start:start + count * CELL.size])]
+            return None
+
+        # every object made here stays reachable, the collections that
+        # allocating them triggers would only slow the loading down
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            root = load(NODE, index)
+            while pending:
+                node, slots, fields = pending.pop()
+                node.coord = self._coord(fields[1])
+                node.attrs = {}
+                for i, name in enumerate(slots):
+                    setattr(node, name, load(fields[2 + 2 * i], fields[3 + 2 * i]))
+        finally:
+            if enabled:
+                gc.enable()
+        return root
+
+    def program(self):
+        """The root node, with the whole AST."""
+        return self.node(0)
+
+    def nodes(self):
+        """All the nodes, in the order of their indices."""
+        program = self.program()
+        return [program] + [self._nodes[index] for index in range(1, self._nnodes)]
+
+    def functions(self):
+        """Dictionary from the name of each function defined to the index of
+        its FuncDef node."""
+        if self._functions is None:
+            count, offset = self._functions_table
+            self._functions = {}
+            for i in range(count):
+                name, index = PAIR.unpack_from(self._map, offset + i * PAIR.size)
+                self._functions[self._string(name)] = index
+        return self._functions
+
+    def function(self, name):
+        """The FuncDef of the function name, loading only its nodes."""
+        return self.node(self.functions()[name])
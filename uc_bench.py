@@ -0,0 +1,2618 @@
+"""Benchmarks for the uC compiler stages.
+
+Run one benchmark from the command line, for example:
+
+    python uc_bench.py columns --sizes 1 50
+"""
+import argparse
+import contextlib
+import io
+import mmap
+import operator
+import os
+import random
+import re
+import runpy
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+from sly import Parser
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LEXER_FILE = "P1_correto análise léxica.py"
+PARSER_FILE = "P2_atualizado.py"
+
+MB = 1024 * 1024
+
+
+def load_fragment(filename, **init_globals):
+    """Run one of the source files of the repository and return its globals."""
+    if HERE not in sys.path:
+        sys.path.insert(0, HERE)
+    return runpy.run_path(os.path.join(HERE, filename), init_globals)
+
+
+def load_parser(filename=PARSER_FILE):
+    """Load a parser file on top of the lexer, as the notebook cells do."""
+    ns = load_fragment(LEXER_FILE)
+    ns.update(Parser=Parser, sys=sys)
+    return load_fragment(filename, **ns)
+
+
+def generate_source(size, seed=0, one_line=False):
+    """Generate a syntactically valid uC program with about size bytes."""
+    rnd = random.Random(seed)
+    chunks = []
+    total = 0
+    n = 0
+    while total < size:
+        a, b = rnd.randint(0, 999), rnd.randint(1, 99)
+        chunk = (
+            "int f%d (int a, int b) {\n"
+            "  int v[%d];\n"
+            "  int i;\n"
+            "  /* loop */\n"
+            "  for (i = 0; i < %d; i = i + 1) {\n"
+            "    v[i] = a * i + b %% %d;\n"
+            "  }\n"
+            "  if (a <= b && v[0] != %d) print(\"f%d\", a);\n"
+            "  return v[0];\n"
+            "}\n" % (n, b, b, b, a, n)
+        )
+        chunks.append(chunk)
+        total += len(chunk)
+        n += 1
+    text = "".join(chunks)
+    if one_line:
+        # block comments and string literals never contain newlines here
+        text = text.replace("  /* loop */\n", "").replace("\n", " ")
+    return text
+
+
+FUZZ_PIECES = (
+    "int", "char", "while", "x1", "_y", "0", "42", "'a'", "'\\n'", "'ab'", "'",
+    "\"str\"", "\"unterminated", "/* c */", "/* c\n */", "/* open", "// c\n",
+    "+", "-", "*", "/", "%", "<", "<=", ">", ">=", "==", "!=", "=", "!", "&&",
+    "||", "|", "&", "(", ")", "[", "]", "{", "}", ",", ";", "@", "$", "\\",
+    " ", " ", "\t", "\n", "\n",
+)
+
+
+def fuzz_source(rnd, npieces):
+    """Generate npieces random lexical fragments, valid or not."""
+    return "".join(rnd.choice(FUZZ_PIECES) for _ in range(npieces))
+
+
+class _GenScope:
+    # the variables visible in a block of a generated program. Arrays are
+    # (name, kind, sizes), counters the (name, bound) of the enclosing loops
+    def __init__(self, level, parent=None):
+        self.level = level
+        self.parent = parent
+        if parent is None:
+            self.ints, self.chars, self.arrays, self.counters = [], [], [], []
+            # declarations of the loop counters, at the top of the function
+            self.prelude = []
+        else:
+            self.ints = list(parent.ints)
+            self.chars = list(parent.chars)
+            self.arrays = list(parent.arrays)
+            self.counters = list(parent.counters)
+            self.prelude = parent.prelude
+
+    def nested(self):
+        return _GenScope(self.level, self)
+
+    def assignable(self):
+        counters = {counter for counter, _ in self.counters}
+        return [name for name in self.ints if name not in counters]
+
+
+class ProgramGenerator:
+    """Seeded generator of valid uC programs that use every construct of
+    the grammar: global and local declarations of ints, chars and arrays
+    with initializers, prototypes, functions with array parameters, nested
+    for and while loops, if/else, break, return, assert, print, read,
+    comma expressions and all the operators. Not generated are the
+    declarations between the declarator of a function and its body and
+    empty initializer lists, which the semantic analysis does not check.
+
+    The programs pass the semantic analysis and run to the end: locals are
+    initialized, loop counters are only changed by their loop, arrays are
+    indexed by constants or by counters bounded by their size, divisions
+    are by positive constants, the values stored stay small and functions
+    only call the functions of lower levels, and only the lowest level in
+    loops."""
+
+    LEVELS = 3
+
+    def __init__(self, seed=0):
+        self.rnd = random.Random(seed)
+        self.globals = _GenScope(0)
+        # (name, level, parameter kinds, return kind)
+        self.functions = []
+        self.count = 0
+
+    def name(self, prefix):
+        self.count += 1
+        return "%s%d" % (prefix, self.count)
+
+    # expressions
+
+    def int_expr(self, scope, depth=2):
+        rnd = self.rnd
+        choice = rnd.randrange(10 if depth > 0 else 4)
+        if choice == 0 or not scope.ints:
+            return str(rnd.randint(0, 99))
+        if choice in (1, 2):
+            return rnd.choice(scope.ints)
+        if choice == 3:
+            return self.element(scope, "int") or str(rnd.randint(0, 9))
+        if choice == 4:
+            return "%s + %s" % (self.int_expr(scope, depth - 1), self.int_term(scope, depth - 1))
+        if choice == 5:
+            return "%s * %d" % (self.int_term(scope, depth - 1), rnd.randint(0, 9))
+        if choice == 6:
+            return "%s %s %d" % (self.int_term(scope, depth - 1), rnd.choice("/%"), rnd.randint(1, 9))
+        if choice == 7:
+            return "%s - %s" % (self.int_term(scope, depth - 1), self.int_term(scope, depth - 1))
+        if choice == 8:
+            return "%s%s" % (rnd.choice("-+"), self.int_term(scope, depth - 1))
+        return self.call(scope, "int") or "(%s)" % self.int_expr(scope, depth - 1)
+
+    def int_term(self, scope, depth):
+        # an int expression that binds tighter than the binary operators
+        expr = self.int_expr(scope, depth)
+        return expr if re.fullmatch(r"[\w\[\]]+", expr) else "(%s)" % expr
+
+    def stored_expr(self, scope):
+        # an int expression to store, kept small
+        return "(%s + 100) %% %d" % (self.int_term(scope, 2), self.rnd.choice((97, 100, 1000)))
+
+    def char_expr(self, scope):
+        rnd = self.rnd
+        choice = rnd.randrange(3)
+        if choice == 1 and scope.chars:
+            return rnd.choice(scope.chars)
+        if choice == 2 and self.element(scope, "char"):
+            return self.element(scope, "char")
+        return "'%s'" % rnd.choice("abcxyz")
+
+    def bool_expr(self, scope, depth=2):
+        rnd = self.rnd
+        choice = rnd.randrange(6 if depth > 0 else 2)
+        if choice == 0:
+            return "%s %s %s" % (self.int_term(scope, 1), rnd.choice(("<", "<=", ">", ">=", "==", "!=")),
+                                 self.int_term(scope, 1))
+        if choice == 1:
+            return "%s %s %s" % (self.char_expr(scope), rnd.choice(("==", "!=")), self.char_expr(scope))
+        if choice in (2, 3):
+            return "(%s) %s (%s)" % (self.bool_expr(scope, depth - 1), rnd.choice(("&&", "||")),
+                                     self.bool_expr(scope, depth - 1))
+        if choice == 4:
+            return "!(%s)" % self.bool_expr(scope, depth - 1)
+        return "(%s)" % self.bool_expr(scope, depth - 1)
+
+    def element(self, scope, kind):
+        """An element of an array of kind in scope, or None."""
+        arrays = [array for array in scope.arrays if array[1] == kind]
+        if not arrays:
+            return None
+        name, _, sizes = self.rnd.choice(arrays)
+        return name + "".join("[%s]" % self.index(scope, size) for size in sizes)
+
+    def index(self, scope, size):
+        # a constant or the counter of a loop bounded by size
+        counters = [counter for counter, bound in scope.counters if bound <= size]
+        if counters and self.rnd.random() < 0.6:
+            return self.rnd.choice(counters)
+        return str(self.rnd.randrange(size))
+
+    def call(self, scope, kind):
+        """A call of a function returning kind that can be called from
+        scope, or None."""
+        level = min(scope.level, 1) if scope.counters else scope.level
+        vectors = {kind: [name for name, array_kind, sizes in scope.arrays
+                          if array_kind == kind and len(sizes) == 1]
+                   for kind in ("int", "char")}
+        functions = [function for function in self.functions
+                     if function[1] < level and function[3] == kind
+                     and all(vectors[param[:-2]] for param in function[2] if param.endswith("[]"))]
+        if not functions:
+            return None
+        name, _, params, _ = self.rnd.choice(functions)
+        args = []
+        for param in params:
+            if param == "int":
+                args.append(self.int_expr(scope, 1))
+            elif param == "char":
+                args.append(self.char_expr(scope))
+            else:
+                args.append(self.rnd.choice(vectors[param[:-2]]))
+        return "%s(%s)" % (name, ", ".join(args))
+
+    # declarations
+
+    def initializer(self, kind, sizes):
+        rnd = self.rnd
+        if len(sizes) > 1:
+            return "{%s}" % ", ".join(self.initializer(kind, sizes[1:]) for _ in range(sizes[0]))
+        items = [str(rnd.randint(0, 99)) if kind == "int" else "'%s'" % rnd.choice("abcdef")
+                 for _ in range(sizes[0])]
+        return "{%s}" % ", ".join(items)
+
+    def declaration(self, scope, indent):
+        """A declaration added to scope. The globals are initialized with
+        constants, or not at all, the locals always."""
+        rnd = self.rnd
+        local = scope.parent is not None
+
+        def value(kind):
+            if kind == "char":
+                return self.char_expr(scope) if local else "'g'"
+            return self.int_expr(scope, 1) if local else str(rnd.randint(0, 99))
+
+        choice = rnd.randrange(7)
+        if choice == 0:
+            names = [self.name("x") for _ in range(rnd.randint(1, 3))]
+            decls = ["%s = %s" % (name, value("int")) if local or rnd.random() < 0.5 else name
+                     for name in names]
+            scope.ints.extend(names)
+            return "%sint %s;\n" % (indent, ", ".join(decls))
+        if choice == 1:
+            # a parenthesized declarator
+            name = self.name("x")
+            decl = "%sint (%s) = %s;\n" % (indent, name, value("int"))
+            scope.ints.append(name)
+            return decl
+        if choice == 2:
+            name = self.name("c")
+            decl = "%schar %s = %s;\n" % (indent, name, value("char"))
+            scope.chars.append(name)
+            return decl
+        if choice == 3:
+            name, size = self.name("s"), rnd.randint(1, 8)
+            text = "".join(rnd.choice("abcdefgh ") for _ in range(size))
+            scope.arrays.append((name, "char", (size,)))
+            return '%schar %s[%s] = "%s";\n' % (indent, name, size if rnd.random() < 0.5 else "", text)
+        if choice == 4:
+            name, sizes = self.name("m"), (rnd.randint(1, 4), rnd.randint(1, 4))
+            scope.arrays.append((name, "int", sizes))
+            return "%sint %s[%d][%d] = %s;\n" % (indent, name, sizes[0], sizes[1],
+                                                 self.initializer("int", sizes))
+        name, size = self.name("v"), rnd.randint(1, 8)
+        kind = "int" if choice == 5 else "char"
+        scope.arrays.append((name, kind, (size,)))
+        if not local and rnd.random() < 0.5:
+            return "%s%s %s[%d];\n" % (indent, kind, name, size)
+        return "%s%s %s[%s] = %s;\n" % (indent, kind, name, size if rnd.random() < 0.5 else "",
+                                        self.initializer(kind, (size,)))
+
+    # statements
+
+    def assignment(self, scope):
+        rnd = self.rnd
+        choice = rnd.randrange(4)
+        if choice == 0 and self.element(scope, "int"):
+            return "%s = %s" % (self.element(scope, "int"), self.stored_expr(scope))
+        if choice == 1 and scope.chars:
+            return "%s = %s" % (rnd.choice(scope.chars), self.char_expr(scope))
+        if choice == 2 and self.element(scope, "char"):
+            return "%s = %s" % (self.element(scope, "char"), self.char_expr(scope))
+        assignable = scope.assignable()
+        if assignable:
+            return "%s = %s" % (rnd.choice(assignable), self.stored_expr(scope))
+        return None
+
+    def statement(self, scope, indent, depth, single=False):
+        """A statement ending in a newline. A single one is a statement of
+        the grammar, not a list of them."""
+        rnd = self.rnd
+        choice = rnd.randrange(13 if depth > 0 else 7)
+        if choice <= 1:
+            assignments = [self.assignment(scope) for _ in range(rnd.choice((1, 1, 1, 2, 4)))]
+            assignments = [assignment for assignment in assignments if assignment]
+            return "%s%s;\n" % (indent, ", ".join(assignments))
+        if choice == 2:
+            args = [self.int_expr(scope, 1)]
+            if rnd.random() < 0.5:
+                args.insert(0, '"%s: "' % self.name("p"))
+            if scope.chars and rnd.random() < 0.3:
+                args.append(rnd.choice(scope.chars))
+                if rnd.random() < 0.5:
+                    args.append(self.char_expr(scope))
+            return "%sprint(%s);\n" % (indent, ", ".join(args) if rnd.random() < 0.95 else "")
+        if choice == 3:
+            counters = [counter for counter, _ in scope.counters]
+            return "%sassert %s;\n" % (indent, "%s >= 0" % rnd.choice(counters) if counters else "1 == 1")
+        if choice == 4:
+            call = self.call(scope, "int") or self.call(scope, "void")
+            return "%s%s;\n" % (indent, call or "")
+        if choice == 5 and scope.counters:
+            return "%sif (%s) break;\n" % (indent, self.bool_expr(scope, 1))
+        if choice <= 6:
+            return "%s%s;\n" % (indent, self.assignment(scope) or "")
+        if choice <= 8:
+            text = "%sif (%s) %s" % (indent, self.bool_expr(scope), self.block(scope, indent, depth - 1))
+            if rnd.random() < 0.5:
+                text = "%s else %s" % (text[:-1], self.block(scope, indent, depth - 1))
+            return text
+        if choice <= 10 and len(scope.counters) < 2:
+            return self.loop(scope, indent, depth - 1, single)
+        if choice == 11:
+            return "%s{\n%s%s}\n" % (indent, self.body(scope.nested(), indent + "  ", depth - 1), indent)
+        return "%s%s;\n" % (indent, self.assignment(scope) or "")
+
+    def loop(self, scope, indent, depth, single=False):
+        rnd = self.rnd
+        counter, bound = self.name("i"), rnd.randint(1, 6)
+        inner = scope.nested()
+        inner.counters.append((counter, bound))
+        inner.ints.append(counter)
+        step = "%s = %s + 1" % (counter, counter)
+        inner_indent = indent + "  "
+        test = "%sif (%s >= %d) break;\n" % (inner_indent, counter, bound)
+        increment = "%s%s;\n" % (inner_indent, step)
+        # the loops that set their counter before them are not single
+        choice = rnd.randrange(4 if single else 6)
+        if choice == 0:
+            return "%sfor (int %s = 0; %s < %d; %s) %s" % (
+                indent, counter, counter, bound, step, self.block(inner, indent, depth))
+        if choice == 1:
+            return "%sfor (int %s = 0; ; %s) {\n%s%s}\n" % (
+                indent, counter, step, self.body(inner, inner_indent, depth, first=test), indent)
+        if choice == 2:
+            return "%sfor (int %s = 0; %s < %d;) {\n%s%s}\n" % (
+                indent, counter, counter, bound, self.body(inner, inner_indent, depth, last=increment), indent)
+        scope.prelude.append(counter)
+        if choice == 3:
+            return "%sfor (%s = 0; %s < %d; %s) %s" % (
+                indent, counter, counter, bound, step, self.block(inner, indent, depth))
+        start = "%s%s = 0;\n" % (indent, counter)
+        if choice == 4:
+            return "%s%sfor (;;) {\n%s%s}\n" % (
+                start, indent, self.body(inner, inner_indent, depth, test, increment), indent)
+        return "%s%swhile (%s < %d) {\n%s%s}\n" % (
+            start, indent, counter, bound, self.body(inner, inner_indent, depth, last=increment), indent)
+
+    def block(self, scope, indent, depth):
+        """The statement of an if or a loop at indent: a single statement or
+        a compound one, ending in a newline."""
+        if self.rnd.random() < 0.3:
+            return self.statement(scope, indent, depth, single=True).lstrip()
+        return "{\n%s%s}\n" % (self.body(scope.nested(), indent + "  ", depth), indent)
+
+    def body(self, scope, indent, depth, first="", last=""):
+        # the declarations and the statements of a compound statement,
+        # between the statements first and last
+        rnd = self.rnd
+        decls = [self.declaration(scope, indent) for _ in range(rnd.randint(0, 2))]
+        statements = [self.statement(scope, indent, depth) for _ in range(rnd.choice((0, 1, 2, 2, 3, 4)))]
+        return "".join(decls + [first] + statements + [last])
+
+    # functions
+
+    def function(self, level):
+        rnd = self.rnd
+        name = self.name("f")
+        kind = "void" if rnd.random() < 0.2 else "int"
+        scope = self.globals.nested()
+        scope.level = level
+        scope.prelude = []
+        params = []
+        for _ in range(rnd.choice((0, 1, 1, 2, 2, 3, 4))):
+            param, pname = rnd.choice(("int", "int", "char", "int[]", "char[]")), self.name("a")
+            if param == "int":
+                scope.ints.append(pname)
+            elif param == "char":
+                scope.chars.append(pname)
+            else:
+                # the size of an array parameter is unknown, it is indexed at 0
+                scope.arrays.append((pname, param[:-2], (1,)))
+            params.append((param, pname))
+        signature = "%s %s (%s)" % (kind, name, ", ".join(
+            "%s %s[]" % (param[:-2], pname) if param.endswith("[]") else "%s %s" % (param, pname)
+            for param, pname in params))
+        body = self.body(scope, "  ", 3)
+        if scope.prelude:
+            body = "  int %s;\n%s" % (", ".join(scope.prelude), body)
+        if kind == "int":
+            body += "  return %s;\n" % self.int_expr(scope, 1)
+        elif rnd.random() < 0.5:
+            body += "  return;\n"
+        text = "%s {\n%s}\n" % (signature, body)
+        if rnd.random() < 0.2:
+            text = "%s;\n%s" % (signature, text)
+        self.functions.append((name, level, tuple(param for param, _ in params), kind))
+        return text
+
+    def program(self, size):
+        """The text of a program of about size bytes."""
+        rnd = self.rnd
+        chunks = []
+        total = 0
+        functions = 0
+        while total < size or functions < self.LEVELS:
+            if rnd.random() < 0.25:
+                chunk = self.declaration(self.globals, "")
+            else:
+                chunk = self.function(functions % self.LEVELS)
+                functions += 1
+            chunks.append(chunk)
+            total += len(chunk)
+        scope = self.globals.nested()
+        scope.level = self.LEVELS
+        scope.ints.append("r")
+        scope.chars.append("k")
+        main = ["int main () {\n  int r = 0;\n  char k = 'k';\n"]
+        for _ in range(self.LEVELS):
+            call = self.call(scope, "int")
+            if call:
+                main.append('  print("%s = ", %s);\n' % (call.split("(")[0], call))
+        main.append("  read(r);\n  read(k, r);\n  print(r, k);\n  return 0;\n}\n")
+        chunks.append("".join(main))
+        return "".join(chunks)
+
+
+def program_source(size, seed=0):
+    """A valid uC program of about size bytes using every construct of the
+    grammar, see ProgramGenerator."""
+    return ProgramGenerator(seed).program(size)
+
+
+def _timeit(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def bench_columns(sizes, one_line=False):
+    """Tokens/sec of tokenizing plus resolving the column of every token,
+    with the line-start index against the previous rfind lookup."""
+    UCLexer = load_fragment(LEXER_FILE)["UCLexer"]
+
+    class RfindLexer(UCLexer):
+        tokens = UCLexer.tokens
+
+        def find_tok_column(self, token):
+            last_cr = self.text.rfind('\n', 0, token.index)
+            if last_cr < 0: last_cr = 0
+            return token.index - last_cr + 1
+
+    # the previous newline rules, which only count the lines
+    def ignore_newline(self, t):
+        self.lineno += len(t.value)
+
+    def ignore_comment(self, t):
+        self.lineno += t.value.count("\n")
+
+    RfindLexer._token_funcs = dict(UCLexer._token_funcs, newline=ignore_newline, comment=ignore_comment)
+
+    def run(lexer, text):
+        ntoks = 0
+        for tok in lexer.tokenize(text):
+            lexer.find_tok_column(tok)
+            ntoks += 1
+        return ntoks
+
+    for size in sizes:
+        text = generate_source(int(size * MB), one_line=one_line)
+        for name, cls in (("rfind", RfindLexer), ("line index", UCLexer)):
+            elapsed, ntoks = _timeit(run, cls(lambda msg, x, y: None), text)
+            print("%6.1f MB  %-10s  %9d tokens  %7.2f s  %10.0f tokens/s"
+                  % (size, name, ntoks, elapsed, ntoks / elapsed))
+
+
+def _lex(lexer_class, text, chunk_size=None):
+    """Return the tokens and the error calls of lexing text, or of lexing
+    it as a stream read chunk_size characters at a time."""
+    errors = []
+    lexer = lexer_class(lambda msg, x, y: errors.append((msg, x, y)))
+    if chunk_size is not None:
+        lexer.chunk_size = chunk_size
+        text = io.StringIO(text)
+    tokens = [(tok.type, tok.value, tok.lineno, tok.index, lexer.find_tok_column(tok))
+              for tok in lexer.tokenize(text)]
+    return tokens, errors
+
+
+def bench_lexers(sizes, cases=5000, seed=0):
+    """Tokens/sec of UCDispatchLexer against UCLexer, after checking that
+    both produce the same tokens and errors over a fuzzed corpus."""
+    ns = load_fragment(LEXER_FILE)
+    UCLexer, UCDispatchLexer = ns["UCLexer"], ns["UCDispatchLexer"]
+
+    rnd = random.Random(seed)
+    for case in range(cases):
+        text = fuzz_source(rnd, rnd.randint(0, 60))
+        expected, got = _lex(UCLexer, text), _lex(UCDispatchLexer, text)
+        if expected != got:
+            raise AssertionError("lexers differ on %r:\n%r\n%r" % (text, expected, got))
+    print("%d fuzzed inputs lexed identically" % cases)
+
+    for size in sizes:
+        text = generate_source(int(size * MB))
+        for cls in (UCLexer, UCDispatchLexer):
+            lexer = cls(lambda msg, x, y: None)
+            elapsed, ntoks = _timeit(lambda: sum(1 for _ in lexer.tokenize(text)))
+            print("%6.1f MB  %-16s  %9d tokens  %7.2f s  %10.0f tokens/s"
+                  % (size, cls.__name__, ntoks, elapsed, ntoks / elapsed))
+
+
+def bench_stream(size, chunk_size=1 << 20, cases=2000, seed=0):
+    """Peak memory of tokenizing a file read whole, streamed from the file
+    object and streamed from an mmap, after checking that streaming in tiny
+    chunks gives the tokens and errors of the whole text over a fuzzed
+    corpus, so tokens straddle the chunk boundaries."""
+    ns = load_fragment(LEXER_FILE)
+    UCLexer = ns["UCLexer"]
+
+    rnd = random.Random(seed)
+    for case in range(cases):
+        text = fuzz_source(rnd, rnd.randint(0, 60))
+        for cls in (UCLexer, ns["UCDispatchLexer"]):
+            expected = _lex(cls, text)
+            for chunk in (1, 2, 3, 7):
+                got = _lex(cls, text, chunk)
+                if expected != got:
+                    raise AssertionError("%s streamed in chunks of %d differs on %r:\n%r\n%r"
+                                         % (cls.__name__, chunk, text, expected, got))
+    print("%d fuzzed inputs streamed identically in chunks of 1, 2, 3 and 7" % cases)
+
+    with tempfile.NamedTemporaryFile("w", suffix=".uc", delete=False) as f:
+        f.write(generate_source(int(size * MB)))
+    try:
+        def whole(lexer):
+            with open(f.name) as src:
+                return sum(1 for _ in lexer.tokenize(src.read()))
+
+        def stream(lexer):
+            with open(f.name) as src:
+                return sum(1 for _ in lexer.tokenize(src))
+
+        def mapped(lexer):
+            with open(f.name, "rb") as src, mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return sum(1 for _ in lexer.tokenize(mm))
+
+        for name, run in (("f.read()", whole), ("file object", stream), ("mmap", mapped)):
+            lexer = UCLexer(lambda msg, x, y: None)
+            lexer.chunk_size = chunk_size
+            tracemalloc.start()
+            elapsed, ntoks = _timeit(run, lexer)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print("%6.1f MB  %-12s  %9d tokens  %7.2f s  peak %8.1f MB"
+                  % (size, name, ntoks, elapsed, peak / MB))
+    finally:
+        os.unlink(f.name)
+
+
+def _lex_packed(lexer_class, text, chunk_size=None):
+    """Return the tokens and the error calls of packing text, as _lex,
+    with the columns of the line starts of the PackedTokens."""
+    errors = []
+    lexer = lexer_class(lambda msg, x, y: errors.append((msg, x, y)))
+    if chunk_size is not None:
+        lexer.chunk_size = chunk_size
+        text = io.StringIO(text)
+    packed = lexer.tokenize_packed(text)
+    lexer._line_starts = packed.line_starts
+    tokens = [(tok.type, tok.value, tok.lineno, tok.index, lexer.find_tok_column(tok)) for tok in packed]
+    return tokens, errors
+
+
+def bench_packed(ntokens=1000000, cases=2000, seed=0):
+    """Peak memory of keeping a token stream as Token objects against
+    PackedTokens, and parse time of both, after checking that packing
+    gives the tokens and errors of tokenize over a fuzzed corpus, as a
+    str and as a file object read 3 characters at a time."""
+    ns = load_parser()
+    UCLexer, UCParser = ns["UCLexer"], ns["UCParser"]
+
+    rnd = random.Random(seed)
+    for case in range(cases):
+        text = fuzz_source(rnd, rnd.randint(0, 60))
+        for cls in (UCLexer, ns["UCDispatchLexer"]):
+            expected = _lex(cls, text)
+            for chunk_size in (None, 3):
+                got = _lex_packed(cls, text, chunk_size)
+                if expected != got:
+                    raise AssertionError("%s packed differs on %r (chunk size %s):\n%r\n%r"
+                                         % (cls.__name__, text, chunk_size, expected, got))
+    print("%d fuzzed inputs packed identically" % cases)
+
+    sample = generate_source(64 * 1024)
+    density = sum(1 for _ in UCLexer(None).tokenize(sample)) / len(sample)
+    text = generate_source(int(ntokens / density))
+
+    for name, pack in (("Token list", lambda lexer: list(lexer.tokenize(text))),
+                       ("PackedTokens", lambda lexer: lexer.tokenize_packed(text))):
+        lexer = UCLexer(lambda msg, x, y: None)
+        tracemalloc.start()
+        elapsed, tokens = _timeit(pack, lexer)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print("%-12s  %9d tokens  %7.2f s  peak %7.1f MB  kept %7.1f MB"
+              % (name, len(tokens), elapsed, peak / MB, current / MB))
+        del tokens
+
+    parser = UCParser()
+    elapsed, expected = _timeit(parser.parse, text)
+    print("parse text            %7.2f s" % elapsed)
+    packed = parser.lexer.tokenize_packed(text)
+    elapsed, got = _timeit(parser.parse, packed)
+    print("parse PackedTokens    %7.2f s" % elapsed)
+    if got != expected:
+        raise AssertionError("parse trees differ")
+
+
+def bench_startup(runs=5):
+    """Time to create the parser classes in a new interpreter, with an
+    empty (cold) and a filled (warm) LALR table cache."""
+    import subprocess
+
+    code = ("import time, uc_bench\n"
+            "ns = uc_bench.load_fragment(uc_bench.LEXER_FILE)\n"
+            "start = time.perf_counter()\n"
+            "uc_bench.load_fragment(%r, Parser=uc_bench.Parser, sys=uc_bench.sys, **ns)\n"
+            "print(time.perf_counter() - start)\n")
+    cache = tempfile.mkdtemp(prefix="ucc-bench-")
+    env = dict(os.environ, UCC_CACHE_DIR=cache)
+    try:
+        for filename in ("P2_atualizado.py", "P3 correto - UCParse"):
+            times = {"cold": [], "warm": []}
+            for run in range(runs):
+                for name in os.listdir(cache):
+                    os.unlink(os.path.join(cache, name))
+                for state in ("cold", "warm"):
+                    out = subprocess.run([sys.executable, "-c", code % filename], cwd=HERE, env=env,
+                                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+                    times[state].append(float(out.stdout))
+            print("%-22s  cold %7.1f ms  warm %7.1f ms"
+                  % (filename, min(times["cold"]) * 1000, min(times["warm"]) * 1000))
+    finally:
+        for name in os.listdir(cache):
+            os.unlink(os.path.join(cache, name))
+        os.rmdir(cache)
+
+
+def _show(node):
+    if node is None:
+        return None
+    buf = io.StringIO()
+    node.show(buf=buf, showcoord=True)
+    return buf.getvalue()
+
+
+DIGIT = re.compile(r"\d")
+
+
+def _random_edit(rnd, text, kind):
+    """An (offset, removed, inserted) edit of text: a digit changed, a
+    space or a newline inserted after a ";", or a random fuzz piece
+    inserted or deleted."""
+    if kind == "digit":
+        match = DIGIT.search(text, rnd.randrange(len(text))) or DIGIT.search(text)
+        return match.start(), 1, str((int(match.group()) + 1) % 10)
+    if kind in ("space", "newline"):
+        offset = text.find(";", rnd.randrange(len(text)))
+        if offset < 0:
+            offset = text.find(";")
+        return offset + 1, 0, " " if kind == "space" else "\n"
+    offset = rnd.randrange(len(text) + 1)
+    if rnd.random() < 0.5:
+        return offset, 0, rnd.choice(FUZZ_PIECES)
+    return offset, min(rnd.randint(1, 8), len(text) - offset), ""
+
+
+def _full_parse(UCParser, text):
+    # the Program of a full parse of text, None when it reports errors
+    errors = io.StringIO()
+    with contextlib.redirect_stdout(errors):
+        program = UCParser(lambda msg, x, y: print(msg, x, y)).parse(text)
+    return None if errors.getvalue() else program
+
+
+def bench_incremental(lines=20000, edits=100, cases=300, seed=0):
+    """Latency of one-character edits of a file with about lines lines
+    with IncrementalParse, against parsing the whole file, after checking
+    that both give the same AST over random edits, and over an edit
+    breaking the file followed by one fixing it."""
+    import ucc
+    from uc_incremental import IncrementalParse
+
+    UCParser = ucc.load_parser()["UCParser"]
+    parser = UCParser(lambda msg, x, y: print(msg, x, y))
+    rnd = random.Random(seed)
+
+    buffer = IncrementalParse(parser, generate_source(2000, seed))
+    for case in range(cases):
+        edit = _random_edit(rnd, buffer.text, rnd.choice(("digit", "newline", "fuzz")))
+        with contextlib.redirect_stdout(io.StringIO()):
+            got = _show(buffer.edit(*edit))
+        if got != _show(_full_parse(UCParser, buffer.text)):
+            raise AssertionError("incremental parse differs after %r on:\n%s" % (edit, buffer.text))
+    print("%d random edits parsed incrementally as a full parse" % cases)
+
+    # a declaration broken and then fixed: the edits after a parse with
+    # errors must not splice into the Program it recovered
+    with contextlib.redirect_stdout(io.StringIO()):
+        buffer = IncrementalParse(parser, generate_source(2000, seed))
+    offset = buffer.text.find(";", len(buffer.text) // 2)
+    for edit in ((offset, 1, ""), (offset, 0, ";")):
+        with contextlib.redirect_stdout(io.StringIO()):
+            got = _show(buffer.edit(*edit))
+        if got != _show(_full_parse(UCParser, buffer.text)):
+            raise AssertionError("incremental parse differs after %r on:\n%s" % (edit, buffer.text))
+    if got is None:
+        raise AssertionError("the fixed file has errors")
+    print("an edit breaking the file and one fixing it parsed as a full parse")
+
+    sample = generate_source(64 * 1024)
+    text = generate_source(int(lines * len(sample) / sample.count("\n")))
+    elapsed, buffer = _timeit(IncrementalParse, parser, text)
+    print("%d lines  full parse  %9.2f ms" % (text.count("\n"), elapsed * 1000))
+    for kind in ("digit", "space", "newline"):
+        times = []
+        for _ in range(edits):
+            edit = _random_edit(rnd, buffer.text, kind)
+            elapsed, program = _timeit(buffer.edit, *edit)
+            times.append(elapsed)
+        if _show(program) != _show(UCParser().parse(buffer.text)):
+            raise AssertionError("incremental parse differs after %s edits" % kind)
+        times.sort()
+        print("%d lines  %-7s edit  %9.2f ms median  %9.2f ms max"
+              % (buffer.text.count("\n"), kind, times[len(times) // 2] * 1000, times[-1] * 1000))
+
+
+def error_source(nerrors, fixed=0):
+    """A uC program with nerrors semantic errors (undefined names), one per
+    function, the first fixed of them corrected."""
+    return "".join(
+        "int f%d (int a) {\n"
+        "  int v[4];\n"
+        "  %s\n"
+        "  v[0] = a * %d;\n"
+        "  x%d = v[0] + 1;\n"
+        "  return v[0];\n"
+        "}\n" % (n, "int x%d;" % n if n < fixed else "", n, n)
+        for n in range(nerrors)
+    )
+
+
+def bench_diagnostics(nerrors=50):
+    """Wall time to report nerrors semantic errors in one pass collecting
+    them, against one run per error fixing one error each time."""
+    import ucc
+    import uc_sema
+
+    UCParser = ucc.load_parser()["UCParser"]
+    parser = UCParser()
+
+    def collect():
+        return uc_sema.Visitor(collect=True).check(parser.parse(error_source(nerrors)))
+
+    def one_at_a_time():
+        reported = []
+        for fixed in range(nerrors):
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                try:
+                    uc_sema.Visitor().visit(parser.parse(error_source(nerrors, fixed)))
+                except SystemExit:
+                    pass
+            reported.append(out.getvalue().strip())
+        return reported
+
+    elapsed, diagnostics = _timeit(collect)
+    print("collect      %4d errors  %8.1f ms" % (len(diagnostics), elapsed * 1000))
+    elapsed, reported = _timeit(one_at_a_time)
+    print("exit/rerun   %4d errors  %8.1f ms" % (len(reported), elapsed * 1000))
+    if reported != [str(diagnostic) for diagnostic in diagnostics]:
+        raise AssertionError("the collected errors differ from the errors of the runs")
+
+
+class ChainedSymbolTable(dict):
+    """The SymbolTable of P4_Semantic.ipynb, every lookup walks the whole
+    chain of parents."""
+
+    def __init__(self, parent=None):
+        super().__init__()
+        self.parent = parent
+
+    def add(self, name, value):
+        self[name] = value
+
+    def lookup(self, name):
+        if self.parent is not None:
+            return self.get(name, self.parent.lookup(name))
+        else:
+            return self.get(name, None)
+
+    def close(self):
+        return self.parent
+
+
+def bench_symtab(depth=500, names=100000, seed=0):
+    """Lookups/sec of the flat SymbolTable against the chained one, with
+    names identifiers spread over depth nested scopes, after checking that
+    both resolve every name the same way."""
+    from uc_sema import SymbolTable
+
+    rnd = random.Random(seed)
+    idents = ["x%d" % n for n in range(names)]
+    # every scope shadows some names of the scopes around it
+    layout = [rnd.sample(idents, names // depth) for _ in range(depth)]
+    queries = idents + ["undefined%d" % n for n in range(names // 10)]
+    rnd.shuffle(queries)
+
+    def run(cls):
+        symtab = cls()
+        for level, scope_names in enumerate(layout):
+            symtab = cls(symtab)
+            for name in scope_names:
+                symtab.add(name, level)
+        start = time.perf_counter()
+        found = [symtab.lookup(name) for name in queries]
+        elapsed = time.perf_counter() - start
+        # sibling scopes: close half of the scopes and open new ones
+        for _ in range(depth // 2):
+            symtab = symtab.close()
+        symtab = cls(symtab)
+        symtab.add(queries[0], "sibling")
+        found.extend(symtab.lookup(name) for name in queries[:1000])
+        return elapsed, found
+
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, depth * 2 + 100))
+    try:
+        results = [(cls.__name__, run(cls)) for cls in (ChainedSymbolTable, SymbolTable)]
+    finally:
+        sys.setrecursionlimit(limit)
+    if results[0][1][1] != results[1][1][1]:
+        raise AssertionError("the symbol tables resolve names differently")
+    for name, (elapsed, found) in results:
+        print("%-18s  depth %4d  %7d names  %8.3f s  %10.0f lookups/s"
+              % (name, depth, names, elapsed, len(queries) / elapsed))
+
+
+class GetattrDispatch:
+    """The visit and generic_visit of the NodeVisitor of P4_Semantic.ipynb:
+    a method cache by class name and a walk over node.children()."""
+
+    _method_cache = None
+
+    def visit(self, node):
+        if self._method_cache is None:
+            self._method_cache = {}
+
+        visitor = self._method_cache.get(node.__class__.__name__, None)
+        if visitor is None:
+            method = 'visit_' + node.__class__.__name__
+            visitor = getattr(self, method, self.generic_visit)
+            self._method_cache[node.__class__.__name__] = visitor
+
+        result = visitor(node)
+        if isinstance(result, types.GeneratorType):
+            return run_recursively(self, result)
+        return result
+
+    def generic_visit(self, node):
+        for _, child in node.children():
+            self.visit(child)
+
+
+def run_recursively(visitor, visit):
+    """Run the generator visit of a node to the end visiting the children
+    it yields with nested calls of visitor.visit, as the visit methods of
+    the notebook did. Returns its result."""
+    value = None
+    try:
+        while True:
+            value = visitor.visit(visit.send(value))
+    except StopIteration as stop:
+        return stop.value
+
+
+class RecursiveVisit:
+    """visit and generic_visit of the NodeVisitor before the explicit
+    stacks: the children are visited by nested calls."""
+
+    def visit(self, node):
+        result = self._dispatch[node.__class__](self, node)
+        if isinstance(result, types.GeneratorType):
+            return run_recursively(self, result)
+        return result
+
+    def generic_visit(self, node):
+        for _, child in node.children():
+            self.visit(child)
+
+
+def recursive_show(node, buf, offset=0, showcoord=False, name=None):
+    """Node.show before the explicit stack, with a nested call per child."""
+    node._show_node(buf, offset, False, False, showcoord, name)
+    for child_name, child in node.children():
+        recursive_show(child, buf, offset + 4, showcoord, child_name)
+
+
+def recursive_repr(obj, indent):
+    """represent_node before the explicit stack."""
+    from uc_ast_correto import Node
+
+    def _repr(obj, indent, printed_set):
+        if isinstance(obj, list):
+            indent += 1
+            sep = ",\n" + (" " * indent)
+            final_sep = ",\n" + (" " * (indent - 1))
+            return "[" + sep.join(_repr(e, indent, printed_set) for e in obj) + final_sep + "]"
+        elif isinstance(obj, Node):
+            if obj in printed_set:
+                return ""
+            printed_set.add(obj)
+            indent += len(obj.__class__.__name__) + 1
+            attrs = [name + "=" + _repr(getattr(obj, name), indent + len(name) + 1, printed_set)
+                     for name in obj.__slots__ if name != "bind"]
+            return obj.__class__.__name__ + "(" + (",\n" + " " * indent).join(attrs) + ")"
+        elif isinstance(obj, str):
+            return obj
+        return ""
+
+    return _repr(obj, indent, set())
+
+
+def reference_show(node, buf, offset=0):
+    """Node.show(showcoord=True) as it was before the streaming writer:
+    each line and each attribute built as a string, recursively."""
+    lead = " " * offset
+    buf.write(lead + node.__class__.__name__ + ":")
+    inner_offset = len(node.__class__.__name__ + ":")
+    if node.attr_names:
+        buf.write(" " + ", ".join(recursive_repr(getattr(node, n), offset + inner_offset + 1)
+                                  for n in node.attr_names))
+    if node.coord and node.coord.line != 0:
+        buf.write(" %s" % node.coord)
+    buf.write("\n")
+    for _, child in node.children():
+        reference_show(child, buf, offset + 4)
+
+
+class GoldenBuffer:
+    """A buffer that compares the text written to it with the file f,
+    reading the file as the writes arrive. mismatch is the offset of the
+    first difference, or None."""
+
+    def __init__(self, f):
+        self.f = f
+        self.offset = 0
+        self.mismatch = None
+
+    def write(self, text):
+        if self.mismatch is None:
+            expected = self.f.read(len(text))
+            if expected != text:
+                self.mismatch = self.offset + next(
+                    i for i, (a, b) in enumerate(zip(text, expected + "\0")) if a != b)
+            self.offset += len(text)
+
+    def close(self):
+        """Check that the whole file was written. Returns whether it matched."""
+        if self.mismatch is None and self.f.read(1):
+            self.mismatch = self.offset
+        return self.mismatch is None
+
+
+class _Sink:
+    # a buffer that only counts what is written to it
+    size = 0
+
+    def write(self, text):
+        self.size += len(text)
+
+
+def count_nodes(node):
+    """Number of nodes of the tree under node."""
+    total = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        total += 1
+        stack.extend(child for _, child in node.children())
+    return total
+
+
+def _getattr_lookup(uc_sema):
+    """A NodeVisitor mixin looking the visit method up with getattr on every
+    node, walking the children with the same generated pushers as the
+    dispatch tables, to time the tables alone."""
+    pushers = uc_sema._pushers
+
+    class GetattrLookup:
+        def visit(self, node):
+            visit = getattr(self, "visit_" + node.__class__.__name__, None)
+            result = visit(node) if visit is not None else self.generic_visit(node)
+            if result.__class__ is types.GeneratorType:
+                return self._resume(result)
+            return result
+
+        def generic_visit(self, node):
+            stack = []
+            pushers[node.__class__](node, stack)
+            while stack:
+                node = stack.pop()
+                visit = getattr(self, "visit_" + node.__class__.__name__, None)
+                if visit is None:
+                    pushers[node.__class__](node, stack)
+                else:
+                    result = visit(node)
+                    if result.__class__ is types.GeneratorType:
+                        self._resume(result)
+
+    return GetattrLookup
+
+
+def bench_visitors(sizes, total=400000):
+    """Nodes/sec of the ConstantVisitor and the semantic Visitor walking ASTs
+    of about sizes nodes with the dispatch tables, with a getattr lookup
+    per node over the same walk and with the getattr dispatch of the
+    notebook. Each AST is visited until about total nodes were visited,
+    and the best time is kept."""
+    import ucc
+    import uc_sema
+
+    parser = ucc.load_parser()["UCParser"]()
+    sample = generate_source(64 * 1024)
+    density = count_nodes(parser.parse(sample)) / len(sample)
+    lookup = _getattr_lookup(uc_sema)
+
+    for nodes in sizes:
+        ast = parser.parse(generate_source(int(nodes / density)))
+        count = count_nodes(ast)
+        runs = max(3, total // count)
+        for base in (uc_sema.ConstantVisitor, uc_sema.Visitor):
+            for name, cls in (("dispatch table", base),
+                              ("getattr", type(base.__name__, (lookup, base), {})),
+                              ("notebook", type(base.__name__, (GetattrDispatch, base), {}))):
+                elapsed = min(_timeit(cls().visit, ast)[0] for _ in range(runs))
+                print("%-16s %-14s  %8d nodes  %9.2f ms  %10.0f nodes/s"
+                      % (base.__name__, name, count, elapsed * 1000, count / elapsed))
+
+
+def deep_source(depth):
+    """A function with an expression of depth nested BinaryOps."""
+    return "int main() {\n    int a;\n    a = %s;\n    return a;\n}\n" % " + ".join(["a"] * depth)
+
+
+def _recursive_walk(node):
+    total = 1
+    for _, child in node.children():
+        total += _recursive_walk(child)
+    return total
+
+
+def _iterative_walk(node):
+    from uc_ast_correto import iter_preorder
+
+    return sum(1 for _ in iter_preorder(node))
+
+
+def bench_deep(nodes=200000, depth=100000, print_depth=4000, runs=3):
+    """Recursive against explicit-stack traversals (walk, show, repr and
+    the visitors): nodes/sec over a wide AST of about nodes nodes, and
+    whether each one gets through an expression depth levels deep
+    (print_depth levels for show and repr, whose output grows with the
+    square of the depth)."""
+    import ucc
+    import uc_sema
+
+    parser = ucc.load_parser()["UCParser"]()
+    sample = generate_source(64 * 1024)
+    density = count_nodes(parser.parse(sample)) / len(sample)
+    wide = parser.parse(generate_source(int(nodes / density)))
+    deep = parser.parse(deep_source(depth))
+    shallow = parser.parse(deep_source(print_depth))
+
+    def show(node):
+        node.show(buf=_Sink(), showcoord=True)
+
+    engines = [("walk", _recursive_walk, _iterative_walk, deep),
+               ("show", lambda node: recursive_show(node, _Sink(), 0, True), show, shallow),
+               ("repr", lambda node: recursive_repr(node, 0), repr, shallow)]
+    for base in (uc_sema.ConstantVisitor, uc_sema.Visitor):
+        recursive_class = type(base.__name__, (RecursiveVisit, base), {})
+        engines.append((base.__name__, lambda node, cls=recursive_class: cls().visit(node),
+                        lambda node, cls=base: cls().visit(node), deep))
+
+    for name, recursive, iterative, tree in engines:
+        total = count_nodes(wide)
+        for kind, func in (("recursive", recursive), ("explicit stack", iterative)):
+            elapsed = min(_timeit(func, wide)[0] for _ in range(runs))
+            try:
+                deep_time = "%.2f s" % _timeit(func, tree)[0]
+            except RecursionError:
+                deep_time = "RecursionError"
+            print("%-16s %-14s  %8d nodes  %7.2f s  %10.0f nodes/s   depth %6d: %s"
+                  % (name, kind, total, elapsed, total / elapsed,
+                     depth if tree is deep else print_depth, deep_time))
+
+
+def _golden_show(ast, path):
+    with open(path, "r") as f:
+        golden = GoldenBuffer(f)
+        ast.show(buf=golden, showcoord=True)
+        golden.close()
+    return golden.mismatch
+
+
+def _peak(func, *args):
+    # seconds and peak of the memory allocated by func(*args), in MB
+    tracemalloc.start()
+    try:
+        elapsed = _timeit(func, *args)[0]
+        return elapsed, tracemalloc.get_traced_memory()[1] / MB
+    finally:
+        tracemalloc.stop()
+
+
+def bench_dump(nodes=200000, golden=None):
+    """Time and peak memory of the streaming show and repr against the
+    string-building ones, checking golden files: show(showcoord=True) of an
+    AST of about nodes nodes against the old show, and of each .uc file in
+    the directory golden against the .out file next to it."""
+    import ucc
+    from uc_ast_correto import write_repr
+
+    parser = ucc.load_parser()["UCParser"](ucc.print_error)
+    failures = 0
+    if golden is not None:
+        for path in ucc.find_sources([golden]):
+            out = os.path.splitext(path)[0] + ".out"
+            if not os.path.exists(out):
+                continue
+            with open(path, "r") as f:
+                ast = parser.parse(f.read())
+            mismatch = _golden_show(ast, out) if ast is not None else 0
+            if mismatch is not None:
+                failures += 1
+                print("%s: differs from %s at character %d" % (path, out, mismatch))
+
+    sample = generate_source(64 * 1024)
+    density = count_nodes(parser.parse(sample)) / len(sample)
+    ast = parser.parse(generate_source(int(nodes / density)))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "golden.out")
+        with open(path, "w") as f:
+            reference_show(ast, f)
+        size = os.path.getsize(path) / MB
+        mismatch = _golden_show(ast, path)
+        if mismatch is not None:
+            failures += 1
+            print("show differs from the old show at character %d" % mismatch)
+
+        def string_compare():
+            buf = io.StringIO()
+            reference_show(ast, buf)
+            with open(path, "r") as f:
+                return buf.getvalue() == f.read()
+
+        repr_path = os.path.join(tmp, "golden.repr")
+        with open(repr_path, "w") as f:
+            f.write(recursive_repr(ast, 0))
+        with open(repr_path, "r") as f:
+            golden_repr = GoldenBuffer(f)
+            write_repr(ast, golden_repr)
+            if not golden_repr.close():
+                failures += 1
+                print("repr differs from the old repr at character %d" % golden_repr.mismatch)
+
+        print("%d nodes, show %.1f MB" % (count_nodes(ast), size))
+        for name, func, args in (("show to a string, compare", string_compare, ()),
+                                 ("show streamed to the golden file", _golden_show, (ast, path)),
+                                 ("repr built as a string", recursive_repr, (ast, 0)),
+                                 ("repr streamed to a sink", write_repr, (ast, _Sink()))):
+            elapsed, peak = _peak(func, *args)
+            print("%-34s %7.2f s  peak %8.2f MB" % (name, elapsed, peak))
+    print("golden files: %s" % ("%d failures" % failures if failures else "ok"))
+
+
+def _shared_names(program):
+    # whether the VarDecl of each Decl refers to the ID of its name
+    from uc_ast_correto import Decl, VarDecl, iter_preorder
+
+    return all(node.type.declname is node.name for _, _, node in iter_preorder(program)
+               if isinstance(node, Decl) and isinstance(node.type, VarDecl))
+
+
+def bench_astfile(size=1.0, cases=20, runs=3, seed=0):
+    """Round trips of ASTs through uc_astfile, and the time to load them
+    (all of it, or one function) against parsing the source of size MB."""
+    import ucc
+    import uc_astfile
+
+    parser = ucc.load_parser()["UCParser"]()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "program.ast")
+        failures = 0
+        for case in range(cases):
+            ast = parser.parse(generate_source(32 * 1024, seed=seed + case))
+            with open(path, "wb") as f:
+                uc_astfile.dump(ast, f)
+            with uc_astfile.ASTFile(path) as astfile:
+                loaded = astfile.program()
+                if _show(loaded) != _show(ast) or repr(loaded) != repr(ast) or not _shared_names(loaded):
+                    failures += 1
+                    print("round trip of case %d differs" % case)
+        print("%d round trips: %s" % (cases, "%d failures" % failures if failures else "ok"))
+
+        source = generate_source(int(size * MB), seed=seed)
+        parse_time, ast = _timeit(parser.parse, source)
+        with open(path, "wb") as f:
+            dump_time = _timeit(uc_astfile.dump, ast, f)[0]
+        names = list(uc_astfile.ASTFile(path).functions())
+        middle = names[len(names) // 2]
+
+        def load_program():
+            with uc_astfile.ASTFile(path) as astfile:
+                return astfile.program()
+
+        def load_function():
+            with uc_astfile.ASTFile(path) as astfile:
+                return astfile.function(middle)
+
+        print("%.1f MB of source, %d nodes, AST file %.1f MB"
+              % (len(source) / MB, count_nodes(ast), os.path.getsize(path) / MB))
+        print("%-24s %8.3f s" % ("parse", parse_time))
+        print("%-24s %8.3f s" % ("dump", dump_time))
+        for name, func in (("load the program", load_program), ("load one function", load_function)):
+            elapsed = min(_timeit(func)[0] for _ in range(runs))
+            print("%-24s %8.3f s  %7.1fx faster than parsing" % (name, elapsed, parse_time / elapsed))
+
+
+def bench_cache(files=200, size=16.0, seed=0):
+    """Time to compile a tree of files generated programs of size KB at
+    each stage without the compilation cache, with an empty one (cold)
+    and with the one the cold run filled (warm)."""
+    import ucc
+    from uc_cache import CompilationCache
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = os.path.join(tmp, "src")
+        os.makedirs(sources)
+        for i in range(files):
+            with open(os.path.join(sources, "f%04d.uc" % i), "w") as f:
+                f.write(generate_source(int(size * 1024), seed=seed + i))
+        paths = ucc.find_sources([sources])
+
+        def run(stage, cache):
+            outputs = []
+            for path in paths:
+                out = io.StringIO()
+                with open(path, "r") as f, contextlib.redirect_stdout(out):
+                    try:
+                        ucc.compile_file(f, stage, cache)
+                    except SystemExit:
+                        pass
+                outputs.append(out.getvalue())
+            return outputs
+
+        for stage in ucc.STAGES:
+            ucc.get_compiler(stage)
+            ucc.get_compiler(stage, count=True)
+            cache = CompilationCache(os.path.join(tmp, "cache-" + stage))
+            plain_time, plain = _timeit(run, stage, None)
+            cold_time, cold = _timeit(run, stage, cache)
+            cold_counts = (cache.hits, cache.misses)
+            cache.hits = cache.misses = 0
+            warm_time, warm = _timeit(run, stage, cache)
+            same = plain == cold == warm
+            print("%-5s  no cache %6.2f s  cold %6.2f s (%d hits, %d misses)  "
+                  "warm %6.2f s (%d hits, %d misses)  %5.1fx  %s"
+                  % (stage, plain_time, cold_time, cold_counts[0], cold_counts[1],
+                     warm_time, cache.hits, cache.misses, plain_time / warm_time,
+                     "same output" if same else "OUTPUT DIFFERS"))
+
+
+def bench_stats(size=1.0, runs=3):
+    """Time of each stage of ucc over a generated program of size MB
+    without stats, with the uc_stats counters and timers and with a
+    profile as well, checking that the output does not change."""
+    import ucc
+    from uc_stats import Stats
+
+    text = generate_source(int(size * MB))
+
+    def run(stage, stats):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            ucc.compile_file(io.StringIO(text), stage, stats=stats)
+        return out.getvalue()
+
+    print("%-5s %10s %10s %10s" % ("stage", "plain (s)", "stats", "profile"))
+    # the generated source is not a program that can run
+    for stage in ucc.STAGES[:ucc.STAGES.index("sema") + 1]:
+        times = []
+        outputs = []
+        for stats in (None, Stats(), Stats(profile=True)):
+            ucc.get_compiler(stage, stats)
+            elapsed = min(_timeit(run, stage, stats)[0] for _ in range(runs))
+            times.append(elapsed)
+            outputs.append(run(stage, stats))
+        print("%-5s %10.2f %9.2fx %9.2fx  %s" % (
+            stage, times[0], times[1] / times[0], times[2] / times[0],
+            "same output" if outputs[0] == outputs[1] == outputs[2] else "OUTPUT DIFFERS"))
+
+
+def _retained(func, *args):
+    # result of func(*args) and the memory it left allocated, in MB
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = func(*args)
+        return result, (tracemalloc.get_traced_memory()[0] - before) / MB
+    finally:
+        tracemalloc.stop()
+
+
+def bench_arena(nodes=1000000, runs=3):
+    """Memory and traversal time of an AST of about nodes nodes as objects
+    and as a uc_arena Arena read through views, checking that show and
+    the semantic Visitor give the same results on both."""
+    import ucc
+    import uc_arena
+    import uc_astfile
+    import uc_sema
+    from uc_ast_correto import iter_preorder
+
+    parser = ucc.load_parser()["UCParser"]()
+    sample = generate_source(64 * 1024)
+    density = count_nodes(parser.parse(sample)) / len(sample)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "program.ast")
+        with open(path, "wb") as f:
+            uc_astfile.dump(parser.parse(generate_source(int(nodes / density))), f)
+        # the objects loaded from the file are only the ones of the tree
+        with uc_astfile.ASTFile(path) as astfile:
+            tree, tree_memory = _retained(astfile.program)
+    arena, arena_memory = _retained(uc_arena.Arena.from_tree, tree)
+    view = arena.root()
+
+    def check(node):
+        return [str(diagnostic) for diagnostic in uc_sema.Visitor(collect=True).check(node)]
+
+    tree_diagnostics, tree_sema = _retained(check, tree)
+    arena_diagnostics, arena_sema = _retained(check, view)
+    same = tree_diagnostics == arena_diagnostics and _show(tree) == _show(view)
+    print("%d nodes, %s" % (len(arena), "same show and diagnostics" if same else "RESULTS DIFFER"))
+    print("%-22s %10s %10s" % ("memory (MB)", "objects", "arena"))
+    print("%-22s %10.1f %10.1f" % ("AST", tree_memory, arena_memory))
+    print("%-22s %10.1f %10.1f" % ("added by the Visitor", tree_sema, arena_sema))
+    print("%-22s %10.0f %10.0f" % ("bytes per node", tree_memory * MB / len(arena),
+                                   arena_memory * MB / len(arena)))
+
+    def walk(root):
+        return sum(1 for _ in iter_preorder(root))
+
+    def show(root):
+        root.show(buf=_Sink(), showcoord=True)
+
+    print("%-22s %10s %10s" % ("time (s)", "objects", "arena"))
+    for name, tree_func, arena_func in (
+            ("pre-order indices", None, lambda: sum(1 for _ in arena.preorder())),
+            ("iter_preorder", lambda: walk(tree), lambda: walk(view)),
+            ("show", lambda: show(tree), lambda: show(view)),
+            ("Visitor", lambda: check(tree), lambda: check(view))):
+        times = ["%10.2f" % min(_timeit(func)[0] for _ in range(runs)) if func else "%10s" % "-"
+                 for func in (tree_func, arena_func)]
+        print("%-22s %s %s" % (name, times[0], times[1]))
+
+
+def typed_source(functions, seed=0):
+    """Generate a uC program of functions with array parameters and locals
+    that call each other, for the type checks of arrays and functions."""
+    rnd = random.Random(seed)
+    chunks = []
+    for n in range(functions):
+        size = rnd.randint(1, 9)
+        # one call in a hundred passes a char array for the int array
+        first = "t" if n % 100 == 99 else "v"
+        chunks.append(
+            "int m%d[%d][4];\n"
+            "int f%d (int a[], char s[], int m[][4], int k) {\n"
+            "  int v[%d];\n"
+            "  char t[] = \"abc\";\n"
+            "  int w[2][4] = {{1, 2, 3, 4}, {5, 6, 7, 8}};\n"
+            "  v[0] = a[k] + m[0][1] * w[1][k];\n"
+            "  t[0] = s[k];\n"
+            "  if (v[0] == a[0] && t[1] != s[0]) return v[0];\n"
+            "  return %s;\n"
+            "}\n"
+            % (n, size, n, size, "f%d(%s, t, m%d, k - 1)" % (n - 1, first, n - 1) if n else "k"))
+    chunks.append("int main () {\n  int x[3] = {1, 2, 3};\n  char c[] = \"xy\";\n"
+                  "  return f%d(x, c, m%d, 0);\n}\n" % (functions - 1, functions - 1))
+    return "".join(chunks)
+
+
+class StructuralArrayType:
+    """uc_sema.ArrayType before interning: a new object per type, compared
+    by structure."""
+
+    made = 0
+
+    def __init__(self, element_type, size=None):
+        StructuralArrayType.made += 1
+        uc_sema = sys.modules["uc_sema"]
+        uc_sema.uCType.__init__(self, element_type.typename, rel_ops={"==", "!="}, assign_ops={"="})
+        self.type = element_type
+        self.size = size
+
+    def __eq__(self, other):
+        return isinstance(other, StructuralArrayType) and self.size == other.size and self.type == other.type
+
+
+class StructuralFunctionType:
+    """uc_sema.FunctionType before interning."""
+
+    made = 0
+
+    def __init__(self, return_type, param_list=None):
+        StructuralFunctionType.made += 1
+        sys.modules["uc_sema"].uCType.__init__(self, return_type.typename)
+        self.type = return_type
+        self.params = param_list
+
+    def __eq__(self, other):
+        return isinstance(other, StructuralFunctionType) and self.type == other.type and self.params == other.params
+
+
+def bench_types(functions=5000, runs=3):
+    """Time and number of array and function types made by the semantic
+    Visitor with interned types against structural ones, on a program of
+    functions with array parameters and locals calling each other."""
+    import ucc
+    import uc_sema
+
+    parser = ucc.load_parser()["UCParser"]()
+    text = typed_source(functions)
+
+    def checked():
+        # the time of the Visitor alone, over a new AST each run
+        best = None
+        for _ in range(runs):
+            ast = parser.parse(text)
+            elapsed, diagnostics = _timeit(uc_sema.Visitor(collect=True).check, ast)
+            best = elapsed if best is None else min(best, elapsed)
+        return best, [str(diagnostic) for diagnostic in diagnostics]
+
+    interned = uc_sema.ArrayType, uc_sema.FunctionType
+    before = len(interned[0]._interned) + len(interned[1]._interned)
+    interned_time, interned_diagnostics = checked()
+    interned_made = len(interned[0]._interned) + len(interned[1]._interned) - before
+
+    # the old classes, as subclasses of uCType, in place of the interned ones
+    structural = tuple(type(cls.__name__, (cls, uc_sema.uCType), {"__module__": __name__})
+                       for cls in (StructuralArrayType, StructuralFunctionType))
+    StructuralArrayType.made = StructuralFunctionType.made = 0
+    uc_sema.ArrayType, uc_sema.FunctionType = structural
+    try:
+        structural_time, structural_diagnostics = checked()
+    finally:
+        uc_sema.ArrayType, uc_sema.FunctionType = interned
+    structural_made = (StructuralArrayType.made + StructuralFunctionType.made) // runs
+
+    same = interned_diagnostics == structural_diagnostics
+    print("%d functions, %d diagnostics, %s" % (functions, len(interned_diagnostics),
+                                                "same diagnostics" if same else "DIAGNOSTICS DIFFER"))
+    print("%-12s %10s %12s" % ("", "time (s)", "types made"))
+    print("%-12s %10.3f %12d" % ("structural", structural_time, structural_made))
+    print("%-12s %10.3f %12d" % ("interned", interned_time, interned_made))
+    if not same:
+        raise AssertionError("the interned types change the diagnostics")
+
+
+def _default_baseline():
+    from uc_parsetab import cache_dir
+
+    return os.path.join(cache_dir(), "bench", "baseline.json")
+
+
+def bench_suite(sizes, seed=0, runs=5, baseline=None, save=False, tolerance=0.2):
+    """Throughput of each stage over programs of ProgramGenerator of sizes
+    KB, compared with a stored baseline: a stage slower than the baseline
+    by more than tolerance is a regression and the exit status is 1. With
+    save the results become the baseline."""
+    import json
+    import platform
+
+    import ucc
+    import uc_sema
+
+    baseline = baseline or _default_baseline()
+    lexer = ucc.load_lexer()["UCLexer"](lambda msg, x, y: None)
+    tuple_parser = ucc.load_parser(ucc.PARSER_FILE)["UCParser"]()
+    parser = ucc.load_parser()["UCParser"]()
+
+    def quiet(func, *args):
+        result, printed = ucc._captured(func, *args)
+        if printed:
+            raise AssertionError("the generated program has errors: %s" % printed.splitlines()[0])
+        return result
+
+    def best(func, setup=lambda: ()):
+        # the best time of runs, each with its own arguments from setup
+        times = []
+        for _ in range(runs):
+            args = setup()
+            times.append(_timeit(func, *args)[0])
+        return min(times)
+
+    def check(ast):
+        diagnostics = uc_sema.Visitor(collect=True).check(ast)
+        if diagnostics:
+            raise AssertionError("the generated program has semantic errors: %s" % diagnostics[0])
+
+    results = {}
+    for size in sizes:
+        text = program_source(int(size * 1024), seed)
+        # the grammar of P2 has no parenthesized declarators
+        tuple_text = re.sub(r"int \((\w+)\)", r"int \1", text)
+        ntokens = sum(1 for _ in lexer.tokenize(text))
+        stages = {
+            "lex": best(lambda: sum(1 for _ in lexer.tokenize(text))),
+            "parse": best(quiet, lambda: (tuple_parser.parse, tuple_text)),
+            "ast": best(quiet, lambda: (parser.parse, text)),
+            "sema": best(check, lambda: (quiet(parser.parse, text),)),
+            "show": best(lambda ast: ast.show(buf=_Sink(), showcoord=True),
+                         lambda: (quiet(parser.parse, text),)),
+        }
+        results["%g" % size] = {stage: {"seconds": elapsed, "MB/s": len(text) / MB / elapsed,
+                                        "tokens/s": ntokens / elapsed}
+                                for stage, elapsed in stages.items()}
+
+    try:
+        with open(baseline) as f:
+            reference = json.load(f)["results"]
+    except (OSError, ValueError, KeyError):
+        reference = {}
+
+    regressions = 0
+    print("%-8s %-6s %10s %10s %12s %10s" % ("size KB", "stage", "time (s)", "MB/s", "tokens/s", "baseline"))
+    for size, stages in results.items():
+        for stage, result in stages.items():
+            previous = reference.get(size, {}).get(stage)
+            if previous is None:
+                change = "-"
+            else:
+                ratio = result["seconds"] / previous["seconds"]
+                change = "%+.0f%%" % ((ratio - 1) * 100)
+                if ratio > 1 + tolerance:
+                    change += " SLOWER"
+                    regressions += 1
+            print("%-8s %-6s %10.3f %10.2f %12.0f %10s" % (
+                size, stage, result["seconds"], result["MB/s"], result["tokens/s"], change))
+
+    if save:
+        os.makedirs(os.path.dirname(os.path.abspath(baseline)), exist_ok=True)
+        with open(baseline, "w") as f:
+            json.dump({"seed": seed, "runs": runs, "python": platform.python_version(),
+                       "machine": platform.machine(), "results": results}, f, indent=2)
+        print("baseline saved to %s" % baseline)
+    elif not reference:
+        print("no baseline in %s, run with --save to store one" % baseline)
+    if regressions:
+        print("%d stages slower than the baseline by more than %.0f%%" % (regressions, tolerance * 100))
+        return 1
+    return 0
+
+
+def bench_labels(size=256.0, seed=0, runs=5):
+    """Parse throughput of the tuple parser of P2 labeling the nodes with
+    their text against lazy_labels, and the time to print each tree, over a
+    program of ProgramGenerator of size KB. The printed trees must match."""
+    import ucc
+
+    ns = ucc.load_parser(ucc.PARSER_FILE)
+    # the grammar of P2 has no parenthesized declarators
+    text = re.sub(r"int \((\w+)\)", r"int \1", program_source(int(size * 1024), seed))
+    print("%d KB" % (len(text) // 1024))
+    print("%-8s %10s %10s %10s" % ("labels", "parse (s)", "MB/s", "print (s)"))
+    printed = {}
+    for name, lazy in (("text", False), ("lazy", True)):
+        parser = ns["UCParser"](lazy_labels=lazy)
+        elapsed = min(_timeit(parser.parse, text)[0] for _ in range(runs))
+        print_time, printed[name] = _timeit(ucc.build_tree, parser.parse(text))
+        print("%-8s %10.3f %10.2f %10.3f" % (name, elapsed, len(text) / MB / elapsed, print_time))
+    if printed["text"] != printed["lazy"]:
+        raise AssertionError("the lazy labels print a different tree")
+
+
+def _c_mod(a, b):
+    r = abs(a) % abs(b)
+    return -r if a < 0 else r
+
+
+def classic_programs(sieve=100000, matrix=40, fib=22):
+    """uC programs of classic loops, as (name, source, expected output):
+    the primes below sieve, the product of two matrices of matrix x
+    matrix ints and the fib-th Fibonacci number computed recursively."""
+    flags = bytearray(sieve)
+    primes = 0
+    for i in range(2, sieve):
+        if not flags[i]:
+            primes += 1
+            flags[i + i::i] = b"\1" * len(range(i + i, sieve, i))
+    sieve_source = """int flags[%d];
+int main () {
+  int count = 0;
+  for (int i = 2; i < %d; i = i + 1) {
+    if (flags[i] == 0) {
+      count = count + 1;
+      for (int j = i + i; j < %d; j = j + i)
+        flags[j] = 1;
+    }
+  }
+  print(count);
+  print();
+  return 0;
+}
+""" % (sieve, sieve, sieve)
+
+    n = matrix
+    a = [[(i + j) % 10 for j in range(n)] for i in range(n)]
+    b = [[_c_mod(i - 2 * j, 7) for j in range(n)] for i in range(n)]
+    trace = sum(sum(a[i][k] * b[k][i] for k in range(n)) for i in range(n))
+    matrix_source = """int a[%d][%d], b[%d][%d], c[%d][%d];
+int main () {
+  int i, j, k, sum, trace;
+  for (i = 0; i < %d; i = i + 1)
+    for (j = 0; j < %d; j = j + 1) {
+      a[i][j] = (i + j) %% 10;
+      b[i][j] = (i - 2 * j) %% 7;
+    }
+  for (i = 0; i < %d; i = i + 1)
+    for (j = 0; j < %d; j = j + 1) {
+      sum = 0;
+      for (k = 0; k < %d; k = k + 1)
+        sum = sum + a[i][k] * b[k][j];
+      c[i][j] = sum;
+    }
+  trace = 0;
+  for (i = 0; i < %d; i = i + 1)
+    trace = trace + c[i][i];
+  print(trace);
+  print();
+  return 0;
+}
+""" % ((n,) * 12)
+
+    fib_values = [0, 1]
+    while len(fib_values) <= fib:
+        fib_values.append(fib_values[-1] + fib_values[-2])
+    fib_source = """int fib (int n) {
+  if (n < 2)
+    return n;
+  return fib(n - 1) + fib(n - 2);
+}
+int main () {
+  print(fib(%d));
+  print();
+  return 0;
+}
+""" % fib
+    return [("sieve", sieve_source, "%d\n" % primes),
+            ("matrix", matrix_source, "%d\n" % trace),
+            ("fib", fib_source, "%d\n" % fib_values[fib])]
+
+
+def _c_div(a, b):
+    q = abs(a) // abs(b)
+    return -q if (a < 0) != (b < 0) else q
+
+
+def semantic_programs():
+    """uC programs of the behaviour that C and Python do not share, as
+    (name, source, input, expected output): int / and % over the signs of
+    their operands, by variables and by constants, the limits of int, and
+    chars: their codes, comparisons, && and arrays, escapes and read."""
+    lines = []
+    expected = []
+    for a in (7, -7, 6, -6, 0, 1, -1):
+        for b in (3, -3, 2, 7, -7, 1):
+            lines.append("  a = %d; b = %d;\n"
+                         "  print(a / b, \" \", a %% b, \" \", a / %d, \" \", a %% %d, \" \", %d / b);\n"
+                         "  print();\n" % (a, b, b, b, a))
+            expected.append("%d %d %d %d %d\n" % (_c_div(a, b), _c_mod(a, b), _c_div(a, b), _c_mod(a, b),
+                                                  _c_div(a, b)))
+    division_source = "int main () {\n  int a, b;\n%s  return 0;\n}\n" % "".join(lines)
+
+    char_source = r"""char g = 'g';
+char word[] = "uC!";
+char table[2][3] = {{'a', 'b', 'c'}, {'x', 'y', 'z'}};
+int count (char s[], char c, int n) {
+  int k = 0;
+  for (int i = 0; i < n; i = i + 1)
+    if (s[i] == c)
+      k = k + 1;
+  return k;
+}
+int main () {
+  char c = 'a', d;
+  char buf[4];
+  d = c;
+  print(c, d, g, word[0], word[2], table[1][2]);
+  print();
+  print(c == 'a', c != d, c && g, 'x' == table[1][0], buf[1] && c);
+  print();
+  buf[0] = word[1];
+  buf[3] = 'q';
+  print(buf[0], buf[3], buf[1] == buf[2], count(word, 'C', 3), count(table[0], 'b', 3));
+  print();
+  print(c, '\n', "raw\n");
+  print();
+  read(d, buf[1]);
+  print(d, buf[1]);
+  print();
+  return 0;
+}
+"""
+    # strings are not unescaped, chars are; a char read is the first of its word
+    char_output = "aagu!z\ntruefalsetruetruefalse\nCqtrue11\na\nraw\\n\nx7\n"
+
+    int_source = r"""int big = 2147483647;
+int main () {
+  int a = 46340, b;
+  int low = 0 - 2147483647 - 1;
+  print(a * a, " ", big - 1 + 1, " ", low, " ", low / 1, " ", low % (0 - 1), " ", -(low + 1));
+  print();
+  read(b);
+  print(b, " ", -b);
+  print();
+  return 0;
+}
+"""
+    int_output = "2147395600 2147483647 -2147483648 -2147483648 0 2147483647\n-2147483647 2147483647\n"
+    return [("division", division_source, "", "".join(expected)),
+            ("char", char_source, "xyz 7\n", char_output),
+            ("int", int_source, "-2147483647\n", int_output)]
+
+
+def error_programs():
+    """uC programs stopped by a run-time error after printing "ok ", as
+    (name, source, input, expected output): int operations and reads out
+    of the range of int, and subscripts out of their dimension, of an
+    element or of a row passed to a function."""
+    template = r"""int row (int r[]) {
+  return 0;
+}
+int rows (int m[][3], int k) {
+  return row(m[k]);
+}
+int main () {
+  int big = 2147483647, low = 0 - 2147483647 - 1, p = 1, q = 0 - 1, r = 4, m[2][3];
+  print("ok ");
+  %s;
+  print("not stopped");
+  return 0;
+}
+"""
+    overflow = "ok RuntimeError: value out of the range of its type\n"
+    index = "ok RuntimeError: array index out of range\n"
+    cases = [("add", "print(big + p)", "", overflow), ("sub", "print(low - p)", "", overflow),
+             ("mul", "print(46341 * 46341)", "", overflow), ("neg", "print(-low)", "", overflow),
+             ("div", "print(low / q)", "", overflow), ("read", "read(p)", "2147483648\n", overflow),
+             ("element", "print(m[0][r])", "", index), ("negative", "m[q][0] = 1", "", index),
+             ("row", "print(rows(m, 2))", "", index)]
+    return [(name, template % statement, stdin, expected) for name, statement, stdin, expected in cases]
+
+
+def _checked_program(text):
+    # the Program of text, checked by the semantic analysis
+    import ucc
+    import uc_sema
+
+    program = ucc.load_parser()["UCParser"]().parse(text)
+    diagnostics = uc_sema.Visitor(collect=True).check(program)
+    if diagnostics:
+        raise AssertionError("the program has semantic errors: %s" % diagnostics[0])
+    return program
+
+
+def bench_exec(sieve=100000, matrix=40, fib=22, runs=3):
+    """Compile time and speed of the closure engine of uc_exec.py on the
+    classic_programs, in uC operations (nodes run) per second, checking
+    their output."""
+    import uc_exec
+
+    print("%-8s %12s %12s %10s %12s" % ("program", "operations", "compile (s)", "run (s)", "ops/s"))
+    for name, text, expected in classic_programs(sieve, matrix, fib):
+        program = _checked_program(text)
+        counting = uc_exec.compile_program(program, count=True)
+        out = io.StringIO()
+        counting.run(io.StringIO(), out)
+        operations = counting.operations
+        compile_time, executable = _timeit(uc_exec.compile_program, program)
+        best = None
+        for _ in range(runs):
+            out = io.StringIO()
+            elapsed, status = _timeit(executable.run, io.StringIO(), out)
+            best = elapsed if best is None else min(best, elapsed)
+            if status or out.getvalue() != expected:
+                raise AssertionError("%s printed %r, not %r" % (name, out.getvalue(), expected))
+        print("%-8s %12d %12.4f %10.3f %12.0f" % (name, operations, compile_time, best, operations / best))
+
+
+def _engine_output(executable, stdin=""):
+    # the exit status and output of a run of executable
+    out = io.StringIO()
+    status = executable.run(io.StringIO(stdin), out)
+    return status, out.getvalue()
+
+
+def bench_vm(sieve=100000, matrix=40, fib=22, programs=5, size=16.0, runs=3):
+    """Startup and speed of the register bytecode of uc_vm.py: the time to
+    get a runnable module from the source (parse, check and lower) and from
+    its bytecode file, and the run time of the classic_programs against the
+    closures of uc_exec. The engines must print the same for them and for
+    programs generated programs of size KB."""
+    import ucc
+    import uc_exec
+    import uc_sema
+    import uc_vm
+
+    parser = ucc.load_parser()["UCParser"]()
+
+    def from_source(text):
+        program = parser.parse(text)
+        uc_sema.Visitor(collect=True).check(program)
+        return uc_vm.compile_program(program)
+
+    def from_file(path):
+        with open(path, "rb") as f:
+            return uc_vm.load(f)
+
+    print("%-8s %9s %12s %12s %10s %10s %12s" % ("program", "bytecode", "source (s)", "file (s)",
+                                                 "vm (s)", "exec (s)", "vm ops/s"))
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, text, expected in classic_programs(sieve, matrix, fib):
+            program = _checked_program(text)
+            counting = uc_exec.compile_program(program, count=True)
+            _engine_output(counting)
+            operations = counting.operations
+            path = os.path.join(tmp, name + ".ucvm")
+            with open(path, "wb") as f:
+                uc_vm.dump(uc_vm.compile_program(program), f)
+            source_time = min(_timeit(from_source, text)[0] for _ in range(runs))
+            file_time, module = min(_timeit(from_file, path) for _ in range(runs))
+            times = {}
+            for engine, executable in (("vm", module), ("exec", uc_exec.compile_program(program))):
+                best = None
+                for _ in range(runs):
+                    elapsed, (status, output) = _timeit(_engine_output, executable)
+                    best = elapsed if best is None else min(best, elapsed)
+                    if status or output != expected:
+                        raise AssertionError("%s printed %r with %s, not %r" % (name, output, engine, expected))
+                times[engine] = best
+            print("%-8s %9d %12.4f %12.4f %10.3f %10.3f %12.0f"
+                  % (name, os.path.getsize(path), source_time, file_time, times["vm"], times["exec"],
+                     operations / times["vm"]))
+
+    for seed in range(programs):
+        program = _checked_program(program_source(int(size * 1024), seed))
+        # the generated programs read an int, a char and an int
+        vm_result = _engine_output(uc_vm.loads(uc_vm.dumps(uc_vm.compile_program(program))), "7 z 3\n")
+        exec_result = _engine_output(uc_exec.compile_program(program), "7 z 3\n")
+        if vm_result != exec_result:
+            raise AssertionError("generated program %d: uc_vm %r, uc_exec %r" % (seed, vm_result, exec_result))
+    print("%d generated programs of %g KB: same output" % (programs, size))
+
+
+class _Break(Exception):
+    pass
+
+
+class _Return(Exception):
+    def __init__(self, value):
+        super().__init__(value)
+        self.value = value
+
+
+class NaiveWalker:
+    """Interpreter walking the AST of a checked uC program as it runs, the
+    baseline of bench_pygen: every node run is dispatched by the name of
+    its class, every variable is looked up in a chain of dictionaries and
+    break and return are exceptions."""
+
+    def __init__(self, program):
+        import uc_runtime
+
+        self.runtime = uc_runtime
+        self.program = program
+        self.output = uc_runtime.Output()
+        self.input = uc_runtime.Input(self.output)
+
+    def run(self, stdin=None, stdout=None):
+        return self.runtime.run(self.main, self.output, self.input, stdin, stdout)
+
+    def main(self):
+        self.functions = {}
+        self.scopes = [{}]
+        for gdecl in self.program.gdecls:
+            if gdecl.__class__.__name__ == "GlobalDecl":
+                for decl in gdecl.decls:
+                    self.execute(decl)
+            else:
+                self.functions[gdecl.decl.name.name] = gdecl
+        return self.call(self.functions["main"], [])
+
+    def call(self, function, values):
+        args = function.decl.type.args
+        scope = {param.name.name: value for param, value in zip(args.params if args else (), values)}
+        saved = self.scopes
+        self.scopes = [saved[0], scope]
+        try:
+            for statement in function.statements.dcls + function.statements.stmts:
+                self.execute(statement)
+        except _Return as e:
+            return e.value
+        finally:
+            self.scopes = saved
+        return 0
+
+    def scope_of(self, name):
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope
+        raise NameError(name)
+
+    def execute(self, node):
+        getattr(self, "exec_" + node.__class__.__name__, self.evaluate)(node)
+
+    def exec_Decl(self, node):
+        if node.type.__class__.__name__ == "FuncDecl":
+            return
+        uc_type = node.attrs['uc_type']
+        init = node.init
+        scope = self.scopes[-1]
+        scope[node.name.name] = 0
+        if hasattr(uc_type, "size"):
+            values = self.runtime.initial_values(init) if init is not None else ()
+            scope[node.name.name] = self.runtime.new_array(uc_type, values)
+        elif init is not None:
+            scope[node.name.name] = self.evaluate(init.exprs[0] if hasattr(init, "exprs") else init)
+
+    def exec_DeclList(self, node):
+        for decl in node.decls:
+            self.execute(decl)
+
+    def exec_Compound(self, node):
+        self.scopes.append({})
+        try:
+            for statement in node.dcls + node.stmts:
+                self.execute(statement)
+        finally:
+            self.scopes.pop()
+
+    def exec_EmptyStatement(self, node):
+        pass
+
+    def exec_If(self, node):
+        if self.evaluate(node.cond):
+            self.execute(node.if_statements)
+        elif node.else_statements is not None:
+            self.execute(node.else_statements)
+
+    def exec_While(self, node):
+        try:
+            while self.evaluate(node.cond):
+                self.execute(node.statements)
+        except _Break:
+            pass
+
+    def exec_For(self, node):
+        self.scopes.append({})
+        try:
+            if node.init is not None:
+                self.execute(node.init)
+            while node.cond is None or self.evaluate(node.cond):
+                self.execute(node.statements)
+                if node.next is not None:
+                    self.evaluate(node.next)
+        except _Break:
+            pass
+        finally:
+            self.scopes.pop()
+
+    def exec_Break(self, node):
+        raise _Break()
+
+    def exec_Return(self, node):
+        raise _Return(self.evaluate(node.expr) if node.expr is not None else 0)
+
+    def exec_Assert(self, node):
+        if not self.evaluate(node.expr):
+            raise self.runtime.AssertionFailed(node.expr.coord)
+
+    def exec_Print(self, node):
+        if node.expr is None:
+            text = "\n"
+        else:
+            exprs = node.expr.exprs if node.expr.__class__.__name__ == "ExprList" else [node.expr]
+            values = [self.evaluate(expr) for expr in exprs]
+            text = "".join(self.runtime.FORMATS[expr.attrs['uc_type'].typename](value)
+                           for expr, value in zip(exprs, values))
+        self.output.chunks.append(text)
+        if len(self.output.chunks) > self.output.LIMIT:
+            self.output.flush()
+
+    def exec_Read(self, node):
+        exprs = node.expr.exprs if node.expr.__class__.__name__ == "ExprList" else [node.expr]
+        for expr in exprs:
+            self.assign(expr, self.runtime.reader(self.input, expr.attrs['uc_type'].typename)())
+
+    def evaluate(self, node):
+        return getattr(self, "eval_" + node.__class__.__name__)(node)
+
+    def eval_Constant(self, node):
+        return self.runtime.constant_value(node)
+
+    def eval_ID(self, node):
+        return self.scope_of(node.name)[node.name]
+
+    def eval_BinaryOp(self, node):
+        op = node.op
+        uc_type = node.left.attrs['uc_type']
+        left = self.evaluate(node.left)
+        if op in ("&&", "||"):
+            if uc_type.typename == "char":
+                left = left != 0
+            if left == (op == "||"):
+                return left
+            right = self.evaluate(node.right)
+            return right != 0 if uc_type.typename == "char" else right
+        right = self.evaluate(node.right)
+        if hasattr(uc_type, "size"):
+            return (left is right) == (op == "==")
+        if op == "/":
+            return _c_div(left, right)
+        if op == "%":
+            return _c_mod(left, right)
+        return {"+": operator.add, "-": operator.sub, "*": operator.mul, "<": operator.lt,
+                "<=": operator.le, ">": operator.gt, ">=": operator.ge, "==": operator.eq,
+                "!=": operator.ne}[op](left, right)
+
+    def eval_UnaryOp(self, node):
+        value = self.evaluate(node.expr)
+        return {"-": operator.neg, "+": operator.pos, "!": operator.not_}[node.op](value)
+
+    def eval_ExprList(self, node):
+        for expr in node.exprs:
+            value = self.evaluate(expr)
+        return value
+
+    def eval_Assignment(self, node):
+        value = self.evaluate(node.rvalue)
+        self.assign(node.lvalue, value)
+        return value
+
+    def assign(self, node, value):
+        if node.__class__.__name__ == "ID":
+            self.scope_of(node.name)[node.name] = value
+        else:
+            base, index, _ = self.element(node)
+            base[index] = value
+
+    def element(self, node):
+        # the array, index and size of the value of the element node
+        subscripts = []
+        while node.__class__.__name__ == "ArrayRef":
+            subscripts.append(node.subscript)
+            node = node.name
+        subscripts.reverse()
+        uc_type = node.attrs['uc_type']
+        base = self.evaluate(node)
+        index = 0
+        for subscript in subscripts:
+            uc_type = uc_type.type
+            index += self.evaluate(subscript) * (self.runtime.flat_size(uc_type) or 1)
+        return base, index, self.runtime.flat_size(uc_type) if hasattr(uc_type, "size") else None
+
+    def eval_ArrayRef(self, node):
+        base, index, size = self.element(node)
+        if size is None:
+            return base[index]
+        return memoryview(base)[index:index + size]
+
+    def eval_FuncCall(self, node):
+        if node.args is None:
+            args = []
+        elif node.args.__class__.__name__ == "ExprList":
+            args = node.args.exprs
+        else:
+            args = [node.args]
+        return self.call(self.functions[node.name.name], [self.evaluate(arg) for arg in args])
+
+
+def bench_pygen(sieve=100000, matrix=40, fib=22, runs=3):
+    """Speed of the uC programs written as Python code by uc_pygen.py
+    against a naive AST walker, and the time to write and compile their
+    source, once and again from the code objects compiled. Every engine
+    must print what the semantic_programs and the error_programs expect
+    first."""
+    import uc_exec
+    import uc_pygen
+    import uc_vm
+
+    engines = [("walker", NaiveWalker), ("exec", uc_exec.compile_program), ("vm", uc_vm.compile_program),
+               ("python", uc_pygen.compile_program)]
+    for name, text, stdin, expected in semantic_programs():
+        program = _checked_program(text)
+        for engine, make in engines:
+            result = _engine_output(make(program), stdin)
+            if result != (0, expected):
+                raise AssertionError("%s with %s: %r, not %r" % (name, engine, result, (0, expected)))
+        print("%-8s same output with %s" % (name, ", ".join(engine for engine, _ in engines)))
+    for name, text, stdin, expected in error_programs():
+        program = _checked_program(text)
+        for engine, make in engines[1:]:
+            result = _engine_output(make(program), stdin)
+            if result != (1, expected):
+                raise AssertionError("%s with %s: %r, not %r" % (name, engine, result, (1, expected)))
+    print("%d error programs, same output with %s" % (len(error_programs()),
+                                                    ", ".join(engine for engine, _ in engines[1:])))
+
+    print("%-8s %10s %10s %11s %10s %10s %8s" % ("program", "walker (s)", "write (s)", "compile (s)",
+                                               "again (s)", "run (s)", "speedup"))
+    for name, text, expected in classic_programs(sieve, matrix, fib):
+        program = _checked_program(text)
+        write_time, source = _timeit(uc_pygen.python_source, program)
+        compile_time = min(_timeit(compile, source, "<uC>", "exec")[0] for _ in range(runs))
+        uc_pygen.compile_source(source)
+        again_time = min(_timeit(uc_pygen.compile_source, source)[0] for _ in range(runs))
+        times = {}
+        for engine, executable in (("walker", NaiveWalker(program)), ("python", uc_pygen.compile_program(program))):
+            best = None
+            for _ in range(1 if engine == "walker" else runs):
+                elapsed, result = _timeit(_engine_output, executable)
+                best = elapsed if best is None else min(best, elapsed)
+                if result != (0, expected):
+                    raise AssertionError("%s printed %r with %s, not %r" % (name, result, engine, expected))
+            times[engine] = best
+        print("%-8s %10.3f %10.4f %11.4f %10.6f %10.3f %7.1fx"
+              % (name, times["walker"], write_time, compile_time, again_time, times["python"],
+                 times["walker"] / times["python"]))
+
+
+def bench_cgen(sieve=100000, matrix=40, fib=22, programs=5, size=16.0, runs=3):
+    """Speed of the uC programs written as C by uc_cgen.py and built by the
+    C compiler against the Python code of uc_pygen.py, and the time to
+    write their source, to build them and to find them built. The
+    semantic_programs and the error_programs must print what they expect,
+    and programs generated programs of size KB what they print with
+    uc_exec.py, first."""
+    import shutil
+
+    import uc_cgen
+    import uc_exec
+    import uc_pygen
+
+    if shutil.which(os.environ.get("CC") or "cc") is None:
+        print("no C compiler, set $CC")
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        def built(program):
+            executable = uc_cgen.compile_program(program)
+            executable.binary = uc_cgen.build(executable.source, directory)
+            return executable
+
+        for name, text, stdin, expected in semantic_programs():
+            result = _engine_output(built(_checked_program(text)), stdin)
+            if result != (0, expected):
+                raise AssertionError("%s: %r, not %r" % (name, result, (0, expected)))
+            print("%-8s same output" % name)
+        for name, text, stdin, expected in error_programs():
+            result = _engine_output(built(_checked_program(text)), stdin)
+            if result != (1, expected):
+                raise AssertionError("%s: %r, not %r" % (name, result, (1, expected)))
+        print("%d error programs, same output" % len(error_programs()))
+        for seed in range(programs):
+            program = _checked_program(program_source(int(size * 1024), seed))
+            expected = _engine_output(uc_exec.compile_program(program), "7 z 3\n")
+            result = _engine_output(built(program), "7 z 3\n")
+            if result != expected:
+                raise AssertionError("seed %d: %r, not %r" % (seed, result, expected))
+        print("%d generated programs of %g KB, same output" % (programs, size))
+
+        print("%-8s %10s %10s %10s %10s %10s %8s" % ("program", "python (s)", "write (s)", "build (s)",
+                                                   "again (s)", "run (s)", "speedup"))
+        for name, text, expected in classic_programs(sieve, matrix, fib):
+            program = _checked_program(text)
+            write_time, source = _timeit(uc_cgen.c_source, program)
+            build_time, binary = _timeit(uc_cgen.build, source, directory)
+            again_time = min(_timeit(uc_cgen.build, source, directory)[0] for _ in range(runs))
+            times = {}
+            for engine, executable in (("python", uc_pygen.compile_program(program)),
+                                       ("c", uc_cgen.Executable(source))):
+                executable.binary = binary
+                best = None
+                for _ in range(runs):
+                    elapsed, result = _timeit(_engine_output, executable)
+                    best = elapsed if best is None else min(best, elapsed)
+                    if result != (0, expected):
+                        raise AssertionError("%s printed %r with %s, not %r" % (name, result, engine, expected))
+                times[engine] = best
+            print("%-8s %10.3f %10.4f %10.3f %10.6f %10.4f %7.1fx"
+                  % (name, times["python"], write_time, build_time, again_time, times["c"],
+                     times["python"] / times["c"]))
+
+class IRInterpreter:
+    """Interpreter of the Module of uc_ir.py of a program, one instruction
+    at a time with the values and the run time of uc_runtime.py, the
+    reference of bench_ir. Only the flat index of an element is checked,
+    not the subscript of each dimension."""
+
+    def __init__(self, module):
+        import uc_ir
+        import uc_runtime
+
+        self.ir = uc_ir
+        self.runtime = uc_runtime
+        self.module = module
+        self.output = uc_runtime.Output()
+        self.input = uc_runtime.Input(self.output)
+        self.arithmetic = {uc_ir.ADD: operator.add, uc_ir.SUB: operator.sub, uc_ir.MUL: operator.mul,
+                           uc_ir.DIV: uc_runtime.c_div, uc_ir.MOD: uc_runtime.c_mod}
+        self.comparisons = {uc_ir.LT: operator.lt, uc_ir.LE: operator.le, uc_ir.GT: operator.gt,
+                            uc_ir.GE: operator.ge, uc_ir.EQ: operator.eq, uc_ir.NE: operator.ne}
+
+    def run(self, stdin=None, stdout=None):
+        return self.runtime.run(self.main, self.output, self.input, stdin, stdout)
+
+    def main(self):
+        if self.module.entry < 0:
+            raise self.runtime.UCRuntimeError("the program has no main function")
+        self.globals = {}
+        self.call(0, [])
+        return self.call(self.module.entry, [])
+
+    def call(self, index, args):
+        ir = self.ir
+        runtime = self.runtime
+        function = self.module.functions[index]
+        if not function.starts:
+            raise runtime.UCRuntimeError("'%s' is not defined" % function.name)
+        g = self.globals
+        values = function.values
+        constants = function.constants
+        typenames = [getattr(uc_type, "typename", None) for uc_type in function.types]
+        frame = args + [None] * (len(values) - len(args))
+
+        def get(value):
+            if value < 0:
+                return constants[-value - 1]
+            name = values[value]
+            return g[name] if name[0] == "@" else frame[value]
+
+        def put(value, v):
+            name = values[value]
+            if name[0] == "@":
+                g[name] = v
+            else:
+                frame[value] = v
+
+        code = function.code
+        params = []
+        b = 0
+        while True:
+            for i in function.block(b):
+                op, d, a, c = code[4 * i:4 * i + 4]
+                if op in self.arithmetic:
+                    v = self.arithmetic[op](get(a), get(c))
+                    put(d, runtime.c_int(v) if typenames[d] == "int" else v)
+                elif op in self.comparisons:
+                    left, right = get(a), get(c)
+                    if isinstance(left, (int, str)):
+                        put(d, self.comparisons[op](left, right))
+                    else:
+                        put(d, (left is right) == (op == ir.EQ))
+                elif op == ir.NEG:
+                    v = -get(a)
+                    put(d, runtime.c_int(v) if typenames[d] == "int" else v)
+                elif op == ir.NOT:
+                    put(d, not get(a))
+                elif op == ir.MOVE:
+                    put(d, get(a))
+                elif op == ir.ALOAD:
+                    array, index = get(a), get(c)
+                    if not 0 <= index < len(array):
+                        raise IndexError
+                    put(d, array[index])
+                elif op == ir.ASTORE:
+                    array, index = get(d), get(a)
+                    if not 0 <= index < len(array):
+                        raise IndexError
+                    array[index] = get(c)
+                elif op == ir.ROW:
+                    array, start = get(a), get(c)
+                    size = runtime.flat_size(function.types[d])
+                    if not 0 <= start <= len(array) - size:
+                        raise IndexError
+                    put(d, memoryview(array)[start:start + size])
+                elif op == ir.NEWARR:
+                    put(d, runtime.new_array(function.types[d], list(get(a))))
+                elif op == ir.PARAM:
+                    params.append(get(d))
+                elif op == ir.CALL:
+                    values_passed = params[len(params) - c:]
+                    del params[len(params) - c:]
+                    put(d, self.call(a, values_passed))
+                elif op == ir.PRINT:
+                    self.output.chunks.append(runtime.FORMATS[ir.PRINT_TYPES[d]](get(a)))
+                elif op == ir.READ:
+                    put(d, runtime.reader(self.input, ir.READ_TYPES[a])())
+                elif op == ir.JUMP:
+                    b = d
+                elif op == ir.CJUMP:
+                    b = a if get(d) else c
+                elif op == ir.RETURN:
+                    return get(d)
+                elif op == ir.LEAVE:
+                    return None
+                elif op == ir.FAIL:
+                    raise runtime.AssertionFailed(types.SimpleNamespace(line=d, column=a))
+
+
+def bench_ir(sizes, seed=0, runs=3, programs=5, size=16.0):
+    """Throughput of the generation of the three-address code of uc_ir.py
+    over checked programs of ProgramGenerator of sizes KB, the size of its
+    basic blocks and graphs, and the memory of its code against a list of
+    tuples per instruction. The IR of each program is verified first, and
+    the IRInterpreter must print what the semantic_programs and the
+    classic_programs expect, and what uc_exec.py prints for programs
+    generated programs of size KB."""
+    import uc_exec
+    import uc_ir
+
+    for name, text, stdin, expected in semantic_programs():
+        result = _engine_output(IRInterpreter(uc_ir.generate(_checked_program(text))), stdin)
+        if result != (0, expected):
+            raise AssertionError("%s: %r, not %r" % (name, result, (0, expected)))
+    for name, text, expected in classic_programs(1000, 5, 10):
+        result = _engine_output(IRInterpreter(uc_ir.generate(_checked_program(text))))
+        if result != (0, expected):
+            raise AssertionError("%s: %r, not %r" % (name, result, (0, expected)))
+    for seed_ in range(programs):
+        program = _checked_program(program_source(int(size * 1024), seed_))
+        module = uc_ir.generate(program)
+        uc_ir.verify(module)
+        # the generated programs read an int, a char and an int
+        expected = _engine_output(uc_exec.compile_program(program), "7 z 3\n")
+        result = _engine_output(IRInterpreter(module), "7 z 3\n")
+        if result != expected:
+            raise AssertionError("generated program %d: IR %r, uc_exec %r" % (seed_, result, expected))
+    print("%d semantic, %d classic and %d generated programs of %g KB: same output"
+          % (len(semantic_programs()), len(classic_programs(1000, 5, 10)), programs, size))
+
+    tuple_size = sys.getsizeof((0, 0, 0, 0)) + 8
+    print("%8s %9s %8s %8s %12s %9s %12s %8s %11s %9s" % (
+        "size", "functions", "blocks", "edges", "instructions", "time (s)", "instr/s", "KB/s",
+        "array/tuple", "dump (s)"))
+    for size in sizes:
+        text = program_source(int(size * 1024), seed)
+        program = _checked_program(text)
+        generate_time = None
+        for _ in range(runs):
+            elapsed, module = _timeit(uc_ir.generate, program)
+            generate_time = elapsed if generate_time is None else min(generate_time, elapsed)
+        uc_ir.verify(module)
+        functions = module.functions
+        ninstructions = sum(len(function) for function in functions)
+        nblocks = sum(len(function.starts) for function in functions)
+        nedges = sum(len(function.edges()) for function in functions)
+        code_bytes = sum(sys.getsizeof(function.code) for function in functions)
+        dump_time, _ = _timeit(uc_ir.dump, module)
+        print("%6gKB %9d %8d %8d %12d %9.3f %12.0f %8.0f %5.1f / %-3d %9.3f" % (
+            size, len(functions), nblocks, nedges, ninstructions, generate_time,
+            ninstructions / generate_time, len(text) / 1024 / generate_time, code_bytes / ninstructions,
+            tuple_size, dump_time))
+
+
+def bench_importtime(budget=100.0, runs=5):
+    """Cumulative import time of `ucc.py --lex` in a new interpreter
+    (python -X importtime), failing when it exceeds budget ms or when the
+    lex stage imports the parser, AST or semantic modules."""
+    import subprocess
+
+    with tempfile.NamedTemporaryFile("w", suffix=".uc", delete=False) as f:
+        f.write("int main () { return 0; }\n")
+    try:
+        totals = []
+        for run in range(runs):
+            out = subprocess.run([sys.executable, "-X", "importtime", "ucc.py", "--lex", f.name],
+                                 cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                 universal_newlines=True, check=True)
+            imports = []
+            for line in out.stderr.splitlines():
+                if not line.startswith("import time:") or "imported package" in line:
+                    continue
+                _, cumulative, name = line[len("import time:"):].split("|")
+                imports.append((name.rstrip(), int(cumulative)))
+            # nested imports are indented, their time is in the cumulative of their parent
+            totals.append(sum(us for name, us in imports if not name.startswith("  ")) / 1000)
+    finally:
+        os.unlink(f.name)
+
+    modules = {name.strip() for name, us in imports}
+    top = sorted((us, name.strip()) for name, us in imports if not name.startswith("  "))[-5:]
+    print("ucc.py --lex  imports %7.1f ms  (budget %.1f ms)" % (min(totals), budget))
+    for us, name in reversed(top):
+        print("    %-20s %7.1f ms" % (name, us / 1000))
+    eager = modules & {"uc_parsetab", "uc_ast_correto", "uc_sema"}
+    if eager:
+        sys.exit("the lex stage imports %s" % ", ".join(sorted(eager)))
+    if min(totals) > budget:
+        sys.exit("import time over budget")
+
+
+def main(args=None):
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = argparser.add_subparsers(dest="command", required=True)
+
+    cmd = commands.add_parser("columns", help=bench_columns.__doc__.splitlines()[0])
+    cmd.add_argument("--sizes", type=float, nargs="+", default=[1, 50], help="input sizes in MB")
+    cmd.add_argument("--one-line", action="store_true", help="put the whole program in a single line")
+    cmd.set_defaults(func=lambda a: bench_columns(a.sizes, a.one_line))
+
+    cmd = commands.add_parser("lexers", help=bench_lexers.__doc__.splitlines()[0])
+    cmd.add_argument("--sizes", type=float, nargs="+", default=[1, 10], help="input sizes in MB")
+    cmd.add_argument("--cases", type=int, default=5000, help="number of fuzzed inputs to compare")
+    cmd.add_argument("--seed", type=int, default=0)
+    cmd.set_defaults(func=lambda a: bench_lexers(a.sizes, a.cases, a.seed))
+
+    cmd = commands.add_parser("stream", help=bench_stream.__doc__.splitlines()[0])
+    cmd.add_argument("--size", type=float, default=20, help="input size in MB")
+    cmd.add_argument("--chunk-size", type=int, default=1 << 20, help="characters read at a time")
+    cmd.add_argument("--cases", type=int, default=2000, help="number of fuzzed inputs to compare")
+    cmd.add_argument("--seed", type=int, default=0)
+    cmd.set_defaults(func=lambda a: bench_stream(a.size, a.chunk_size, a.cases, a.seed))
+
+    cmd = commands.add_parser("packed", help=bench_packed.__doc__.splitlines()[0])
+    cmd.add_argument("--tokens", type=int, default=1000000, help="approximate number of tokens")
+    cmd.add_argument("--cases", type=int, default=2000, help="number of fuzzed inputs to compare")
+    cmd.add_argument("--seed", type=int, default=0)
+    cmd.set_defaults(func=lambda a: bench_packed(a.tokens, a.cases, a.seed))
+
+    cmd = commands.add_parser("startup", help=bench_startup.__doc__.splitlines()[0])
+    cmd.add_argument("--runs", type=int, default=5)
+    cmd.set_defaults(func=lambda a: bench_startup(a.runs))
+
+    cmd = commands.add_parser("incremental", help=bench_incremental.__doc__.splitlines()[0])
+    cmd.add_argument("--lines", type=int, default=20000, help="approximate lines of the edited file")
+    cmd.add_argument("--edits", type=int, default=100, help="timed edits of each kind")
+    cmd.add_argument("--cases", type=int, default=300, help="number of random edits to compare")
+    cmd.add_argument("--seed", type=int, default=0)
+    cmd.set_defaults(func=lambda a: bench_incremental(a.lines, a.edits, a.cases, a.seed))
+
+    cmd = commands.add_parser("diagnostics", help=bench_diagnostics.__doc__.splitlines()[0])
+    cmd.add_argument("--errors", type=int, default=50, help="number of semantic errors")
+    cmd.set_defaults(func=lambda a: bench_diagnostics(a.errors))
+
+    cmd = commands.add_parser("symtab", help=bench_symtab.__doc__.splitlines()[0])
+    cmd.add_argument("--depth", type=int, default=500, help="number of nested scopes")
+    cmd.add_argument("--names", type=int, default=100000, help="number of identifiers")
+    cmd.add_argument("--seed", type=int, default=0)
+    cmd.set_defaults(func=lambda a: bench_symtab(a.depth, a.names, a.seed))
+
+    cmd = commands.add_parser("visitors", help=bench_visitors.__doc__.splitlines()[0])
+    cmd.add_argument("--sizes", type=int, nargs="+", default=[2000, 20000, 200000],
+                     help="approximate numbers of AST nodes")
+    cmd.add_argument("--total", type=int, default=400000, help="nodes visited per timing")
+    cmd.set_defaults(func=lambda a: bench_visitors(a.sizes, a.total))
+
+    cmd = commands.add_parser("deep", help=bench_deep.__doc__.splitlines()[0])
+    cmd.add_argument("--nodes", type=int, default=200000, help="approximate number of nodes of the wide AST")
+    cmd.add_argument("--depth", type=int, default=100000, help="depth of the deep expression")
+    cmd.add_argument("--print-depth", type=int, default=4000, help="depth of the expression shown and represented")
+    cmd.add_argument("--runs", type=int, default=3)
+    cmd.set_defaults(func=lambda a: bench_deep(a.nodes, a.depth, a.print_depth, a.runs))
+
+    cmd = commands.add_parser("dump", help=bench_dump.__doc__.splitlines()[0])
+    cmd.add_argument("--nodes", type=int, default=200000, help="approximate number of AST nodes")
+    cmd.add_argument("--golden", help="directory of .uc files with the expected show output in .out files")
+    cmd.set_defaults(func=lambda a: bench_dump(a.nodes, a.golden))
+
+    cmd = commands.add_parser("astfile", help=bench_astfile.__doc__.splitlines()[0])
+    cmd.add_argument("--size", type=float, default=1, help="source size in MB")
+    cmd.add_argument("--cases", type=int, default=20, help="number of round trips to check")
+    cmd.add_argument("--runs", type=int, default=3)
+    cmd.add_argument("--seed", type=int, default=0)
+    cmd.set_defaults(func=lambda a: bench_astfile(a.size, a.cases, a.runs, a.seed))
+
+    cmd = commands.add_parser("cache", help=bench_cache.__doc__.splitlines()[0])
+    cmd.add_argument("--files", type=int, default=200, help="number of source files")
+    cmd.add_argument("--size", type=float, default=16, help="size of each file in KB")
+    cmd.add_argument("--seed", type=int, default=0)
+    cmd.set_defaults(func=lambda a: bench_cache(a.files, a.size, a.seed))
+
+    cmd = commands.add_parser("stats", help=bench_stats.__doc__.splitlines()[0])
+    cmd.add_argument("--size", type=float, default=1, help="source size in MB")
+    cmd.add_argument("--runs", type=int, default=3)
+    cmd.set_defaults(func=lambda a: bench_stats(a.size, a.runs))
+
+    cmd = commands.add_parser("arena", help=bench_arena.__doc__.splitlines()[0])
+    cmd.add_argument("--nodes", type=int, default=1000000, help="approximate number of AST nodes")
+    cmd.add_argument("--runs", type=int, default=3)
+    cmd.set_defaults(func=lambda a: bench_arena(a.nodes, a.runs))
+
+    cmd = commands.add_parser("types", help=bench_types.__doc__.splitlines()[0])
+    cmd.add_argument("--functions", type=int, default=5000, help="number of functions of the program")
+    cmd.add_argument("--runs", type=int, default=3)
+    cmd.set_defaults(func=lambda a: bench_types(a.functions, a.runs))
+
+    cmd = commands.add_parser("suite", help=bench_suite.__doc__.splitlines()[0])
+    cmd.add_argument("--sizes", type=float, nargs="+", default=[16, 256], help="program sizes in KB")
+    cmd.add_argument("--seed", type=int, default=0)
+    cmd.add_argument("--runs", type=int, default=5)
+    cmd.add_argument("--baseline", help="baseline file (default: $UCC_CACHE_DIR/bench/baseline.json)")
+    cmd.add_argument("--save", action="store_true", help="store the results as the baseline")
+    cmd.add_argument("--tolerance", type=float, default=0.2, help="slowdown accepted, as a fraction")
+    cmd.set_defaults(func=lambda a: bench_suite(a.sizes, a.seed, a.runs, a.baseline, a.save, a.tolerance))
+
+    cmd = commands.add_parser("labels", help=bench_labels.__doc__.splitlines()[0])
+    cmd.add_argument("--size", type=float, default=256, help="program size in KB")
+    cmd.add_argument("--seed", type=int, default=0)
+    cmd.add_argument("--runs", type=int, default=5)
+    cmd.set_defaults(func=lambda a: bench_labels(a.size, a.seed, a.runs))
+
+    cmd = commands.add_parser("exec", help=bench_exec.__doc__.splitlines()[0])
+    cmd.add_argument("--sieve", type=int, default=100000, help="bound of the primes of the sieve")
+    cmd.add_argument("--matrix", type=int, default=40, help="size of the matrices multiplied")
+    cmd.add_argument("--fib", type=int, default=22, help="Fibonacci number computed recursively")
+    cmd.add_argument("--runs", type=int, default=3)
+    cmd.set_defaults(func=lambda a: bench_exec(a.sieve, a.matrix, a.fib, a.runs))
+
+    cmd = commands.add_parser("vm", help=bench_vm.__doc__.splitlines()[0])
+    cmd.add_argument("--sieve", type=int, default=100000, help="bound of the primes of the sieve")
+    cmd.add_argument("--matrix", type=int, default=40, help="size of the matrices multiplied")
+    cmd.add_argument("--fib", type=int, default=22, help="Fibonacci number computed recursively")
+    cmd.add_argument("--programs", type=int, default=5, help="generated programs checked")
+    cmd.add_argument("--size", type=float, default=16, help="size of the generated programs in KB")
+    cmd.add_argument("--runs", type=int, default=3)
+    cmd.set_defaults(func=lambda a: bench_vm(a.sieve, a.matrix, a.fib, a.programs, a.size, a.runs))
+
+    cmd = commands.add_parser("pygen", help=bench_pygen.__doc__.splitlines()[0])
+    cmd.add_argument("--sieve", type=int, default=100000, help="bound of the primes of the sieve")
+    cmd.add_argument("--matrix", type=int, default=40, help="size of the matrices multiplied")
+    cmd.add_argument("--fib", type=int, default=22, help="Fibonacci number computed recursively")
+    cmd.add_argument("--runs", type=int, default=3)
+    cmd.set_defaults(func=lambda a: bench_pygen(a.sieve, a.matrix, a.fib, a.runs))
+
+    cmd = commands.add_parser("cgen", help=bench_cgen.__doc__.splitlines()[0])
+    cmd.add_argument("--sieve", type=int, default=100000, help="bound of the primes of the sieve")
+    cmd.add_argument("--matrix", type=int, default=40, help="size of the matrices multiplied")
+    cmd.add_argument("--fib", type=int, default=22, help="Fibonacci number computed recursively")
+    cmd.add_argument("--programs", type=int, default=5, help="generated programs compared with uc_exec")
+    cmd.add_argument("--size", type=float, default=16.0, help="size of the generated programs in KB")
+    cmd.add_argument("--runs", type=int, default=3)
+    cmd.set_defaults(func=lambda a: bench_cgen(a.sieve, a.matrix, a.fib, a.programs, a.size, a.runs))
+
+    cmd = commands.add_parser("ir", help=bench_ir.__doc__.splitlines()[0])
+    cmd.add_argument("--sizes", type=float, nargs="+", default=[64, 256], help="program sizes in KB")
+    cmd.add_argument("--seed", type=int, default=0)
+    cmd.add_argument("--runs", type=int, default=3)
+    cmd.add_argument("--programs", type=int, default=5, help="number of generated programs run")
+    cmd.add_argument("--size", type=float, default=16.0, help="size of the generated programs run in KB")
+    cmd.set_defaults(func=lambda a: bench_ir(a.sizes, a.seed, a.runs, a.programs, a.size))
+
+    cmd = commands.add_parser("importtime", help=bench_importtime.__doc__.splitlines()[0])
+    cmd.add_argument("--budget", type=float, default=100.0, help="maximum import time in ms")
+    cmd.add_argument("--runs", type=int, default=5)
+    cmd.set_defaults(func=lambda a: bench_importtime(a.budget, a.runs))
+
+    args = argparser.parse_args(args)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
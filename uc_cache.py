@@ -0,0 +1,222 @@
+"""On-disk cache of what the compiler stages produce from each source, so
+rebuilding an unchanged file does not lex, parse or check it again.
+
+Entries are named after a hash of the source text and of the compiler
+(the files of the lexer, the parsers, the AST, the semantic analysis and
+the engines of ucc --run), so editing either one makes new entries. For
+each source there is one file per stage that was run over it:
+
+    <key>.lex       the tokens, with the lexical errors printed between them
+    <key>.parse     the tuple parse tree of P2 and the errors printed
+    <key>.ast       the errors printed parsing the Program, and
+    <key>.astfile   the Program itself, in the format of uc_astfile
+    <key>.sema      the semantic diagnostics and the uc_type of each node
+    <key>.uc_vm     the program compiled by an engine of ucc --run that
+    <key>.uc_pygen  can save it (see uc_vm.py, uc_pygen.py, uc_cgen.py),
+    <key>.uc_cgen   with the errors printed parsing it
+
+The cache is kept under a size limit by removing the files used least
+recently (see evict); a hit refreshes the modification time of its file.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+
+import sly
+
+from uc_parsetab import cache_dir
+
+# Bump when the format of the entries changes
+CACHE_VERSION = 1
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+# files of the compiler, relative to this one, that the entries depend on
+COMPILER_FILES = (
+    "P1_correto análise léxica.py",
+    "P2_atualizado.py",
+    "P3 correto - UCParse",
+    "uc_ast_correto.py",
+    "uc_astfile.py",
+    "uc_parsetab.py",
+    "uc_sema.py",
+    "uc_ir.py",
+    "uc_runtime.py",
+    "uc_exec.py",
+    "uc_vm.py",
+    "uc_pygen.py",
+    "uc_cgen.py",
+    "uc_cache.py",
+    "ucc.py",
+)
+
+_compiler_version = None
+
+
+def compiler_version():
+    """Hash of the files of the compiler, computed once per process."""
+    global _compiler_version
+    if _compiler_version is None:
+        digest = hashlib.sha256(repr((CACHE_VERSION, sly.__version__)).encode())
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in COMPILER_FILES:
+            with open(os.path.join(here, name), "rb") as f:
+                digest.update(f.read())
+        _compiler_version = digest.digest()
+    return _compiler_version
+
+
+def encode_type(uc_type):
+    """A uCType as nested tuples of strings and sizes, for pickling."""
+    # imported here so the lexing stage does not load the semantic analysis
+    from uc_sema import ArrayType, FunctionType
+
+    if isinstance(uc_type, ArrayType):
+        return ("array", encode_type(uc_type.type), uc_type.size)
+    if isinstance(uc_type, FunctionType):
+        return ("function", encode_type(uc_type.type), [encode_type(param) for param in uc_type.params])
+    return uc_type.typename
+
+
+def decode_type(value):
+    """The uCType encoded by encode_type."""
+    from uc_sema import BASIC_TYPES, ArrayType, ErrorType, FunctionType, VoidType
+
+    if isinstance(value, tuple):
+        if value[0] == "array":
+            return ArrayType(decode_type(value[1]), value[2])
+        return FunctionType(decode_type(value[1]), [decode_type(param) for param in value[2]])
+    for uc_type in BASIC_TYPES + (VoidType, ErrorType):
+        if uc_type.typename == value:
+            return uc_type
+    raise ValueError("unknown type %r" % (value,))
+
+
+class CompilationCache:
+    """The entries of the cache in directory ($UCC_CACHE_DIR/build or
+    ~/.cache/ucc/build by default), which are kept under max_size bytes.
+    hits and misses count the entries found and not found."""
+
+    def __init__(self, directory=None, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory or os.path.join(cache_dir(), "build")
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, text):
+        """Key of the entries of the source text."""
+        return hashlib.sha256(compiler_version() + text.encode("utf-8", "surrogatepass")).hexdigest()
+
+    def path(self, key, kind):
+        return os.path.join(self.directory, "%s.%s" % (key, kind))
+
+    def _hit(self, path):
+        self.hits += 1
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def load(self, key, kind):
+        """The value stored for the stage kind of key, or None."""
+        path = self.path(key, kind)
+        try:
+            with open(path, "rb") as f:
+                data = pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError, AttributeError, ValueError):
+            data = None
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            self.misses += 1
+            return None
+        self._hit(path)
+        return data["value"]
+
+    def _write(self, path, write):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    result = write(f)
+                os.replace(tmp, path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError:
+            return None  # the cache is an optimization, compiling works without it
+        return result
+
+    def store(self, key, kind, value):
+        """Store value for the stage kind of key."""
+        self._write(self.path(key, kind), lambda f: pickle.dump(
+            {"version": CACHE_VERSION, "value": value}, f, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def load_program(self, key):
+        """The Program stored for key and the list of its nodes in the
+        order of store_program, or None."""
+        # imported here so the lexing stage does not load the AST classes
+        import uc_astfile
+
+        path = self.path(key, "astfile")
+        try:
+            with uc_astfile.ASTFile(path) as astfile:
+                nodes = astfile.nodes()
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self._hit(path)
+        return nodes[0], nodes
+
+    def store_program(self, key, program):
+        """Store the Program for key. Returns the list of its nodes in the
+        order that load_program gives them, or None if it was not stored."""
+        import uc_astfile
+
+        return self._write(self.path(key, "astfile"), lambda f: uc_astfile.dump(program, f))
+
+    def load_executable(self, key, engine):
+        """The program compiled by the module engine (uc_vm, uc_pygen...)
+        stored for key, the errors printed parsing its source and the
+        number of tokens, or None."""
+        entry = self.load(key, engine.__name__)
+        if entry is None:
+            return None
+        try:
+            return engine.loads(entry["code"]), entry["messages"], entry["ntokens"]
+        except ValueError:
+            return None
+
+    def store_executable(self, key, engine, executable, messages, ntokens):
+        """Store the program of key compiled by the module engine."""
+        self.store(key, engine.__name__, {"code": engine.dumps(executable), "messages": messages,
+                                          "ntokens": ntokens})
+
+    def evict(self):
+        """Remove the files used least recently until the cache is not
+        larger than max_size. Returns the number of files removed."""
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.is_file()]
+        except OSError:
+            return 0
+        files = []
+        size = 0
+        for entry in entries:
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+            size += stat.st_size
+        removed = 0
+        files.sort()
+        for mtime, file_size, path in files:
+            if size <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            size -= file_size
+            removed += 1
+        return removed
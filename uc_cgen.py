@@ -0,0 +1,850 @@
+"""Execution of checked uC programs as native code, written as C and built
+by the C compiler of the system.
+
+    diagnostics = Visitor(collect=True).check(program)   # none
+    executable = compile_program(program)
+    status = executable.run()
+
+c_source writes a Program as a C translation unit: a function per uC
+function, a static variable per global and the local variables as C
+locals, renamed as by uc_pygen.py (<name>_<n>, <name>_g, <name>_f) so
+that they do not clash with the keywords of C, the C library or the
+helpers of the runtime, which are named uc_*. The runtime is written at
+the start of each source: it prints and reads values as uc_runtime.py
+does and stops the program with the same messages and exit status on a
+failed assert or a run-time error (a division by zero, an index out of
+range, a value out of the range of int, too many nested calls, a read
+past the end of the input).
+
+int and char values are C long longs, the result of each int operation
+checked by uc_int to be in the range of int as the Python engines do,
+the elements of the arrays ints or unsigned chars and arrays are passed
+as a pointer and a number of elements, uc_ints or uc_chars. Each
+subscript is checked by uc_index against its own dimension. Strings are written as they are
+in the source, without unescaping them, and the operands of C whose order
+of evaluation is not defined are evaluated left to right through
+temporaries when a later one has side effects.
+
+The C compiler is $CC (cc by default). build keeps the binaries under
+$UCC_CACHE_DIR/c (~/.cache/ucc/c) by the hash of their source and of the
+command building them, so an unchanged program is built only once. dumps
+and loads convert an executable to and from the bytes of its C source,
+which ucc --cache keeps: running a cached program then neither compiles it
+nor builds it again.
+"""
+import hashlib
+import io
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+
+import uc_runtime
+from uc_ast_correto import ArrayRef, Assignment, Constant, ExprList, FuncCall, FuncDecl, GlobalDecl, ID, InitList
+from uc_parsetab import cache_dir
+
+MAGIC = b"UCC\0"
+FORMAT_VERSION = 1
+
+CFLAGS = ["-std=c99", "-O2", "-fwrapv", "-pthread"]
+
+# the binaries kept in the cache directory, the oldest are removed
+MAX_BINARIES = 64
+
+# calls nested deeper stop the program, as uc_vm.MAX_DEPTH
+MAX_DEPTH = 100000
+
+RUNTIME = r"""#include <ctype.h>
+#include <limits.h>
+#include <pthread.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+typedef struct { int *p; long long n; } uc_ints;
+typedef struct { unsigned char *p; long long n; } uc_chars;
+
+#define UC_MAX_DEPTH %(max_depth)dLL
+#define UC_STACK_SIZE ((size_t) 1 << 30)
+
+static long long uc_depth;
+
+static void uc_error(const char *message)
+{
+    printf("RuntimeError: %%s\n", message);
+    fflush(stdout);
+    exit(1);
+}
+
+static void uc_fail(int line, int column)
+{
+    printf("assertion_fail on %%d:%%d\n", line, column);
+    fflush(stdout);
+    exit(1);
+}
+
+static void uc_undefined(const char *name)
+{
+    printf("RuntimeError: function '%%s' is declared but not defined\n", name);
+    fflush(stdout);
+    exit(1);
+}
+
+static inline void uc_enter(void)
+{
+    if (++uc_depth > UC_MAX_DEPTH)
+        uc_error("too many nested calls");
+}
+
+static inline long long uc_return(long long value)
+{
+    uc_depth--;
+    return value;
+}
+
+static inline long long uc_index(long long index, long long size)
+{
+    if ((unsigned long long) index >= (unsigned long long) size)
+        uc_error("array index out of range");
+    return index;
+}
+
+static inline long long uc_int(long long value)
+{
+    if (value < INT_MIN || value > INT_MAX)
+        uc_error("value out of the range of its type");
+    return value;
+}
+
+static inline long long uc_div(long long a, long long b)
+{
+    if (b == 0)
+        uc_error("division by zero");
+    return b == -1 ? -a : a / b;
+}
+
+static inline long long uc_mod(long long a, long long b)
+{
+    if (b == 0)
+        uc_error("division by zero");
+    return b == -1 ? 0 : a %% b;
+}
+
+static void uc_print_int(long long value)
+{
+    printf("%%lld", value);
+}
+
+static void uc_print_char(long long code)
+{
+    /* as the Python engines, which write chr(code) in UTF-8 */
+    if (code < 0x80) {
+        putchar((int) code);
+    } else {
+        putchar((int) (0xc0 | code >> 6));
+        putchar((int) (0x80 | (code & 0x3f)));
+    }
+}
+
+static void uc_print_bool(long long value)
+{
+    fputs(value ? "true" : "false", stdout);
+}
+
+static void uc_print_string(const char *text)
+{
+    fputs(text, stdout);
+}
+
+static const char *uc_word(void)
+{
+    static char word[4096];
+    size_t n = 0;
+    int c;
+
+    /* the prompt printed before reading is shown first */
+    fflush(stdout);
+    do
+        c = getchar();
+    while (c != EOF && isspace(c));
+    if (c == EOF)
+        uc_error("read: end of input");
+    while (c != EOF && !isspace(c)) {
+        if (n < sizeof word - 1)
+            word[n++] = (char) c;
+        c = getchar();
+    }
+    word[n] = 0;
+    return word;
+}
+
+static long long uc_read_int(void)
+{
+    const char *word = uc_word();
+    char *end;
+    long long value = strtoll(word, &end, 10);
+
+    if (end == word || *end) {
+        printf("RuntimeError: read: '%%s' is not an int\n", word);
+        fflush(stdout);
+        exit(1);
+    }
+    return uc_int(value);
+}
+
+static long long uc_read_char(void)
+{
+    const unsigned char *word = (const unsigned char *) uc_word();
+
+    /* the code of the first character, '?' when it is not latin-1 */
+    if (word[0] < 0x80)
+        return word[0];
+    if ((word[0] == 0xc2 || word[0] == 0xc3) && (word[1] & 0xc0) == 0x80)
+        return (word[0] & 0x1f) << 6 | (word[1] & 0x3f);
+    return '?';
+}
+
+static long long uc_read_bool(void)
+{
+    const char *word = uc_word();
+
+    return strcmp(word, "0") != 0 && strcmp(word, "false") != 0;
+}
+"""
+
+MAIN = r"""
+static void *uc_main(void *status)
+{
+    uc_globals();
+    *(long long *) status = main_f();
+    return NULL;
+}
+
+int main(void)
+{
+    static char buffer[1 << 16];
+    long long status = 0;
+    pthread_attr_t attributes;
+    pthread_t thread;
+
+    setvbuf(stdout, buffer, _IOFBF, sizeof buffer);
+    /* the calls nest in a thread with a stack large enough for UC_MAX_DEPTH */
+    pthread_attr_init(&attributes);
+    if (pthread_attr_setstacksize(&attributes, UC_STACK_SIZE) != 0
+            || pthread_create(&thread, &attributes, uc_main, &status) != 0)
+        uc_main(&status);
+    else
+        pthread_join(thread, NULL);
+    fflush(stdout);
+    return (int) status;
+}
+"""
+
+# print of the values of each basic type, by typename
+_PRINTS = {"int": "uc_print_int", "char": "uc_print_char", "string": "uc_print_string",
+           "bool": "uc_print_bool"}
+
+_READERS = {"int": "uc_read_int()", "char": "uc_read_char()", "bool": "uc_read_bool()"}
+
+# the C types of the elements of the arrays and of the arrays passed
+_ELEMENTS = {"int": "int", "char": "unsigned char"}
+_ARRAYS = {"int": "uc_ints", "char": "uc_chars"}
+
+
+class BuildError(Exception):
+    """The C compiler could not build a program."""
+
+
+def _binary_directory():
+    return os.path.join(cache_dir(), "c")
+
+
+def build(source, directory=None):
+    """The path of the binary of the C source, built by $CC unless it is in
+    directory ($UCC_CACHE_DIR/c by default). Raises BuildError when the C
+    compiler is missing or fails."""
+    directory = directory or _binary_directory()
+    command = [os.environ.get("CC") or "cc"] + CFLAGS
+    key = hashlib.sha256(("\0".join(command) + "\0" + source).encode("utf-8", "surrogatepass")).hexdigest()
+    path = os.path.join(directory, key)
+    if os.path.exists(path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        try:
+            result = subprocess.run(command + ["-o", tmp, "-x", "c", "-"], input=source.encode("utf-8"),
+                                    capture_output=True)
+        except OSError as e:
+            raise BuildError("cannot run the C compiler %s: %s" % (command[0], e)) from None
+        if result.returncode:
+            raise BuildError("%s failed:\n%s" % (command[0], result.stderr.decode("utf-8", "replace")))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    evict(directory)
+    return path
+
+
+def evict(directory=None, keep=MAX_BINARIES):
+    """Remove the binaries used least recently from directory, keeping
+    keep of them. Returns the number of binaries removed."""
+    directory = directory or _binary_directory()
+    try:
+        entries = [entry for entry in os.scandir(directory) if entry.is_file() and "." not in entry.name]
+        entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    except OSError:
+        return 0
+    removed = 0
+    for entry in entries[keep:]:
+        try:
+            os.unlink(entry.path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def _fileno(file):
+    # the file descriptor of file, or None when it has none
+    try:
+        return file.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+class Executable:
+    """A compiled program: its C source and, once built, the path of its
+    binary. It can be run many times."""
+
+    def __init__(self, source):
+        self.source = source
+        self.binary = None
+
+    def build(self):
+        """The path of the binary of the program, built if needed."""
+        if self.binary is None:
+            self.binary = build(self.source)
+        return self.binary
+
+    def run(self, stdin=None, stdout=None):
+        """Run the program reading stdin and writing stdout (by default
+        sys.stdin and sys.stdout). Returns its exit status, or 1 when it
+        cannot be built, which is reported on stderr."""
+        try:
+            binary = self.build()
+        except BuildError as e:
+            print("ucc: %s" % e, file=sys.stderr)
+            return 1
+        stdin = sys.stdin if stdin is None else stdin
+        stdout = sys.stdout if stdout is None else stdout
+        # files are passed to the program, other streams copied through pipes
+        options = {}
+        if _fileno(stdin) is not None:
+            options["stdin"] = stdin
+        else:
+            options["input"] = stdin.read().encode("utf-8")
+        if _fileno(stdout) is not None:
+            stdout.flush()
+            options["stdout"] = stdout
+        else:
+            options["stdout"] = subprocess.PIPE
+        result = subprocess.run([binary], **options)
+        if result.stdout is not None:
+            stdout.write(result.stdout.decode("utf-8", "replace"))
+        if result.returncode < 0:
+            print("RuntimeError: stopped by %s" % signal.Signals(-result.returncode).name, file=stdout)
+            return 1
+        return result.returncode
+
+
+def c_source(program):
+    """The C source of the Program program, checked by the semantic
+    analysis without errors."""
+    writer = _Writer()
+    writer.program(program)
+    return writer.source()
+
+
+def compile_program(program):
+    """The Executable of the Program program, checked by the semantic
+    analysis without errors. It is built when it is first run."""
+    return Executable(c_source(program))
+
+
+def dumps(executable):
+    """The bytes of the C source of executable."""
+    return MAGIC + bytes((FORMAT_VERSION,)) + executable.source.encode("utf-8", "surrogatepass")
+
+
+def loads(data):
+    """The Executable of the bytes data made by dumps. Raises ValueError
+    when data is not one."""
+    data = bytes(data)
+    if data[:len(MAGIC)] != MAGIC or data[len(MAGIC):len(MAGIC) + 1] != bytes((FORMAT_VERSION,)):
+        raise ValueError("not the C source of a uC program")
+    try:
+        return Executable(data[len(MAGIC) + 1:].decode("utf-8", "surrogatepass"))
+    except UnicodeDecodeError as e:
+        raise ValueError("invalid C source of a uC program: %s" % e) from None
+
+
+def c_string(text):
+    """The C string literal of text, its characters in UTF-8."""
+    parts = []
+    for byte in text.encode("utf-8", "surrogatepass"):
+        # ? is escaped against the trigraphs of C99
+        if 32 <= byte < 127 and byte not in b'"\\?':
+            parts.append(chr(byte))
+        else:
+            parts.append("\\%03o" % byte)
+    return '"%s"' % "".join(parts)
+
+
+def _impure(node):
+    """Whether evaluating the expression node may call a function or
+    assign a variable."""
+    if isinstance(node, (FuncCall, Assignment)):
+        return True
+    return any(_impure(child) for _, child in node.children())
+
+
+def _comma(prefix, expr):
+    # expr evaluated after the C expressions prefix
+    return "(%s, %s)" % (", ".join(prefix), expr) if prefix else expr
+
+
+def _arguments(node):
+    # the expressions of the arguments of a FuncCall, print or read
+    if node is None:
+        return []
+    return list(node.exprs) if isinstance(node, ExprList) else [node]
+
+
+class _Writer:
+    """Writes the C source of a program, see the module documentation. The
+    scopes map the names visible to their kind ("local", "global", "param"
+    or "function"), C name and uc_type."""
+
+    def __init__(self):
+        self.lines = []
+        # the initializations of the globals that are not constants
+        self.globals = []
+        self.scopes = [{}]
+        # uC name -> C prototype of the functions declared, and the defined ones
+        self.functions = {}
+        self.defined = set()
+        self.nlocals = 0
+        # the temporaries used by the statement written, and by its function
+        self.ntemps = 0
+        self.max_temps = 0
+        self.global_temps = 0
+
+    def source(self):
+        lines = [RUNTIME % {"max_depth": MAX_DEPTH}]
+        lines.extend("static long long %s;" % prototype for prototype in self.functions.values())
+        lines.append("")
+        lines.extend(self.lines)
+        for name, prototype in self.functions.items():
+            if name not in self.defined:
+                lines.append("static long long %s\n{\n    uc_undefined(%s);\n    return 0;\n}\n"
+                             % (prototype, c_string(name)))
+        if "main" not in self.defined:
+            lines.append("static long long main_f(void)\n{\n    uc_error(\"the program has no main "
+                         "function\");\n    return 0;\n}\n")
+        lines.append("static void uc_globals(void)\n{")
+        if self.global_temps:
+            lines.append("    long long %s;" % ", ".join("uc_t%d" % (n + 1) for n in range(self.global_temps)))
+        lines.extend(self.globals)
+        lines.append("}")
+        lines.append(MAIN)
+        return "\n".join(lines)
+
+    def line(self, depth, text):
+        self.lines.append("    " * depth + text)
+
+    def lookup(self, name):
+        for scope in reversed(self.scopes):
+            location = scope.get(name)
+            if location is not None:
+                return location
+        raise uc_runtime.UCRuntimeError("'%s' is not defined" % name)
+
+    def temp(self):
+        # a new temporary of the statement written
+        self.ntemps += 1
+        self.max_temps = max(self.max_temps, self.ntemps)
+        return "uc_t%d" % self.ntemps
+
+    # declarations
+
+    def program(self, node):
+        for gdecl in node.gdecls:
+            if isinstance(gdecl, GlobalDecl):
+                for decl in gdecl.decls:
+                    self.global_decl(decl)
+            else:
+                self.function(gdecl)
+
+    def declare_function(self, node):
+        """Declare the function of the Decl node, returning its C name."""
+        name = node.name.name
+        c_name = name + "_f"
+        if name not in self.functions:
+            args = node.type.args
+            params = [self.c_declaration(param.attrs['uc_type'], "") for param in args.params] if args else []
+            self.functions[name] = "%s(%s)" % (c_name, ", ".join(params) or "void")
+        self.scopes[-1][name] = ("function", c_name, None)
+        return c_name
+
+    def c_declaration(self, uc_type, c_name):
+        # the C declaration of the scalar or array parameter c_name
+        if hasattr(uc_type, "size"):
+            return ("%s %s" % (_ARRAYS[uc_runtime.element_typename(uc_type)], c_name)).rstrip()
+        return ("long long %s" % c_name).rstrip()
+
+    def global_decl(self, node):
+        name = node.name.name
+        if isinstance(node.type, FuncDecl):
+            self.declare_function(node)
+            return
+        c_name = name + "_g"
+        uc_type = node.attrs['uc_type']
+        self.scopes[0][name] = ("global", c_name, uc_type)
+        if hasattr(uc_type, "size"):
+            self.line(0, "static " + self.array_declaration(node, c_name))
+            return
+        init = node.init
+        if isinstance(init, InitList):
+            init = init.exprs[0]
+        if init is None or isinstance(init, Constant):
+            self.line(0, "static long long %s = %s;" % (c_name, self.expr(init) if init is not None else "0"))
+            return
+        self.line(0, "static long long %s;" % c_name)
+        self.ntemps = 0
+        self.globals.append("    %s = %s;" % (c_name, self.expr(init)))
+        self.global_temps = max(self.global_temps, self.ntemps)
+
+    def array_declaration(self, node, c_name):
+        """The C declaration of the array variable c_name of the Decl node,
+        with its initial elements."""
+        uc_type = node.attrs['uc_type']
+        size = uc_runtime.flat_size(uc_type)
+        values = uc_runtime.initial_values(node.init) if node.init is not None else []
+        # the zeros at the end are the ones of C
+        while values and not values[-1]:
+            values.pop()
+        return "%s %s[%d] = {%s};" % (_ELEMENTS[uc_runtime.element_typename(uc_type)], c_name, max(size, 1),
+                                      ", ".join(map(str, values)) or "0")
+
+    def function(self, node):
+        name = node.decl.name.name
+        c_name = self.declare_function(node.decl)
+        self.defined.add(name)
+        args = node.decl.type.args
+        params = args.params if args is not None else ()
+        # the parameters and the declarations of the body share a scope
+        self.scopes.append({})
+        self.nlocals = 0
+        self.max_temps = 0
+        names = [self.new_local(param.name.name, param.attrs['uc_type'], "param") for param in params]
+        self.line(0, "static long long %s(%s)" % (c_name, ", ".join(
+            self.c_declaration(param.attrs['uc_type'], c_name) for param, c_name in zip(params, names))
+            or "void"))
+        self.line(0, "{")
+        start = len(self.lines)
+        self.line(1, "uc_enter();")
+        for statement in node.statements.dcls + node.statements.stmts:
+            self.statement(statement, 1)
+        self.line(1, "return uc_return(0);")
+        if self.max_temps:
+            self.lines.insert(start, "    long long %s;" % ", ".join(
+                "uc_t%d" % (n + 1) for n in range(self.max_temps)))
+        self.line(0, "}")
+        self.line(0, "")
+        self.scopes.pop()
+
+    def new_local(self, name, uc_type, kind="local"):
+        self.nlocals += 1
+        c_name = "%s_%d" % (name, self.nlocals)
+        if kind == "local" or hasattr(uc_type, "size"):
+            self.scopes[-1][name] = (kind, c_name, uc_type)
+        else:
+            # a scalar parameter is a local like the others
+            self.scopes[-1][name] = ("local", c_name, uc_type)
+        return c_name
+
+    # statements
+
+    def statement(self, node, depth):
+        self.ntemps = 0
+        compile = getattr(self, "stmt_" + node.__class__.__name__, None)
+        if compile is None:
+            self.expr_statement(node, depth)
+        else:
+            compile(node, depth)
+
+    def block(self, node, depth):
+        """The statement node as the braced body of a statement of C."""
+        self.lines[-1] += " {"
+        if node is not None:
+            self.statement(node, depth + 1)
+        self.line(depth, "}")
+
+    def expr_statement(self, node, depth):
+        if isinstance(node, ExprList):
+            for expr in node.exprs:
+                self.expr_statement(expr, depth)
+        else:
+            self.line(depth, "%s;" % self.expr(node))
+
+    def stmt_Decl(self, node, depth):
+        if isinstance(node.type, FuncDecl):
+            self.declare_function(node)
+            return
+        uc_type = node.attrs['uc_type']
+        # the name is visible in its initializer, as in the semantic analysis
+        c_name = self.new_local(node.name.name, uc_type)
+        if hasattr(uc_type, "size"):
+            self.line(depth, self.array_declaration(node, c_name))
+            return
+        init = node.init
+        if isinstance(init, InitList):
+            init = init.exprs[0]
+        self.line(depth, "long long %s = %s;" % (c_name, self.expr(init) if init is not None else "0"))
+
+    def stmt_DeclList(self, node, depth):
+        for decl in node.decls:
+            self.statement(decl, depth)
+
+    def stmt_Compound(self, node, depth):
+        self.scopes.append({})
+        self.line(depth, "{")
+        for statement in node.dcls + node.stmts:
+            self.statement(statement, depth + 1)
+        self.line(depth, "}")
+        self.scopes.pop()
+
+    def stmt_EmptyStatement(self, node, depth):
+        pass
+
+    def stmt_If(self, node, depth):
+        self.line(depth, "if (%s)" % self.expr(node.cond))
+        self.block(node.if_statements, depth)
+        if node.else_statements is not None:
+            self.lines[-1] += " else"
+            self.block(node.else_statements, depth)
+
+    def stmt_While(self, node, depth):
+        self.line(depth, "while (%s)" % self.expr(node.cond))
+        self.block(node.statements, depth)
+
+    def stmt_For(self, node, depth):
+        # the declarations of the initialization belong to the loop
+        self.scopes.append({})
+        self.line(depth, "{")
+        if node.init is not None:
+            self.statement(node.init, depth + 1)
+        self.ntemps = 0
+        cond = self.expr(node.cond) if node.cond is not None else ""
+        # uC has no continue, the next expression ends each iteration
+        self.line(depth + 1, "for (; %s; %s)" % (cond, self.expr(node.next) if node.next is not None else ""))
+        self.block(node.statements, depth + 1)
+        self.line(depth, "}")
+        self.scopes.pop()
+
+    def stmt_Break(self, node, depth):
+        self.line(depth, "break;")
+
+    def stmt_Return(self, node, depth):
+        self.line(depth, "return uc_return(%s);" % (self.expr(node.expr) if node.expr is not None else "0"))
+
+    def stmt_Assert(self, node, depth):
+        coord = node.expr.coord
+        self.line(depth, "if (!%s)" % self.expr(node.expr))
+        self.line(depth + 1, "uc_fail(%d, %d);" % (coord.line, coord.column))
+
+    def stmt_Print(self, node, depth):
+        if node.expr is None:
+            self.line(depth, 'putchar(\'\\n\');')
+            return
+        exprs = _arguments(node.expr)
+        values = [self.expr(expr) for expr in exprs]
+        if any(map(_impure, exprs)):
+            # the values are all computed before the first one is written
+            for i, expr in enumerate(exprs):
+                if not isinstance(expr, Constant):
+                    temp = self.temp()
+                    self.line(depth, "%s = %s;" % (temp, values[i]))
+                    values[i] = temp
+        text = ""
+        for expr, value in zip(exprs, values):
+            typename = expr.attrs['uc_type'].typename
+            if isinstance(expr, Constant):
+                text += uc_runtime.FORMATS[typename](uc_runtime.constant_value(expr))
+                continue
+            if text:
+                self.line(depth, "fputs(%s, stdout);" % c_string(text))
+                text = ""
+            self.line(depth, "%s(%s);" % (_PRINTS[typename], value))
+        if text:
+            self.line(depth, "fputs(%s, stdout);" % c_string(text))
+
+    def sequenced(self, exprs):
+        """The C expressions of the values of exprs, which are evaluated
+        left to right: a value followed by an expression with side effects
+        is kept in a temporary, assigned by the comma operands returned in
+        front of the values."""
+        values = [self.expr(expr) for expr in exprs]
+        impure = [_impure(expr) for expr in exprs]
+        prefix = []
+        for i, expr in enumerate(exprs):
+            if (any(impure[i + 1:]) and not isinstance(expr, Constant)
+                    and not hasattr(expr.attrs['uc_type'], "size")):
+                temp = self.temp()
+                prefix.append("%s = %s" % (temp, values[i]))
+                values[i] = temp
+        return prefix, values
+
+    def stmt_Read(self, node, depth):
+        for expr in _arguments(node.expr):
+            self.line(depth, "%s;" % self.store(expr, _READERS[expr.attrs['uc_type'].typename]))
+
+    # expressions
+
+    def expr(self, node):
+        """The C expression of the expression node, in parentheses unless
+        it is a name, a constant or a call."""
+        return getattr(self, "expr_" + node.__class__.__name__)(node)
+
+    def expr_Constant(self, node):
+        if node.type == "string":
+            return c_string(uc_runtime.string_text(node.value))
+        value = uc_runtime.constant_value(node)
+        # the most negative long long is not a constant of C
+        return "%dLL" % value if value > 2 ** 31 - 1 else str(value)
+
+    def expr_ID(self, node):
+        kind, c_name, uc_type = self.lookup(node.name)
+        if kind in ("global", "local") and hasattr(uc_type, "size"):
+            return "((%s) {%s, %d})" % (_ARRAYS[uc_runtime.element_typename(uc_type)], c_name,
+                                        uc_runtime.flat_size(uc_type))
+        return c_name
+
+    def expr_BinaryOp(self, node):
+        op = node.op
+        uc_type = node.left.attrs['uc_type']
+        if hasattr(uc_type, "size"):
+            left, right = self.expr(node.left), self.expr(node.right)
+            return "(%s.p %s %s.p)" % (left, op, right)
+        if op in ("&&", "||"):
+            return "(%s %s %s)" % (self.expr(node.left), op, self.expr(node.right))
+        if op in ("/", "%"):
+            right = node.right
+            if isinstance(right, Constant) and uc_runtime.constant_value(right) not in (0, -1):
+                return "(%s %s %s)" % (self.expr(node.left), op, self.expr(right))
+            prefix, (left, right) = self.sequenced([node.left, node.right])
+            if op == "%":
+                return _comma(prefix, "uc_mod(%s, %s)" % (left, right))
+            # only INT_MIN / -1 is out of the range of int
+            return _comma(prefix, "uc_int(uc_div(%s, %s))" % (left, right))
+        prefix, (left, right) = self.sequenced([node.left, node.right])
+        if uc_type.typename == "int" and op in ("+", "-", "*"):
+            # two constants are ints of C, the operation is made on long longs
+            return _comma(prefix, "uc_int((long long) %s %s %s)" % (left, op, right))
+        return _comma(prefix, "(%s %s %s)" % (left, op, right))
+
+    def expr_UnaryOp(self, node):
+        value = self.expr(node.expr)
+        if node.op == "+":
+            return value
+        if node.op == "-" and not isinstance(node.expr, Constant):
+            return "uc_int(-%s)" % value
+        return "(%s%s)" % (node.op, value)
+
+    def expr_ExprList(self, node):
+        return "(%s)" % ", ".join(self.expr(expr) for expr in node.exprs)
+
+    def expr_Assignment(self, node):
+        return "(%s)" % self.store(node.lvalue, self.expr(node.rvalue), _impure(node.rvalue) or _impure(node.lvalue))
+
+    def store(self, node, value, impure=False):
+        """The C assignment of the C expression value to the variable or
+        element node. The value is computed first when impure, as it may
+        change the variables of the index."""
+        if isinstance(node, ID):
+            return "%s = %s" % (self.lookup(node.name)[1], value)
+        if node.attrs['uc_type'].typename == "int":
+            value = "uc_int(%s)" % value
+        if impure:
+            temp = self.temp()
+            return "%s = %s, %s = %s" % (temp, value, self.expr_ArrayRef(node), temp)
+        return "%s = %s" % (self.expr_ArrayRef(node), value)
+
+    def element(self, node):
+        """The C expressions of the elements and of the number of elements
+        of the array of the ArrayRef node, of the index of its element,
+        and the number of elements of its value when it is an array
+        itself, or None."""
+        subscripts = []
+        while isinstance(node, ArrayRef):
+            subscripts.append(node.subscript)
+            node = node.name
+        subscripts.reverse()
+        if isinstance(node, ID):
+            kind, c_name, _ = self.lookup(node.name)
+            if kind == "param":
+                data, size = c_name + ".p", c_name + ".n"
+            else:
+                data, size = c_name, str(uc_runtime.flat_size(node.attrs['uc_type']))
+        else:
+            base = self.expr(node)
+            data, size = base + ".p", base + ".n"
+        # the arrays of each dimension, outer to inner
+        uc_type = node.attrs['uc_type']
+        dimensions = []
+        while hasattr(uc_type, "size"):
+            dimensions.append(uc_type)
+            uc_type = uc_type.type
+        terms = []
+        offset = 0
+        for subscript, dimension in zip(subscripts, dimensions):
+            stride = uc_runtime.flat_size(dimension.type)
+            bound = dimension.size
+            if isinstance(subscript, Constant) and 0 <= uc_runtime.constant_value(subscript) \
+                    and (bound is None or uc_runtime.constant_value(subscript) < bound):
+                offset += uc_runtime.constant_value(subscript) * stride
+                continue
+            index = self.expr(subscript)
+            if bound is not None:
+                index = "uc_index(%s, %d)" % (index, bound)
+            terms.append(index if stride == 1 else "%s * %d" % (index, stride))
+        if offset or not terms:
+            terms.append(str(offset))
+        index = " + ".join(terms)
+        if dimensions[0].size is None:
+            # the number of elements of the array bounds an outer dimension
+            # of unknown size
+            index = "uc_index(%s, %s)" % (index, size)
+        rows = None
+        if len(subscripts) < len(dimensions):
+            rows = uc_runtime.flat_size(dimensions[len(subscripts) - 1].type)
+        return data, size, index, rows
+
+    def expr_ArrayRef(self, node):
+        data, _, index, rows = self.element(node)
+        if rows is None:
+            return "%s[%s]" % (data, index)
+        return "((%s) {%s + %s, %d})" % (_ARRAYS[uc_runtime.element_typename(node.attrs['uc_type'])],
+                                         data, index, rows)
+
+    def expr_FuncCall(self, node):
+        prefix, values = self.sequenced(_arguments(node.args))
+        return _comma(prefix, "%s(%s)" % (self.lookup(node.name.name)[1], ", ".join(values)))
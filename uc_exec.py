@@ -0,0 +1,572 @@
+"""Execution of checked uC programs by closures.
+
+    diagnostics = Visitor(collect=True).check(program)   # none
+    executable = compile_program(program)
+    status = executable.run()
+
+compile_program converts each node of the Program once into a Python
+closure taking the frame of the running call: the list of the values of
+the variables of its function, with the value returned in slot 0.
+Expressions return their value. Statements return None, or BREAK or
+RETURN when their flags say they can break a loop or return. Variables
+are resolved to their slot in the frame or in the globals, operators to
+the Python code of the operation on the types of their operands (from
+attrs['uc_type']), so a running program calls no visitor and tests no
+node class. See uc_runtime.py for the values and the input and output.
+
+The closures are made by functions generated from templates of Python
+code, once per template and shapes of its operands: a constant or a local
+or global variable, read in place, or the closure of an expression.
+
+With count=True every node run is counted in executable.operations, the
+measure of the work of a program that the benchmarks divide by the time.
+"""
+import textwrap
+
+import uc_runtime
+from uc_ast_correto import ArrayRef, Constant, ExprList, FuncDecl, GlobalDecl, ID, InitList
+from uc_runtime import AssertionFailed, FORMATS, Input, Output, UCRuntimeError
+
+# results of the statements that leave their block, which the templates
+# test as the literals 1 and 2
+BREAK = 1
+RETURN = 2
+
+# the code reading an operand of each shape, given its name
+_OPERAND = {"const": "{}", "local": "frame[{}]", "global": "g[{}]", "expr": "{}(frame)"}
+
+# the number of statements run by the closure of one block
+_BLOCK = 8
+
+
+class _Factories(dict):
+    """(template, shapes) -> function making the closures running template,
+    Python code where {0}, {1}... read the operands, of shapes. The
+    closures see the list of the globals as g."""
+
+    def __missing__(self, key):
+        template, shapes = key
+        names = ["x%d" % i for i in range(len(shapes))]
+        code = template.format(*[_OPERAND[shape].format(name) for shape, name in zip(shapes, names)])
+        source = "def make(%s):\n    def run(frame):\n%s\n    return run\n" % (
+            ", ".join(["g"] + names), textwrap.indent(code, " " * 8))
+        namespace = {}
+        exec(source, namespace)
+        make = self[key] = namespace["make"]
+        return make
+
+
+_factories = _Factories()
+
+
+def _add(operands, operand):
+    # the placeholder of operand, appended to operands
+    operands.append(operand)
+    return "{%d}" % (len(operands) - 1)
+
+
+def _statement_code(placeholder, flags):
+    """The code running the statement at placeholder in a block, leaving
+    the block with its result if its flags say it can."""
+    if not flags:
+        return placeholder
+    return "r = %s\nif r is not None:\n    return r" % placeholder
+
+
+def _loop_body_code(placeholder, flags):
+    # the code running the body of a loop
+    if not flags:
+        return placeholder
+    if flags == BREAK:
+        return "if %s is not None:\n    break" % placeholder
+    if flags == RETURN:
+        return "if %s is not None:\n    return 2" % placeholder
+    return "r = %s\nif r is not None:\n    if r == 1:\n        break\n    return r" % placeholder
+
+
+def _nothing(frame):
+    return None
+
+
+# the Python code of the binary operators on ints, strings and bools, of
+# the operands {left} and {right}
+_BINARY = {
+    "+": "return {left} + {right}",
+    "%": "a = {left}\nr = abs(a) % abs({right})\nreturn -r if a < 0 else r",
+    "<": "return {left} < {right}",
+    "<=": "return {left} <= {right}",
+    ">": "return {left} > {right}",
+    ">=": "return {left} >= {right}",
+    "==": "return {left} == {right}",
+    "!=": "return {left} != {right}",
+    "&&": "return {left} and {right}",
+    "||": "return {left} or {right}",
+}
+
+# the arithmetic operators on ints, whose value must be in the range of
+# int; only INT_MIN / -1 is not
+_INT_RANGE = "if %d <= v <= %d:\n    return v\nraise OverflowError" % (uc_runtime.INT_MIN, uc_runtime.INT_MAX)
+_INT_BINARY = {
+    "+": "v = {left} + {right}\n" + _INT_RANGE,
+    "-": "v = {left} - {right}\n" + _INT_RANGE,
+    "*": "v = {left} * {right}\n" + _INT_RANGE,
+    "/": "a = {left}\nb = {right}\nq = abs(a) // abs(b)\nif (a < 0) != (b < 0):\n    return -q\n"
+         "if q > %d:\n    raise OverflowError\nreturn q" % uc_runtime.INT_MAX,
+}
+
+# a / by a positive constant
+_DIVIDE_BY_POSITIVE = "a = {left}\nreturn a // {right} if a >= 0 else -(-a // {right})"
+
+# the operators whose operands are chars or arrays
+_CHAR_BINARY = {"&&": "return {left} != 0 and {right} != 0", "||": "return {left} != 0 or {right} != 0"}
+_ARRAY_BINARY = {"==": "return {left} is {right}", "!=": "return {left} is not {right}"}
+
+_UNARY = {"-": "v = -{left}\nif v > %d:\n    raise OverflowError\nreturn v" % uc_runtime.INT_MAX,
+          "+": "return {left}", "!": "return not {left}"}
+
+
+class Function:
+    """A function of a compiled program: the size of its frames and the
+    closure of its body."""
+
+    __slots__ = ("name", "nslots", "body")
+
+    def __init__(self, name):
+        self.name = name
+        self.nslots = 1
+        self.body = self.undefined
+
+    def undefined(self, frame):
+        raise UCRuntimeError("function '%s' is declared but not defined" % self.name)
+
+
+class Executable:
+    """A compiled program, see compile_program. It can be run many times."""
+
+    def __init__(self, functions, globals, inits, output, input, counter=None):
+        self.functions = functions
+        self.globals = globals
+        self.inits = inits
+        self.output = output
+        self.input = input
+        self._counter = counter
+
+    @property
+    def operations(self):
+        """The number of nodes run by the last runs, when counting."""
+        return self._counter[0] if self._counter is not None else None
+
+    def main(self):
+        """Initialize the globals and call main, returning its value."""
+        function = self.functions.get("main")
+        if function is None:
+            raise UCRuntimeError("the program has no main function")
+        frame = [0]
+        for init in self.inits:
+            init(frame)
+        frame = [0] * function.nslots
+        function.body(frame)
+        return frame[0]
+
+    def run(self, stdin=None, stdout=None):
+        """Run the program reading stdin and writing stdout (by default
+        sys.stdin and sys.stdout). Returns its exit status."""
+        if self._counter is not None:
+            self._counter[0] = 0
+        return uc_runtime.run(self.main, self.output, self.input, stdin, stdout)
+
+
+def compile_program(program, count=False):
+    """The Executable of the Program program, checked by the semantic
+    analysis without errors."""
+    compiler = _Compiler(count)
+    compiler.program(program)
+    return Executable(compiler.functions, compiler.g, compiler.inits,
+                      compiler.output, compiler.input, compiler.counter)
+
+
+class _Compiler:
+    """Makes the closures of the nodes of a program, see the module
+    documentation. The scopes map the names visible to their location:
+    ("local", slot), ("global", slot) or ("function", Function)."""
+
+    def __init__(self, count=False):
+        self.g = []
+        self.inits = []
+        self.functions = {}
+        self.scopes = [{}]
+        self.nslots = 0
+        self.output = Output()
+        self.input = Input(self.output)
+        self.counter = [0] if count else None
+
+    def closure(self, template, operands):
+        shapes = tuple(shape for shape, _ in operands)
+        return _factories[template, shapes](self.g, *[value for _, value in operands])
+
+    def counted(self, run):
+        if self.counter is None:
+            return run
+        counter = self.counter
+
+        def counted(frame):
+            counter[0] += 1
+            return run(frame)
+        return counted
+
+    def lookup(self, name):
+        for scope in reversed(self.scopes):
+            location = scope.get(name)
+            if location is not None:
+                return location
+        raise UCRuntimeError("'%s' is not defined" % name)
+
+    def new_slot(self):
+        self.nslots += 1
+        return self.nslots - 1
+
+    # declarations
+
+    def program(self, node):
+        for gdecl in node.gdecls:
+            if isinstance(gdecl, GlobalDecl):
+                for decl in gdecl.decls:
+                    self.global_decl(decl)
+            else:
+                self.function(gdecl)
+
+    def declare_function(self, name):
+        function = self.functions.get(name)
+        if function is None:
+            function = self.functions[name] = Function(name)
+        self.scopes[-1][name] = ("function", function)
+        return function
+
+    def global_decl(self, node):
+        if isinstance(node.type, FuncDecl):
+            self.declare_function(node.name.name)
+            return
+        slot = len(self.g)
+        self.g.append(0)
+        self.scopes[0][node.name.name] = ("global", slot)
+        operands = [("const", slot)]
+        self.inits.append(self.closure("g[{0}] = %s" % self.initializer(node, operands), operands))
+
+    def initializer(self, node, operands):
+        """The code of the initial value of the variable declared by the
+        Decl node, with its operands."""
+        uc_type = node.attrs['uc_type']
+        init = node.init
+        if hasattr(uc_type, "size"):
+            values = uc_runtime.initial_values(init) if init is not None else ()
+            return "%s[:]" % _add(operands, ("const", uc_runtime.new_array(uc_type, values)))
+        if init is None:
+            return "0"
+        if isinstance(init, InitList):
+            init = init.exprs[0]
+        return self.operand(init, operands)
+
+    def function(self, node):
+        function = self.declare_function(node.decl.name.name)
+        # the parameters and the declarations of the body share a scope
+        self.scopes.append({})
+        self.nslots = 1
+        args = node.decl.type.args
+        for param in args.params if args is not None else ():
+            self.scopes[-1][param.name.name] = ("local", self.new_slot())
+        body, _ = self.block(node.statements.dcls + node.statements.stmts)
+        function.body = body or _nothing
+        function.nslots = self.nslots
+        self.scopes.pop()
+
+    def local_decl(self, node):
+        if isinstance(node.type, FuncDecl):
+            self.declare_function(node.name.name)
+            return None, 0
+        # the name is visible in its initializer, as in the semantic analysis
+        slot = self.new_slot()
+        self.scopes[-1][node.name.name] = ("local", slot)
+        operands = [("const", slot)]
+        return self.counted(self.closure("frame[{0}] = %s" % self.initializer(node, operands), operands)), 0
+
+    # statements
+
+    def statement(self, node):
+        """The closure of the statement node and its flags, or None and 0
+        for a statement that does nothing."""
+        compile = getattr(self, "stmt_" + node.__class__.__name__, None)
+        if compile is None:
+            return self.expr(node), 0
+        return compile(node)
+
+    def block(self, nodes):
+        """The closure running the statements nodes in order, and its flags."""
+        items = [item for item in map(self.statement, nodes) if item[0] is not None]
+        while len(items) > _BLOCK:
+            items = [self.join(items[i:i + _BLOCK]) for i in range(0, len(items), _BLOCK)]
+        return self.join(items)
+
+    def join(self, items):
+        # the closure of the statements of items, with their flags
+        if not items:
+            return None, 0
+        if len(items) == 1:
+            return items[0]
+        operands = []
+        flags = 0
+        lines = []
+        for run, item_flags in items:
+            lines.append(_statement_code(_add(operands, ("expr", run)), item_flags))
+            flags |= item_flags
+        return self.closure("\n".join(lines), operands), flags
+
+    def stmt_Compound(self, node):
+        self.scopes.append({})
+        run, flags = self.block(node.dcls + node.stmts)
+        self.scopes.pop()
+        return (self.counted(run) if run is not None else None), flags
+
+    def stmt_Decl(self, node):
+        return self.local_decl(node)
+
+    def stmt_DeclList(self, node):
+        return self.block(node.decls)
+
+    def stmt_EmptyStatement(self, node):
+        return None, 0
+
+    def stmt_If(self, node):
+        operands = []
+        code = "if %s:\n" % self.condition(node.cond, operands)
+        then_run, then_flags = self.statement(node.if_statements)
+        code += "    %s%s" % ("return " if then_flags else "",
+                              _add(operands, ("expr", then_run)) if then_run else "pass")
+        flags = then_flags
+        if node.else_statements is not None:
+            else_run, else_flags = self.statement(node.else_statements)
+            if else_run is not None:
+                code += "\nelse:\n    %s%s" % ("return " if else_flags else "", _add(operands, ("expr", else_run)))
+                flags |= else_flags
+        return self.counted(self.closure(code, operands)), flags
+
+    def loop(self, node, init, next):
+        """The closure of the While or For node, with the closures init and
+        next run before the loop and after each iteration."""
+        operands = []
+        lines = []
+        if init is not None:
+            lines.append(_add(operands, ("expr", init)))
+        cond = self.condition(node.cond, operands) if node.cond is not None else "True"
+        lines.append("while %s:" % cond)
+        body, flags = self.statement(node.statements)
+        body_lines = []
+        if body is not None:
+            body_lines.append(_loop_body_code(_add(operands, ("expr", body)), flags))
+        if next is not None:
+            body_lines.append(_add(operands, ("expr", next)))
+        lines.append(textwrap.indent("\n".join(body_lines or ["pass"]), "    "))
+        return self.counted(self.closure("\n".join(lines), operands)), flags & RETURN
+
+    def stmt_While(self, node):
+        return self.loop(node, None, None)
+
+    def stmt_For(self, node):
+        # the declarations of the initialization belong to the loop
+        self.scopes.append({})
+        init = None
+        if node.init is not None:
+            init = self.statement(node.init)[0]
+        next = self.expr(node.next) if node.next is not None else None
+        run, flags = self.loop(node, init, next)
+        self.scopes.pop()
+        return run, flags
+
+    def stmt_Break(self, node):
+        return self.counted(self.closure("return 1", [])), BREAK
+
+    def stmt_Return(self, node):
+        if node.expr is None:
+            return self.counted(self.closure("return 2", [])), RETURN
+        operands = []
+        return self.counted(self.closure("frame[0] = %s\nreturn 2" % self.operand(node.expr, operands),
+                                         operands)), RETURN
+
+    def stmt_Assert(self, node):
+        operands = []
+        code = "if not %s:\n    raise %s(%s)" % (self.condition(node.expr, operands),
+                                                  _add(operands, ("const", AssertionFailed)),
+                                                  _add(operands, ("const", node.expr.coord)))
+        return self.counted(self.closure(code, operands)), 0
+
+    def stmt_Print(self, node):
+        output = self.output
+        operands = [("const", output.chunks.append), ("const", output.chunks),
+                    ("const", output.LIMIT), ("const", output.flush)]
+        if node.expr is None:
+            text = _add(operands, ("const", "\n"))
+        else:
+            exprs = node.expr.exprs if isinstance(node.expr, ExprList) else [node.expr]
+            parts = []
+            for expr in exprs:
+                typename = expr.attrs['uc_type'].typename
+                if isinstance(expr, Constant):
+                    parts.append(_add(operands, ("const", FORMATS[typename](uc_runtime.constant_value(expr)))))
+                elif typename == "string":
+                    parts.append(self.operand(expr, operands))
+                else:
+                    parts.append("%s(%s)" % (_add(operands, ("const", FORMATS[typename])),
+                                             self.operand(expr, operands)))
+            text = " + ".join(parts)
+        code = "{0}(%s)\nif len({1}) > {2}:\n    {3}()" % text
+        return self.counted(self.closure(code, operands)), 0
+
+    def stmt_Read(self, node):
+        exprs = node.expr.exprs if isinstance(node.expr, ExprList) else [node.expr]
+        lines = []
+        operands = []
+        for expr in exprs:
+            read = uc_runtime.reader(self.input, expr.attrs['uc_type'].typename)
+            lines.append("t = %s()" % _add(operands, ("const", read)))
+            lines.append("%s = t" % self.target(expr, operands))
+        return self.counted(self.closure("\n".join(lines), operands)), 0
+
+    # expressions
+
+    def expr(self, node):
+        """The closure of the expression node."""
+        operands = []
+        return self.counted(self.closure(self.expr_code(node, operands), operands))
+
+    def expr_code(self, node, operands):
+        # the code of the closure of the expression node
+        return getattr(self, "expr_" + node.__class__.__name__)(node, operands)
+
+    def operand(self, node, operands):
+        """The placeholder reading the value of the expression node, in place
+        for the constants and variables when not counting."""
+        if self.counter is None:
+            if isinstance(node, Constant):
+                return _add(operands, ("const", uc_runtime.constant_value(node)))
+            if isinstance(node, ID):
+                kind, slot = self.lookup(node.name)
+                if kind != "function":
+                    return _add(operands, (kind, slot))
+        return _add(operands, ("expr", self.expr(node)))
+
+    def condition(self, node, operands):
+        # the placeholder of the bool expression node
+        return self.operand(node, operands)
+
+    def expr_Constant(self, node, operands):
+        return "return " + _add(operands, ("const", uc_runtime.constant_value(node)))
+
+    def expr_ID(self, node, operands):
+        kind, slot = self.lookup(node.name)
+        return "return " + _add(operands, (kind, slot))
+
+    def expr_BinaryOp(self, node, operands):
+        uc_type = node.left.attrs['uc_type']
+        op = node.op
+        template = _BINARY.get(op)
+        if hasattr(uc_type, "size"):
+            template = _ARRAY_BINARY[op]
+        elif uc_type.typename == "char" and op in _CHAR_BINARY:
+            template = _CHAR_BINARY[op]
+        elif op == "/" and isinstance(node.right, Constant) and int(node.right.value) > 0:
+            template = _DIVIDE_BY_POSITIVE
+        elif uc_type.typename == "int" and op in _INT_BINARY:
+            template = _INT_BINARY[op]
+        left = self.operand(node.left, operands)
+        right = self.operand(node.right, operands)
+        return template.replace("{left}", left).replace("{right}", right)
+
+    def expr_UnaryOp(self, node, operands):
+        return _UNARY[node.op].replace("{left}", self.operand(node.expr, operands))
+
+    def expr_ExprList(self, node, operands):
+        lines = [self.operand(expr, operands) for expr in node.exprs]
+        lines[-1] = "return " + lines[-1]
+        return "\n".join(lines)
+
+    def expr_Assignment(self, node, operands):
+        value = self.operand(node.rvalue, operands)
+        return "v = %s\n%s = v\nreturn v" % (value, self.target(node.lvalue, operands))
+
+    def target(self, node, operands):
+        """The code of the variable or element node, to assign to it, after
+        the lines checking its subscripts."""
+        if isinstance(node, ID):
+            kind, slot = self.lookup(node.name)
+            return _add(operands, (kind, slot))
+        lines, base, index, size = self.element(node, operands)
+        return "\n".join(lines + ["%s[%s]" % (base, index)])
+
+    def element(self, node, operands):
+        """The lines evaluating the subscripts of the ArrayRef node, each one
+        checked against its dimension, the code of the array and of the
+        index of its element, and the number of elements of its value when
+        it is an array itself, or None."""
+        subscripts = []
+        while isinstance(node, ArrayRef):
+            subscripts.append(node.subscript)
+            node = node.name
+        subscripts.reverse()
+        base = self.operand(node, operands)
+        # the arrays of each dimension, outer to inner
+        uc_type = node.attrs['uc_type']
+        dimensions = []
+        while hasattr(uc_type, "size"):
+            dimensions.append(uc_type)
+            uc_type = uc_type.type
+        lines = []
+        terms = []
+        for k, (subscript, dimension) in enumerate(zip(subscripts, dimensions)):
+            bound = dimension.size
+            if isinstance(subscript, Constant) and 0 <= uc_runtime.constant_value(subscript) \
+                    and (bound is None or uc_runtime.constant_value(subscript) < bound):
+                index = self.operand(subscript, operands)
+            else:
+                index = "i%d" % k
+                lines.append("%s = %s" % (index, self.operand(subscript, operands)))
+                if bound is None:
+                    # the end of the array bounds an outer dimension of
+                    # unknown size
+                    lines.append("if %s < 0:\n    raise IndexError" % index)
+                else:
+                    lines.append("if not 0 <= %s < %s:\n    raise IndexError"
+                                 % (index, _add(operands, ("const", bound))))
+            stride = uc_runtime.flat_size(dimension.type)
+            terms.append(index if stride == 1 else "%s * %s" % (index, _add(operands, ("const", stride))))
+        size = None
+        if len(subscripts) < len(dimensions):
+            size = uc_runtime.flat_size(dimensions[len(subscripts) - 1].type)
+        return lines, base, " + ".join(terms), size
+
+    def expr_ArrayRef(self, node, operands):
+        lines, base, index, size = self.element(node, operands)
+        if size is None:
+            return "\n".join(lines + ["return %s[%s]" % (base, index)])
+        size = _add(operands, ("const", size))
+        lines.append("a = %s\no = %s" % (base, index))
+        while isinstance(node, ArrayRef):
+            node = node.name
+        if node.attrs['uc_type'].size is None:
+            # a slice past the end of the array would be cut short
+            lines.append("if o + %s > len(a):\n    raise IndexError" % size)
+        return "\n".join(lines + ["return memoryview(a)[o:o + %s]" % size])
+
+    def expr_FuncCall(self, node, operands):
+        kind, function = self.lookup(node.name.name)
+        if node.args is None:
+            args = []
+        elif isinstance(node.args, ExprList):
+            args = node.args.exprs
+        else:
+            args = [node.args]
+        function = _add(operands, ("const", function))
+        lines = ["new = [0] * %s.nslots" % function]
+        for slot, arg in enumerate(args, 1):
+            lines.append("new[%d] = %s" % (slot, self.operand(arg, operands)))
+        lines.append("%s.body(new)" % function)
+        lines.append("return new[0]")
+        return "\n".join(lines)
@@ -0,0 +1,139 @@
+"""Incremental reparsing of edited uC buffers, for editor integration.
+
+    buffer = IncrementalParse(UCParser(), text)
+    program = buffer.edit(offset, removed, inserted)
+
+An edit re-lexes and re-parses only the global declarations it touches,
+from the end of the last declaration before it to the start of the first
+declaration after it. The new declarations are spliced into
+Program.gdecls and the Coords of the declarations after the edit are
+shifted. Every input that lexes and parses without errors on its own ends
+with a ";" or "}" and closes its comments and strings, so it is tokenized
+the same way inside the whole buffer. When the region has an error the
+whole buffer is parsed again, reporting the errors as a full parse does.
+"""
+import contextlib
+import io
+import re
+import sys
+from bisect import bisect_right
+
+
+def _eff(line_start):
+    # the lexer counts columns from the newline before the line, or from
+    # the start of the input on the first line (see find_tok_column)
+    return line_start - 1 if line_start > 0 else 0
+
+
+def shift_coords(nodes, line, line_delta, col_delta):
+    """Move the Coords of the nodes and their children line_delta lines
+    down, and the columns of those on line col_delta columns right."""
+    seen = set()
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        coord = node.coord
+        # nodes and coords can be shared, as the type of a declaration list
+        if coord is not None and id(coord) not in seen:
+            seen.add(id(coord))
+            if coord.line == line and coord.column is not None:
+                coord.column += col_delta
+            coord.line += line_delta
+        stack.extend(child for _, child in node.children())
+
+
+class IncrementalParse:
+    """A uC buffer and its Program, kept up to date as the buffer is edited.
+
+    starts and ends hold the source extent of each global declaration, as
+    recorded by the parser, and line_starts the offset of each line of the
+    buffer (as the lexer's line index), updated by each edit.
+    """
+
+    def __init__(self, parser, text):
+        self.parser = parser
+        self.text = text
+        self.line_starts = [0]
+        self.line_starts.extend(m.end() for m in re.finditer('\n', text))
+        self.program = None
+        self.starts = []
+        self.ends = []
+        self.reparse()
+
+    def _extents(self, base):
+        extents = self.parser.extents
+        return [start + base for start, end in extents], [end + base for start, end in extents]
+
+    def reparse(self):
+        """Parse the whole buffer again, reporting its errors. The Program
+        is None when there are errors, so that the next edit parses the
+        whole buffer again rather than splice into the recovered one."""
+        errors = io.StringIO()
+        with contextlib.redirect_stdout(errors):
+            program = self.parser.parse(self.text)
+        sys.stdout.write(errors.getvalue())
+        if program is None or errors.getvalue():
+            self.program = None
+            self.starts, self.ends = [], []
+        else:
+            self.program = program
+            self.starts, self.ends = self._extents(0)
+        return self.program
+
+    def edit(self, offset, removed, inserted):
+        """Replace removed characters at offset by the string inserted and
+        update the Program. Returns the Program, or None on parse errors."""
+        old = self.text
+        text = self.text = old[:offset] + inserted + old[offset + removed:]
+        delta = len(inserted) - removed
+        edit_end = offset + removed
+
+        # the line starts inside the removed text are replaced by the ones
+        # of the inserted text, the following ones move by delta
+        lines = self.line_starts
+        first_line = bisect_right(lines, offset)
+        edit_line = bisect_right(lines, edit_end)
+        next_line = lines[edit_line] if edit_line < len(lines) else len(old) + 1
+        old_edit_line_start = lines[edit_line - 1]
+        added = [offset + m.end() for m in re.finditer('\n', inserted)]
+        line_delta = len(added) - (edit_line - first_line)
+        if added or edit_line > first_line or delta:
+            lines[first_line:] = added + [pos + delta for pos in lines[edit_line:]]
+        if self.program is None:
+            return self.reparse()
+
+        # the declarations from first to last - 1 overlap or touch the edit
+        first = bisect_right(self.ends, offset)
+        last = bisect_right(self.starts, edit_end)
+        start = self.ends[first - 1] if first else 0
+        end = self.starts[last] + delta if last < len(self.starts) else len(text)
+
+        # start is before the edit, its line did not move
+        lineno = bisect_right(lines, start)
+        errors = io.StringIO()
+        with contextlib.redirect_stdout(errors):
+            region = self.parser.parse(text[start:end], lineno)
+        if region is None or errors.getvalue():
+            return self.reparse()
+
+        # the region was lexed on its own, fix the columns of its first line
+        shift_coords(region.gdecls, lineno, 0, start - _eff(lines[lineno - 1]))
+        starts, ends = self._extents(start)
+
+        # the lines after the edit move by the newlines it added, and the
+        # rest of the line where it ends by the characters it added
+        new_edit_line_start = lines[bisect_right(lines, offset + len(inserted)) - 1]
+        col_delta = delta - (_eff(new_edit_line_start) - _eff(old_edit_line_start))
+        following = self.program.gdecls[last:]
+        if not line_delta:
+            same_line = 0
+            while same_line < len(following) and self.starts[last + same_line] < next_line:
+                same_line += 1
+            following = following[:same_line]
+        if following and (line_delta or col_delta):
+            shift_coords(following, edit_line, line_delta, col_delta)
+
+        self.program.gdecls[first:last] = region.gdecls
+        self.starts[first:] = starts + [pos + delta for pos in self.starts[last:]]
+        self.ends[first:] = ends + [pos + delta for pos in self.ends[last:]]
+        return self.program
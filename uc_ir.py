@@ -0,0 +1,806 @@
+"""Three-address code of checked uC programs, in basic blocks with the
+control-flow graph of each function.
+
+    diagnostics = Visitor(collect=True).check(program)   # none
+    module = generate(program)
+    print(dump(module))
+
+Each function is lowered to instructions of an opcode and at most three
+operands, four ints each in the array('i') code of the function. Most
+operands are values, the variables and temporaries of the function:
+indices in its values, named x (a local, x.1, x.2... when it shadows
+another one), @x (a global) or %1, %2... (a temporary, assigned once but for the
+value of && and ||, set in the blocks of both operands).
+The constants are addressed from the end, as the values -1, -2...: the
+constants of the function, the values of the constants of the source and
+the initial elements of the arrays, which NEWARR copies.
+
+The instructions are grouped in basic blocks: block b is the instructions
+from starts[b] up to the start of the next one, block 0 is the entry of
+the function and each block ends with its only jump (JUMP, CJUMP), RETURN,
+LEAVE or FAIL, the targets of which are the edges of the graph. Blocks no path
+from the entry reaches (the statements after a break or a return) are
+removed. The && and || operators, if, while and for statements and
+asserts are lowered to blocks, break to a jump to the block after its
+loop and return to RETURN, or LEAVE in a void function. The values of the
+operands are computed left to right: a variable read before an operand
+that may assign it is copied first. A scalar declared without an
+initializer is set to 0, unless its block assigns it before reading it.
+
+Function 0, <globals>, sets the initial values of the globals and runs
+before main, returning nothing. A function declared but not defined has no blocks. The
+values, print and read are the ones of uc_runtime.py, and arrays are
+flattened as there: the index of an element is computed by MUL and ADD,
+and ROW gives the elements of a row (as many as its type has).
+"""
+from array import array
+
+import uc_runtime
+from uc_ast_correto import ArrayRef, Assignment, Constant, ExprList, FuncCall, FuncDecl, GlobalDecl, ID, InitList
+
+# The opcodes. Their operands are written d for a value written, a, b and
+# i for values read, k for a constant, f for a function, n for a count or
+# a number, x for an index of the typenames of print and read and t for a
+# block.
+(ADD, SUB, MUL, DIV, MOD,             # d a b
+ LT, LE, GT, GE, EQ, NE,              # d a b, EQ and NE compare arrays by identity
+ NEG, NOT, MOVE,                      # d a
+ ALOAD, ASTORE, ROW,                  # d a i, a i b: a[i], d a i: the row of a from i
+ NEWARR,                              # d k: a copy of the array k
+ PARAM, CALL,                         # a, d f n: call f with the n values of the PARAMs before
+ PRINT, READ,                         # x a, d x
+ JUMP, CJUMP,                         # t, a t t: to the first t when a is true
+ RETURN, LEAVE,                       # a, -: return nothing
+ FAIL,                                # n n: a failed assert, at line and column
+ ) = range(27)
+
+# name and operands of each opcode
+OPCODES = {
+    ADD: ("ADD", "dab"), SUB: ("SUB", "dab"), MUL: ("MUL", "dab"), DIV: ("DIV", "dab"),
+    MOD: ("MOD", "dab"), LT: ("LT", "dab"), LE: ("LE", "dab"), GT: ("GT", "dab"),
+    GE: ("GE", "dab"), EQ: ("EQ", "dab"), NE: ("NE", "dab"), NEG: ("NEG", "da"),
+    NOT: ("NOT", "da"), MOVE: ("MOVE", "da"), ALOAD: ("ALOAD", "dai"), ASTORE: ("ASTORE", "aib"),
+    ROW: ("ROW", "dai"), NEWARR: ("NEWARR", "dk"), PARAM: ("PARAM", "a"), CALL: ("CALL", "dfn"),
+    PRINT: ("PRINT", "xa"), READ: ("READ", "dx"), JUMP: ("JUMP", "t"), CJUMP: ("CJUMP", "att"),
+    RETURN: ("RETURN", "a"), LEAVE: ("LEAVE", ""), FAIL: ("FAIL", "nn"),
+}
+
+# the instructions ending a block
+TERMINATORS = frozenset((JUMP, CJUMP, RETURN, LEAVE, FAIL))
+
+# the typenames of the operand x of PRINT and READ
+PRINT_TYPES = ("int", "char", "string", "bool")
+READ_TYPES = ("int", "char", "bool")
+
+_OPERATORS = {"+": ADD, "-": SUB, "*": MUL, "/": DIV, "%": MOD, "<": LT, "<=": LE, ">": GT,
+              ">=": GE, "==": EQ, "!=": NE}
+
+# the text of each opcode in dump, given the text of its operands
+_TEXT = {
+    ADD: "{0} = {1} + {2}", SUB: "{0} = {1} - {2}", MUL: "{0} = {1} * {2}", DIV: "{0} = {1} / {2}",
+    MOD: "{0} = {1} % {2}", LT: "{0} = {1} < {2}", LE: "{0} = {1} <= {2}", GT: "{0} = {1} > {2}",
+    GE: "{0} = {1} >= {2}", EQ: "{0} = {1} == {2}", NE: "{0} = {1} != {2}", NEG: "{0} = -{1}",
+    NOT: "{0} = !{1}", MOVE: "{0} = {1}", ALOAD: "{0} = {1}[{2}]", ASTORE: "{0}[{1}] = {2}",
+    ROW: "{0} = row {1}[{2}]", NEWARR: "{0} = array {1}", PARAM: "param {0}", CALL: "{0} = call {1}, {2}",
+    PRINT: "print {0} {1}", READ: "{0} = read {1}", JUMP: "jump {0}", CJUMP: "if {0} jump {1} else {2}",
+    RETURN: "return {0}", LEAVE: "return", FAIL: "assert_fail {0}:{1}",
+}
+
+
+class Function:
+    """A function of a module: its name, the number of its parameters (its
+    first values), the names and uc_types of its values, its constants,
+    its code and the starts of its blocks, see the module documentation."""
+
+    __slots__ = ("name", "nparams", "values", "types", "constants", "code", "starts")
+
+    def __init__(self, name, nparams, values, types, constants, code, starts):
+        self.name = name
+        self.nparams = nparams
+        self.values = values
+        self.types = types
+        self.constants = constants
+        self.code = code
+        self.starts = starts
+
+    def __len__(self):
+        """The number of instructions."""
+        return len(self.code) // 4
+
+    def instruction(self, index):
+        """The opcode and operands of the instruction index."""
+        return tuple(self.code[4 * index:4 * index + 4])
+
+    def block(self, b):
+        """The range of the indices of the instructions of block b."""
+        end = self.starts[b + 1] if b + 1 < len(self.starts) else len(self)
+        return range(self.starts[b], end)
+
+    def successors(self, b):
+        """The blocks block b can jump to."""
+        end = self.block(b).stop
+        op, a, t, f = self.code[4 * end - 4:4 * end]
+        if op == JUMP:
+            return (a,)
+        if op == CJUMP:
+            return (t, f) if t != f else (t,)
+        return ()
+
+    def predecessors(self):
+        """The blocks that can jump to each block."""
+        predecessors = [[] for _ in self.starts]
+        for b in range(len(self.starts)):
+            for successor in self.successors(b):
+                predecessors[successor].append(b)
+        return predecessors
+
+    def edges(self):
+        """The edges of the control-flow graph, as (block, successor)."""
+        return [(b, successor) for b in range(len(self.starts)) for successor in self.successors(b)]
+
+    def operand(self, value):
+        """The text of the value operand."""
+        if value >= 0:
+            return self.values[value]
+        constant = self.constants[-value - 1]
+        if isinstance(constant, tuple):
+            return "{%s}" % ", ".join(map(str, constant))
+        return repr(constant)
+
+
+class Module:
+    """The IR of a program: the names and uc_types of its globals, its
+    functions (function 0 initializes the globals) and the index of main,
+    or -1."""
+
+    def __init__(self, globals, types, functions, entry):
+        self.globals = globals
+        self.types = types
+        self.functions = functions
+        self.entry = entry
+
+
+def generate(program):
+    """The Module of the Program program, checked by the semantic analysis
+    without errors."""
+    generator = _Generator()
+    generator.program(program)
+    return generator.module()
+
+
+def verify(module):
+    """Check the blocks of the functions of module: each one ends with its
+    only terminator, jumps to blocks of its function and is reached from
+    the entry. Raises ValueError otherwise."""
+    for function in module.functions:
+        code = function.code
+        nblocks = len(function.starts)
+        if (nblocks == 0) != (len(code) == 0) or nblocks and function.starts[0] != 0:
+            raise ValueError("%s: the blocks do not cover the code" % function.name)
+        for b in range(nblocks):
+            indices = function.block(b)
+            if not indices:
+                raise ValueError("%s: block %d is empty" % (function.name, b))
+            for index in indices:
+                if (code[4 * index] in TERMINATORS) != (index == indices.stop - 1):
+                    raise ValueError("%s: block %d does not end with its only terminator" % (function.name, b))
+            if any(not 0 <= successor < nblocks for successor in function.successors(b)):
+                raise ValueError("%s: block %d jumps out of the function" % (function.name, b))
+        reached = _reachable(function)
+        if len(reached) != nblocks:
+            raise ValueError("%s: blocks %s are not reached" % (
+                function.name, sorted(set(range(nblocks)) - reached)))
+
+
+def _reachable(function):
+    # the blocks a path from the entry reaches
+    reached = set()
+    stack = [0] if function.starts else []
+    while stack:
+        b = stack.pop()
+        if b not in reached:
+            reached.add(b)
+            stack.extend(function.successors(b))
+    return reached
+
+
+def dump(module):
+    """The IR of module as text: each function, its blocks with their
+    predecessors and their instructions."""
+    lines = ["global %s %s" % (name, uc_type) for name, uc_type in zip(module.globals, module.types)]
+    for index, function in enumerate(module.functions):
+        if lines:
+            lines.append("")
+        params = ", ".join(function.values[:function.nparams])
+        if not function.starts:
+            lines.append("function %d %s(%s): not defined" % (index, function.name, params))
+            continue
+        lines.append("function %d %s(%s): %d blocks, %d instructions"
+                     % (index, function.name, params, len(function.starts), len(function)))
+        predecessors = function.predecessors()
+        for b in range(len(function.starts)):
+            lines.append("  B%d:%s" % (b, "  <- " + ", ".join("B%d" % p for p in predecessors[b])
+                                       if predecessors[b] else ""))
+            for i in function.block(b):
+                lines.append("    " + _instruction_text(module, function, function.instruction(i)))
+    return "\n".join(lines)
+
+
+def _instruction_text(module, function, instruction):
+    op = instruction[0]
+    words = []
+    for kind, word in zip(OPCODES[op][1], instruction[1:]):
+        if kind in "dabik":
+            words.append(function.operand(word))
+        elif kind == "f":
+            words.append(module.functions[word].name)
+        elif kind == "x":
+            words.append((READ_TYPES if op == READ else PRINT_TYPES)[word])
+        elif kind == "t":
+            words.append("B%d" % word)
+        else:
+            words.append(str(word))
+    return _TEXT[op].format(*words)
+
+
+def _impure(node):
+    """Whether evaluating the expression node may call a function or
+    assign a variable."""
+    if isinstance(node, (FuncCall, Assignment)):
+        return True
+    return any(_impure(child) for _, child in node.children())
+
+
+def _arguments(node):
+    # the expressions of the arguments of a FuncCall, print or read
+    if node is None:
+        return []
+    return list(node.exprs) if isinstance(node, ExprList) else [node]
+
+
+class _Code:
+    """The code of a function being generated: its values, constants,
+    instructions, the labels (the block each one starts, or -1), the
+    starts of its blocks, the exit labels of the loops it is in and the
+    index of the MOVE setting each variable declared without an initializer
+    to 0. A jump targets a label until finish turns it into a block."""
+
+    def __init__(self, name):
+        self.name = name
+        self.nparams = 0
+        self.values = []
+        self.types = []
+        self.names = {}
+        self.ntemps = 0
+        self.constants = []
+        self.indices = {}
+        self.code = array("i")
+        self.labels = []
+        self.starts = array("i")
+        # the last block ended with its terminator
+        self.ended = True
+        self.loops = []
+        self.defaults = {}
+
+    def finish(self):
+        """The Function of the code, its jumps to blocks and its blocks
+        not reached removed."""
+        if self.starts:
+            code = self.code
+            labels = self.labels
+            for start in range(0, len(code), 4):
+                op = code[start]
+                if op == JUMP:
+                    code[start + 1] = labels[code[start + 1]]
+                elif op == CJUMP:
+                    code[start + 2] = labels[code[start + 2]]
+                    code[start + 3] = labels[code[start + 3]]
+        function = Function(self.name, self.nparams, self.values, self.types, self.constants, self.code,
+                            self.starts)
+        reached = _reachable(function)
+        if len(reached) < len(self.starts):
+            _remove_blocks(function, reached)
+        return function
+
+
+def _remove_blocks(function, reached):
+    # keep the blocks reached of function only, numbering them again
+    numbers = {}
+    code = array("i")
+    starts = array("i")
+    for b in range(len(function.starts)):
+        if b in reached:
+            numbers[b] = len(starts)
+            starts.append(len(code) // 4)
+            indices = function.block(b)
+            code.extend(function.code[4 * indices.start:4 * indices.stop])
+    for start in range(0, len(code), 4):
+        op = code[start]
+        if op == JUMP:
+            code[start + 1] = numbers[code[start + 1]]
+        elif op == CJUMP:
+            code[start + 2] = numbers[code[start + 2]]
+            code[start + 3] = numbers[code[start + 3]]
+    function.code = code
+    function.starts = starts
+
+
+class _Generator:
+    """Lowers a program to a Module, see the module documentation. The
+    scopes map the names visible to their location: ("local", value),
+    ("global", name) or ("function", index)."""
+
+    def __init__(self):
+        self.globals = []
+        self.types = []
+        self.global_types = {}
+        self.functions = [None]
+        self.indices = {}
+        self.scopes = [{}]
+        # the code of function 0, the initialization of the globals
+        self.init = self.f = _Code("<globals>")
+        self.open(self.label())
+
+    def module(self):
+        self.f = self.init
+        self.emit(LEAVE)
+        self.functions[0] = self.init.finish()
+        return Module(self.globals, self.types, self.functions, self.indices.get("main", -1))
+
+    def lookup(self, name):
+        for scope in reversed(self.scopes):
+            location = scope.get(name)
+            if location is not None:
+                return location
+        raise uc_runtime.UCRuntimeError("'%s' is not defined" % name)
+
+    # the values, the instructions and the blocks
+
+    def value(self, name, uc_type):
+        """A new value of the function named name."""
+        f = self.f
+        f.values.append(name)
+        f.types.append(uc_type)
+        return len(f.values) - 1
+
+    def variable(self, name, uc_type):
+        # a new local variable, named apart from the ones it shadows
+        f = self.f
+        count = f.names.get(name, 0)
+        f.names[name] = count + 1
+        return self.value("%s.%d" % (name, count) if count else name, uc_type)
+
+    def temp(self, uc_type):
+        self.f.ntemps += 1
+        return self.value("%%%d" % self.f.ntemps, uc_type)
+
+    def const(self, value):
+        """The operand of the constant value."""
+        f = self.f
+        key = (type(value), value)
+        operand = f.indices.get(key)
+        if operand is None:
+            f.constants.append(value)
+            operand = f.indices[key] = -len(f.constants)
+        return operand
+
+    def global_value(self, name):
+        # the value of the global name in the function generated
+        f = self.f
+        key = ("global", name)
+        operand = f.indices.get(key)
+        if operand is None:
+            operand = f.indices[key] = self.value(name, self.global_types[name])
+        return operand
+
+    def emit(self, op, a=0, b=0, c=0):
+        f = self.f
+        if f.ended:
+            # the code after a jump or a return, which no jump reaches
+            self.open(self.label())
+        f.code.extend((op, a, b, c))
+        f.ended = op in TERMINATORS
+
+    def label(self):
+        """A new label, for open."""
+        self.f.labels.append(-1)
+        return len(self.f.labels) - 1
+
+    def open(self, label):
+        """Start the block of label, the last one falling through to it."""
+        f = self.f
+        if not f.ended:
+            self.emit(JUMP, label)
+        f.labels[label] = len(f.starts)
+        f.starts.append(len(f.code) // 4)
+        f.ended = False
+
+    # declarations
+
+    def program(self, node):
+        for gdecl in node.gdecls:
+            if isinstance(gdecl, GlobalDecl):
+                for decl in gdecl.decls:
+                    self.global_decl(decl)
+            else:
+                self.function(gdecl)
+
+    def declare_function(self, name, decl):
+        index = self.indices.get(name)
+        if index is None:
+            args = decl.type.args
+            index = self.indices[name] = len(self.functions)
+            # a function that is not defined keeps no blocks, see function
+            f = _Code(name)
+            f.nparams = len(args.params) if args is not None else 0
+            f.values = [param.name.name for param in args.params] if args is not None else []
+            f.types = [param.attrs['uc_type'] for param in args.params] if args is not None else []
+            self.functions.append(f.finish())
+        self.scopes[-1][name] = ("function", index)
+        return index
+
+    def global_decl(self, node):
+        name = node.name.name
+        if isinstance(node.type, FuncDecl):
+            self.declare_function(name, node)
+            return
+        self.globals.append("@" + name)
+        self.types.append(node.attrs['uc_type'])
+        self.global_types["@" + name] = node.attrs['uc_type']
+        self.scopes[0][name] = ("global", "@" + name)
+        self.initial(node, self.global_value("@" + name))
+
+    def initial(self, node, value):
+        """Set the variable value to the initial value of the Decl node."""
+        uc_type = node.attrs['uc_type']
+        init = node.init
+        if hasattr(uc_type, "size"):
+            values = uc_runtime.initial_values(init) if init is not None else ()
+            self.emit(NEWARR, value, self.const(tuple(values)))
+            return
+        if init is None:
+            self.emit(MOVE, value, self.const(0))
+            self.f.defaults[value] = len(self.f.code) // 4 - 1
+            return
+        if isinstance(init, InitList):
+            init = init.exprs[0]
+        self.assign(value, init)
+
+    def function(self, node):
+        name = node.decl.name.name
+        index = self.declare_function(name, node.decl)
+        args = node.decl.type.args
+        params = args.params if args is not None else ()
+        self.f = _Code(name)
+        self.f.nparams = len(params)
+        self.open(self.label())
+        # the parameters and the declarations of the body share a scope
+        self.scopes.append({param.name.name: ("local", self.variable(param.name.name, param.attrs['uc_type']))
+                            for param in params})
+        for statement in node.statements.dcls + node.statements.stmts:
+            self.statement(statement)
+        if not self.f.ended:
+            # a function that is not void returns 0 when it ends without a return
+            if node.attrs['uc_type'].type.typename == "void":
+                self.emit(LEAVE)
+            else:
+                self.emit(RETURN, self.const(0))
+        self.scopes.pop()
+        self.functions[index] = self.f.finish()
+        self.f = self.init
+
+    # statements
+
+    def statement(self, node):
+        compile = getattr(self, "stmt_" + node.__class__.__name__, None)
+        if compile is None:
+            self.expr_statement(node)
+        else:
+            compile(node)
+
+    def expr_statement(self, node):
+        if isinstance(node, ExprList):
+            for expr in node.exprs:
+                self.expr_statement(expr)
+        elif isinstance(node, Assignment):
+            # the value of the assignment is not used
+            self.store(node.lvalue, node.rvalue)
+        else:
+            self.expr(node)
+
+    def stmt_Decl(self, node):
+        if isinstance(node.type, FuncDecl):
+            self.declare_function(node.name.name, node)
+            return
+        # the name is visible in its initializer, as in the semantic analysis
+        value = self.variable(node.name.name, node.attrs['uc_type'])
+        self.scopes[-1][node.name.name] = ("local", value)
+        self.initial(node, value)
+
+    def stmt_DeclList(self, node):
+        for decl in node.decls:
+            self.statement(decl)
+
+    def stmt_Compound(self, node):
+        self.scopes.append({})
+        for statement in node.dcls + node.stmts:
+            self.statement(statement)
+        self.scopes.pop()
+
+    def stmt_EmptyStatement(self, node):
+        pass
+
+    def stmt_If(self, node):
+        then, done = self.label(), self.label()
+        otherwise = self.label() if node.else_statements is not None else done
+        self.emit(CJUMP, self.expr(node.cond), then, otherwise)
+        self.open(then)
+        self.statement(node.if_statements)
+        if node.else_statements is not None:
+            self.emit(JUMP, done)
+            self.open(otherwise)
+            self.statement(node.else_statements)
+        self.open(done)
+
+    def loop(self, cond, body, next):
+        """The blocks of a loop: its condition (if any), then its body and
+        next, back to the condition."""
+        test, start, done = self.label(), self.label(), self.label()
+        self.open(test)
+        if cond is not None:
+            self.emit(CJUMP, self.expr(cond), start, done)
+        self.open(start)
+        self.f.loops.append(done)
+        if body is not None:
+            self.statement(body)
+        if next is not None:
+            self.expr_statement(next)
+        self.f.loops.pop()
+        self.emit(JUMP, test)
+        self.open(done)
+
+    def stmt_While(self, node):
+        self.loop(node.cond, node.statements, None)
+
+    def stmt_For(self, node):
+        # the declarations of the initialization belong to the loop
+        self.scopes.append({})
+        if node.init is not None:
+            self.statement(node.init)
+        self.loop(node.cond, node.statements, node.next)
+        self.scopes.pop()
+
+    def stmt_Break(self, node):
+        self.emit(JUMP, self.f.loops[-1])
+
+    def stmt_Return(self, node):
+        if node.expr is None:
+            self.emit(LEAVE)
+        else:
+            self.emit(RETURN, self.expr(node.expr))
+
+    def stmt_Assert(self, node):
+        coord = node.expr.coord
+        holds, fails = self.label(), self.label()
+        self.emit(CJUMP, self.expr(node.expr), holds, fails)
+        self.open(fails)
+        self.emit(FAIL, coord.line, coord.column)
+        self.open(holds)
+
+    def stmt_Print(self, node):
+        if node.expr is None:
+            self.emit(PRINT, PRINT_TYPES.index("string"), self.const("\n"))
+            return
+        exprs = _arguments(node.expr)
+        # the values are all computed before the first one is written
+        values = self.operands(exprs)
+        for expr, value in zip(exprs, values):
+            self.emit(PRINT, PRINT_TYPES.index(expr.attrs['uc_type'].typename), value)
+
+    def stmt_Read(self, node):
+        for expr in _arguments(node.expr):
+            uc_type = expr.attrs['uc_type']
+            x = READ_TYPES.index(uc_type.typename)
+            if isinstance(expr, ID):
+                self.emit(READ, self.location(expr.name), x)
+            else:
+                value = self.temp(uc_type)
+                self.emit(READ, value, x)
+                array_value, index, _ = self.element(expr)
+                self.emit(ASTORE, array_value, index, value)
+
+    # expressions
+
+    def location(self, name):
+        # the value of the variable name
+        kind, value = self.lookup(name)
+        return self.global_value(value) if kind == "global" else value
+
+    def expr(self, node):
+        """Emit the code of the expression node, returning the operand of
+        its value."""
+        return getattr(self, "expr_" + node.__class__.__name__)(node)
+
+    def operands(self, exprs):
+        """The operands of the values of exprs, computed left to right."""
+        values = []
+        for i, expr in enumerate(exprs):
+            value = self.expr(expr)
+            if value >= 0 and not self.f.values[value].startswith("%") and any(map(_impure, exprs[i + 1:])):
+                # a later operand may assign the variable
+                copy = self.temp(expr.attrs['uc_type'])
+                self.emit(MOVE, copy, value)
+                value = copy
+            values.append(value)
+        return values
+
+    def expr_Constant(self, node):
+        return self.const(uc_runtime.constant_value(node))
+
+    def expr_ID(self, node):
+        return self.location(node.name)
+
+    def expr_BinaryOp(self, node):
+        op = node.op
+        if op in ("&&", "||"):
+            return self.logical(node)
+        left, right = self.operands([node.left, node.right])
+        value = self.temp(node.attrs['uc_type'])
+        self.emit(_OPERATORS[op], value, left, right)
+        return value
+
+    def logical(self, node):
+        """The value of the && or || node: the right operand is computed
+        in a block of its own, when the left one does not decide."""
+        value = self.temp(node.attrs['uc_type'])
+        right, done = self.label(), self.label()
+        self.test(value, node.left)
+        if node.op == "&&":
+            self.emit(CJUMP, value, right, done)
+        else:
+            self.emit(CJUMP, value, done, right)
+        self.open(right)
+        self.test(value, node.right)
+        self.open(done)
+        return value
+
+    def test(self, value, node):
+        # set value to the expression node, as a bool
+        if node.attrs['uc_type'].typename == "char":
+            self.emit(NE, value, self.expr(node), self.const(0))
+        else:
+            self.assign(value, node)
+
+    def expr_UnaryOp(self, node):
+        operand = self.expr(node.expr)
+        if node.op == "+":
+            return operand
+        if node.op == "-" and operand < 0 and isinstance(self.f.constants[-operand - 1], int):
+            return self.const(-self.f.constants[-operand - 1])
+        value = self.temp(node.attrs['uc_type'])
+        self.emit(NEG if node.op == "-" else NOT, value, operand)
+        return value
+
+    def expr_ExprList(self, node):
+        for expr in node.exprs[:-1]:
+            self.expr_statement(expr)
+        return self.expr(node.exprs[-1])
+
+    def expr_Assignment(self, node):
+        value = self.store(node.lvalue, node.rvalue)
+        if value >= 0 and not self.f.values[value].startswith("%"):
+            # the value of the assignment, not of the variable later
+            copy = self.temp(node.attrs['uc_type'])
+            self.emit(MOVE, copy, value)
+            value = copy
+        return value
+
+    def assign(self, value, node):
+        """Emit the code setting the variable value to the expression node:
+        the instruction computing it writes the variable when it is the
+        last one, else it is moved."""
+        f = self.f
+        default = f.defaults.pop(value, None)
+        operand = self.expr(node)
+        code = f.code
+        if (operand == len(f.values) - 1 and operand >= f.nparams and f.values[operand].startswith("%")
+                and not f.ended and len(code) // 4 > f.starts[-1] and code[-3] == operand
+                and OPCODES[code[-4]][1].startswith("d")):
+            code[-3] = value
+            # the temporary is not used
+            f.values.pop()
+            f.types.pop()
+            f.ntemps -= 1
+        else:
+            self.emit(MOVE, value, operand)
+        if default is not None:
+            self.drop_default(value, default)
+
+    def drop_default(self, value, index):
+        """Remove the MOVE of instruction index setting the variable value to
+        0 when it was just assigned again, in the same block and without
+        reading it (or calling a function, which may read a global)."""
+        f = self.f
+        code = f.code
+        if index < f.starts[-1]:
+            return
+        for start in range(4 * index + 4, len(code), 4):
+            op = code[start]
+            if op == CALL and f.values[value].startswith("@"):
+                return
+            if any(kind in "abi" and word == value for kind, word in zip(OPCODES[op][1], code[start + 1:start + 4])):
+                return
+        del code[4 * index:4 * index + 4]
+        for other, i in f.defaults.items():
+            if i > index:
+                f.defaults[other] = i - 1
+
+    def store(self, lvalue, rvalue):
+        """Emit the assignment of the expression rvalue to the variable or
+        element lvalue, returning the operand of the value assigned."""
+        if isinstance(lvalue, ID):
+            value = self.location(lvalue.name)
+            self.assign(value, rvalue)
+            return value
+        # the value first, as it may change the variables of the index
+        operand = self.expr(rvalue)
+        if operand >= 0 and not self.f.values[operand].startswith("%") and _impure(lvalue):
+            copy = self.temp(rvalue.attrs['uc_type'])
+            self.emit(MOVE, copy, operand)
+            operand = copy
+        array_value, index, _ = self.element(lvalue)
+        self.emit(ASTORE, array_value, index, operand)
+        return operand
+
+    def element(self, node):
+        """The operands of the array of the element of the ArrayRef node
+        and of its index, and the uc_type of its value."""
+        uc_type = node.attrs['uc_type']
+        subscripts = []
+        while isinstance(node, ArrayRef):
+            subscripts.append(node.subscript)
+            node = node.name
+        subscripts.reverse()
+        base = self.expr(node)
+        # the arrays of each dimension, outer to inner
+        dimension = node.attrs['uc_type']
+        offset = 0
+        index = None
+        for subscript in subscripts:
+            stride = uc_runtime.flat_size(dimension.type)
+            dimension = dimension.type
+            if isinstance(subscript, Constant):
+                offset += uc_runtime.constant_value(subscript) * stride
+                continue
+            term = self.expr(subscript)
+            if stride != 1:
+                product = self.temp(subscript.attrs['uc_type'])
+                self.emit(MUL, product, term, self.const(stride))
+                term = product
+            if index is not None:
+                total = self.temp(subscript.attrs['uc_type'])
+                self.emit(ADD, total, index, term)
+                term = total
+            index = term
+        if index is None:
+            index = self.const(offset)
+        elif offset:
+            total = self.temp(subscripts[0].attrs['uc_type'])
+            self.emit(ADD, total, index, self.const(offset))
+            index = total
+        return base, index, uc_type
+
+    def expr_ArrayRef(self, node):
+        array_value, index, uc_type = self.element(node)
+        value = self.temp(uc_type)
+        self.emit(ROW if hasattr(uc_type, "size") else ALOAD, value, array_value, index)
+        return value
+
+    def expr_FuncCall(self, node):
+        _, function = self.lookup(node.name.name)
+        values = self.operands(_arguments(node.args))
+        for value in values:
+            self.emit(PARAM, value)
+        result = self.temp(node.attrs['uc_type'])
+        self.emit(CALL, result, function, len(values))
+        return result
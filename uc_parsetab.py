@@ -0,0 +1,107 @@
+"""On-disk cache of the LALR tables that sly generates for the uC parsers.
+
+sly builds the tables every time a Parser class is created, which is most
+of the startup time of the compiler. A parser class opts in to the cache
+by overriding the table builder:
+
+    @classmethod
+    def _Parser__build_lrtables(cls):
+        return build_lrtables(cls)
+
+The tables are stored in a file named after a hash of the grammar rules,
+the precedence table and the token list, so any change in the grammar
+regenerates them.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+
+import sly
+from sly.yacc import LRTable
+
+# Bump when the format of the cached tables changes
+TABLES_VERSION = 1
+
+
+def cache_dir():
+    """Directory of the cached tables, $UCC_CACHE_DIR or ~/.cache/ucc."""
+    return os.environ.get("UCC_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "ucc")
+
+
+class CachedTables:
+    """The parts of a sly LRTable used by Parser.parse."""
+
+    def __init__(self, lr_action, lr_goto, defaulted_states, sr_conflicts, rr_conflicts):
+        self.lr_action = lr_action
+        self.lr_goto = lr_goto
+        self.defaulted_states = defaulted_states
+        self.sr_conflicts = sr_conflicts
+        self.rr_conflicts = rr_conflicts
+
+
+def grammar_key(cls):
+    """Hash of everything the tables of the parser class depend on."""
+    productions = [(p.name, tuple(p.prod), p.prec) for p in cls._grammar.Productions]
+    spec = (TABLES_VERSION, sly.__version__, tuple(cls.tokens),
+            tuple(map(tuple, getattr(cls, "precedence", ()))),
+            getattr(cls, "start", None), productions)
+    return hashlib.sha256(repr(spec).encode()).hexdigest()
+
+
+def _load(path, key):
+    try:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError, AttributeError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != TABLES_VERSION or data.get("key") != key:
+        return None
+    return data["tables"]
+
+
+def _store(path, key, tables):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump({"version": TABLES_VERSION, "key": key, "tables": tables}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # the cache is an optimization, parsing works without it
+
+
+def build_lrtables(cls):
+    """Load the LALR tables of cls from the cache, or build and store
+    them. Conflicts are reported as sly does."""
+    key = grammar_key(cls)
+    path = os.path.join(cache_dir(), "parsetab-%s-%s.pickle" % (cls.__name__, key[:16]))
+    tables = _load(path, key)
+    if tables is None:
+        lrtable = LRTable(cls._grammar)
+        tables = CachedTables(
+            lrtable.lr_action,
+            lrtable.lr_goto,
+            lrtable.defaulted_states,
+            list(lrtable.sr_conflicts),
+            [(st, str(chosen), str(rejected)) for st, chosen, rejected in lrtable.rr_conflicts],
+        )
+        _store(path, key, tables)
+
+    num_sr = len(tables.sr_conflicts)
+    if num_sr != getattr(cls, "expected_shift_reduce", None):
+        if num_sr == 1:
+            cls.log.warning("1 shift/reduce conflict")
+        elif num_sr > 1:
+            cls.log.warning("%d shift/reduce conflicts", num_sr)
+
+    num_rr = len(tables.rr_conflicts)
+    if num_rr != getattr(cls, "expected_reduce_reduce", None):
+        if num_rr == 1:
+            cls.log.warning("1 reduce/reduce conflict")
+        elif num_rr > 1:
+            cls.log.warning("%d reduce/reduce conflicts", num_rr)
+
+    cls._lrtable = tables
+    return True
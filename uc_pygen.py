@@ -0,0 +1,524 @@
+"""Execution of checked uC programs as Python code.
+
+    diagnostics = Visitor(collect=True).check(program)   # none
+    executable = compile_program(program)
+    status = executable.run()
+
+python_source writes a Program as the source of a Python module: a
+function per uC function, a module variable per global and the local
+variables as Python locals. The names are renamed so that they do not
+clash with each other, with the keywords of Python or with the helpers
+of the module: a local becomes <name>_<n>, numbered in its function so
+that the variables of nested blocks are distinct, a global <name>_g and
+a function <name>_f. The values are the ones of uc_runtime.py, and the
+operators whose C semantics Python does not share call _div and _mod.
+Each subscript is checked against its dimension in place, its value kept
+in _i unless it is a name, and the value of each int +, -, * and unary -
+against the range of int, kept in _v.
+
+The source is compiled by compile() once per process: compile_source
+keeps the code objects by the hash of the source, so a program run again,
+or another one written the same, is not compiled again. dumps and loads
+convert an executable to and from bytes, the marshal format of its code
+object, which ucc --cache keeps so that an unchanged program runs without
+being lexed, parsed, checked or compiled again.
+"""
+import builtins
+import hashlib
+import importlib.util
+import marshal
+from array import array
+
+import uc_runtime
+from uc_ast_correto import (ArrayRef, Assignment, Constant, Coord, ExprList, FuncDecl, GlobalDecl, ID,
+                            InitList, Return)
+from uc_runtime import AssertionFailed, Input, Output, UCRuntimeError
+
+# The code objects of the sources compiled, by the hash of the source,
+# up to MAX_CODES of them
+_codes = {}
+MAX_CODES = 256
+
+# print of the values of each basic type, by typename
+_FORMATS = {"int": "str(%s)", "char": "chr(%s)", "string": "%s", "bool": "_bool(%s)"}
+
+_READERS = {"int": "_read_int()", "char": "_read_char()", "bool": "_read_bool()"}
+
+# the operators of Python of the binary operators of uC not written as calls
+_OPERATORS = {"+": "+", "-": "-", "*": "*", "<": "<", "<=": "<=", ">": ">", ">=": ">=",
+              "==": "==", "!=": "!=", "&&": "and", "||": "or"}
+
+
+def compile_source(source):
+    """The code object of the Python source, compiled once per process."""
+    key = hashlib.sha256(source.encode("utf-8", "surrogatepass")).digest()
+    code = _codes.get(key)
+    if code is None:
+        if len(_codes) >= MAX_CODES:
+            del _codes[next(iter(_codes))]
+        code = _codes[key] = compile(source, "<uC %s>" % key.hex()[:12], "exec")
+    return code
+
+
+def _store(base, value, index):
+    # base[index] = value, as an expression computing value first
+    base[index] = value
+    return value
+
+
+def _row(base, offset, size):
+    # the size elements of the array base from offset, which a slice past
+    # the end of base would cut short
+    if offset + size > len(base):
+        raise IndexError
+    return memoryview(base)[offset:offset + size]
+
+
+def _out_of_range():
+    raise IndexError
+
+
+def _overflow():
+    raise OverflowError
+
+
+def _fail(line, column):
+    raise AssertionFailed(Coord(line, column))
+
+
+def _undefined(name):
+    raise UCRuntimeError("function '%s' is declared but not defined" % name)
+
+
+class Executable:
+    """A compiled program: its code object, and its source when it was
+    compiled here. It can be run many times."""
+
+    def __init__(self, code, source=None):
+        self.code = code
+        self.source = source
+        self.output = Output()
+        self.input = Input(self.output)
+        output = self.output
+        # the globals of the module before it runs: the helpers it calls
+        self._helpers = {
+            "__builtins__": builtins, "array": array,
+            "_div": uc_runtime.c_div, "_mod": uc_runtime.c_mod, "_bool": uc_runtime.format_bool,
+            "_store": _store, "_row": _row, "_out_of_range": _out_of_range, "_overflow": _overflow,
+            "_fail": _fail, "_undefined": _undefined,
+            "_append": output.chunks.append, "_chunks": output.chunks, "_flush": output.flush,
+            "_LIMIT": output.LIMIT, "_read_int": self.input.read_int,
+            "_read_char": self.input.read_char, "_read_bool": self.input.read_bool,
+        }
+
+    def main(self):
+        """Initialize the globals and call main, returning its value."""
+        namespace = dict(self._helpers)
+        exec(self.code, namespace)
+        main = namespace.get("main_f")
+        if main is None:
+            raise UCRuntimeError("the program has no main function")
+        return main()
+
+    def run(self, stdin=None, stdout=None):
+        """Run the program reading stdin and writing stdout (by default
+        sys.stdin and sys.stdout). Returns its exit status."""
+        return uc_runtime.run(self.main, self.output, self.input, stdin, stdout)
+
+
+def python_source(program):
+    """The source of the Python module of the Program program, checked by
+    the semantic analysis without errors."""
+    writer = _Writer()
+    writer.program(program)
+    return writer.source()
+
+
+def compile_program(program):
+    """The Executable of the Program program, checked by the semantic
+    analysis without errors."""
+    source = python_source(program)
+    return Executable(compile_source(source), source)
+
+
+def dumps(executable):
+    """The bytes of the code of executable, for the running version of
+    Python."""
+    return importlib.util.MAGIC_NUMBER + marshal.dumps(executable.code)
+
+
+def loads(data):
+    """The Executable of the bytes data made by dumps. Raises ValueError
+    when data is not one, or was made by another version of Python."""
+    magic = importlib.util.MAGIC_NUMBER
+    if bytes(data[:len(magic)]) != magic:
+        raise ValueError("not the code of a uC program for this Python")
+    try:
+        code = marshal.loads(data[len(magic):])
+    except (EOFError, TypeError) as e:
+        raise ValueError("invalid code of a uC program: %s" % e) from None
+    if not hasattr(code, "co_code"):
+        raise ValueError("not the code of a uC program")
+    return Executable(code)
+
+
+def _int_range(value, low=True, high=True):
+    """The Python expression of the int value, checked against INT_MIN when
+    low and against INT_MAX when high, through _v."""
+    checks = ["%d <=" % uc_runtime.INT_MIN] if low else []
+    checks.append("(_v := %s)" % value)
+    if high:
+        checks.append("<= %d" % uc_runtime.INT_MAX)
+    return "(_v if %s else _overflow())" % " ".join(checks)
+
+
+def _array_source(uc_type, values):
+    """The Python expression of a new array of uc_type holding values,
+    then zeros."""
+    size = uc_runtime.flat_size(uc_type)
+    padding = size - len(values)
+    if uc_runtime.element_typename(uc_type) == "char":
+        return "bytearray(%r)" % (bytes(values) + bytes(padding)) if values else "bytearray(%d)" % size
+    if values:
+        return "array('i', %r%s)" % (list(values), " + [0] * %d" % padding if padding else "")
+    return "array('i', bytes(%d))" % (4 * size)
+
+
+class _Writer:
+    """Writes the Python source of a program, see the module documentation.
+    The scopes map the names visible to their kind ("local", "global" or
+    "function") and Python name."""
+
+    def __init__(self):
+        self.lines = []
+        # the module-level constants: the initial arrays of the locals
+        self.constants = []
+        self.scopes = [{}]
+        # uC name -> Python name of the functions declared, and the defined ones
+        self.functions = {}
+        self.defined = set()
+        self.nlocals = 0
+        # the globals a function assigns, which it declares global
+        self.assigned = set()
+
+    def source(self):
+        undefined = ["def %s(*args):\n    _undefined(%r)" % (python_name, name)
+                     for name, python_name in self.functions.items() if name not in self.defined]
+        return "\n".join(self.constants + self.lines + undefined) + "\n"
+
+    def line(self, depth, text):
+        self.lines.append("    " * depth + text)
+
+    def lookup(self, name):
+        for scope in reversed(self.scopes):
+            location = scope.get(name)
+            if location is not None:
+                return location
+        raise UCRuntimeError("'%s' is not defined" % name)
+
+    def variable(self, name):
+        # the Python name of the variable name, noting the globals assigned
+        kind, python_name = self.lookup(name)
+        if kind == "global":
+            self.assigned.add(python_name)
+        return python_name
+
+    # declarations
+
+    def program(self, node):
+        for gdecl in node.gdecls:
+            if isinstance(gdecl, GlobalDecl):
+                for decl in gdecl.decls:
+                    self.global_decl(decl)
+            else:
+                self.function(gdecl)
+
+    def declare_function(self, name):
+        python_name = self.functions.setdefault(name, name + "_f")
+        self.scopes[-1][name] = ("function", python_name)
+        return python_name
+
+    def global_decl(self, node):
+        name = node.name.name
+        if isinstance(node.type, FuncDecl):
+            self.declare_function(name)
+            return
+        python_name = name + "_g"
+        self.scopes[0][name] = ("global", python_name)
+        self.line(0, "%s = %s" % (python_name, self.initializer(node, global_array=True)))
+
+    def initializer(self, node, global_array=False):
+        """The Python expression of the initial value of the variable
+        declared by the Decl node."""
+        uc_type = node.attrs['uc_type']
+        init = node.init
+        if hasattr(uc_type, "size"):
+            values = uc_runtime.initial_values(init) if init is not None else ()
+            if global_array:
+                return _array_source(uc_type, values)
+            constant = "_k%d" % len(self.constants)
+            self.constants.append("%s = %s" % (constant, _array_source(uc_type, values)))
+            return constant + "[:]"
+        if init is None:
+            return "0"
+        if isinstance(init, InitList):
+            init = init.exprs[0]
+        return self.expr(init)
+
+    def function(self, node):
+        name = node.decl.name.name
+        python_name = self.declare_function(name)
+        self.defined.add(name)
+        args = node.decl.type.args
+        params = args.params if args is not None else ()
+        # the parameters and the declarations of the body share a scope
+        self.scopes.append({})
+        self.nlocals = 0
+        self.assigned = set()
+        names = [self.new_local(param.name.name) for param in params]
+        self.line(0, "def %s(%s):" % (python_name, ", ".join(names)))
+        start = len(self.lines)
+        statements = node.statements.dcls + node.statements.stmts
+        for statement in statements:
+            self.statement(statement, 1)
+        if not statements or not isinstance(statements[-1], Return):
+            self.line(1, "return 0")
+        if self.assigned:
+            self.lines.insert(start, "    global " + ", ".join(sorted(self.assigned)))
+        self.scopes.pop()
+
+    def new_local(self, name):
+        self.nlocals += 1
+        python_name = "%s_%d" % (name, self.nlocals)
+        self.scopes[-1][name] = ("local", python_name)
+        return python_name
+
+    # statements
+
+    def statement(self, node, depth):
+        compile = getattr(self, "stmt_" + node.__class__.__name__, None)
+        if compile is None:
+            self.expr_statement(node, depth)
+        else:
+            compile(node, depth)
+
+    def suite(self, nodes, depth):
+        """The statements nodes as the body of a compound statement of
+        Python, at depth."""
+        start = len(self.lines)
+        for node in nodes:
+            if node is not None:
+                self.statement(node, depth)
+        if len(self.lines) == start:
+            self.line(depth, "pass")
+
+    def expr_statement(self, node, depth):
+        if isinstance(node, ExprList):
+            for expr in node.exprs:
+                self.expr_statement(expr, depth)
+        elif isinstance(node, Assignment):
+            self.line(depth, "%s = %s" % (self.target(node.lvalue), self.expr(node.rvalue)))
+        else:
+            self.line(depth, self.expr(node))
+
+    def stmt_Decl(self, node, depth):
+        if isinstance(node.type, FuncDecl):
+            self.declare_function(node.name.name)
+            return
+        # the name is visible in its initializer, as in the semantic analysis
+        python_name = self.new_local(node.name.name)
+        self.line(depth, "%s = %s" % (python_name, self.initializer(node)))
+
+    def stmt_DeclList(self, node, depth):
+        for decl in node.decls:
+            self.statement(decl, depth)
+
+    def stmt_Compound(self, node, depth):
+        self.scopes.append({})
+        for statement in node.dcls + node.stmts:
+            self.statement(statement, depth)
+        self.scopes.pop()
+
+    def stmt_EmptyStatement(self, node, depth):
+        pass
+
+    def stmt_If(self, node, depth):
+        self.line(depth, "if %s:" % self.expr(node.cond))
+        self.suite([node.if_statements], depth + 1)
+        if node.else_statements is not None:
+            self.line(depth, "else:")
+            self.suite([node.else_statements], depth + 1)
+
+    def stmt_While(self, node, depth):
+        self.line(depth, "while %s:" % self.expr(node.cond))
+        self.suite([node.statements], depth + 1)
+
+    def stmt_For(self, node, depth):
+        # the declarations of the initialization belong to the loop
+        self.scopes.append({})
+        if node.init is not None:
+            self.statement(node.init, depth)
+        self.line(depth, "while %s:" % (self.expr(node.cond) if node.cond is not None else "True"))
+        # uC has no continue, the next expression ends the body
+        self.suite([node.statements, node.next], depth + 1)
+        self.scopes.pop()
+
+    def stmt_Break(self, node, depth):
+        self.line(depth, "break")
+
+    def stmt_Return(self, node, depth):
+        self.line(depth, "return %s" % (self.expr(node.expr) if node.expr is not None else "0"))
+
+    def stmt_Assert(self, node, depth):
+        coord = node.expr.coord
+        self.line(depth, "if not %s:" % self.expr(node.expr))
+        self.line(depth + 1, "_fail(%d, %r)" % (coord.line, coord.column))
+
+    def stmt_Print(self, node, depth):
+        if node.expr is None:
+            text = repr("\n")
+        else:
+            exprs = node.expr.exprs if isinstance(node.expr, ExprList) else [node.expr]
+            parts = []
+            for expr in exprs:
+                typename = expr.attrs['uc_type'].typename
+                if isinstance(expr, Constant):
+                    parts.append(repr(uc_runtime.FORMATS[typename](uc_runtime.constant_value(expr))))
+                else:
+                    parts.append(_FORMATS[typename] % self.expr(expr))
+            # the values are all computed before the first one is written
+            text = " + ".join(parts)
+        self.line(depth, "_append(%s)" % text)
+        self.line(depth, "if len(_chunks) > _LIMIT:")
+        self.line(depth + 1, "_flush()")
+
+    def stmt_Read(self, node, depth):
+        exprs = node.expr.exprs if isinstance(node.expr, ExprList) else [node.expr]
+        for expr in exprs:
+            self.line(depth, "%s = %s" % (self.target(expr), _READERS[expr.attrs['uc_type'].typename]))
+
+    # expressions
+
+    def expr(self, node):
+        """The Python expression of the expression node, in parentheses
+        unless it is a name or a constant."""
+        return getattr(self, "expr_" + node.__class__.__name__)(node)
+
+    def target(self, node):
+        """The Python target of an assignment to the variable or element
+        node."""
+        if isinstance(node, ID):
+            return self.variable(node.name)
+        base, index, _ = self.element(node)
+        return "%s[%s]" % (base, index)
+
+    def expr_Constant(self, node):
+        return repr(uc_runtime.constant_value(node))
+
+    def expr_ID(self, node):
+        return self.lookup(node.name)[1]
+
+    def expr_BinaryOp(self, node):
+        op = node.op
+        uc_type = node.left.attrs['uc_type']
+        left = self.expr(node.left)
+        right = self.expr(node.right)
+        if hasattr(uc_type, "size"):
+            return "(%s %s %s)" % (left, "is" if op == "==" else "is not", right)
+        if uc_type.typename == "char" and op in ("&&", "||"):
+            return "(%s != 0 %s %s != 0)" % (left, _OPERATORS[op], right)
+        if op in ("/", "%"):
+            if isinstance(node.right, Constant) and int(node.right.value) > 0 and left.isidentifier():
+                # the left operand is read twice, a name is read the same
+                return "(%s %s %s if %s >= 0 else -(-%s %s %s))" % (
+                    left, "//" if op == "/" else "%", right, left, left, "//" if op == "/" else "%", right)
+            return "%s(%s, %s)" % ("_div" if op == "/" else "_mod", left, right)
+        if uc_type.typename == "int" and op in ("+", "-", "*"):
+            # adding a positive constant can only go past INT_MAX,
+            # subtracting one past INT_MIN
+            positive = isinstance(node.right, Constant) and int(node.right.value) > 0
+            return _int_range("%s %s %s" % (left, op, right), not (positive and op == "+"),
+                              not (positive and op == "-"))
+        return "(%s %s %s)" % (left, _OPERATORS[op], right)
+
+    def expr_UnaryOp(self, node):
+        value = self.expr(node.expr)
+        if node.op == "+":
+            return value
+        if node.op == "!":
+            return "(not %s)" % value
+        if isinstance(node.expr, Constant) and int(node.expr.value) <= -uc_runtime.INT_MIN:
+            return "(-%s)" % value
+        return _int_range("-%s" % value, low=False)
+
+    def expr_ExprList(self, node):
+        return "(%s)[-1]" % "".join(self.expr(expr) + ", " for expr in node.exprs)
+
+    def expr_Assignment(self, node):
+        value = self.expr(node.rvalue)
+        if isinstance(node.lvalue, ID):
+            return "(%s := %s)" % (self.variable(node.lvalue.name), value)
+        base, index, _ = self.element(node.lvalue)
+        return "_store(%s, %s, %s)" % (base, value, index)
+
+    def element(self, node):
+        """The Python expressions of the array and of the index of the
+        element of the ArrayRef node, which checks each subscript against
+        its dimension, and the number of elements of its value when it is
+        an array itself, or None."""
+        subscripts = []
+        while isinstance(node, ArrayRef):
+            subscripts.append(node.subscript)
+            node = node.name
+        subscripts.reverse()
+        base = self.expr(node)
+        # the arrays of each dimension, outer to inner
+        uc_type = node.attrs['uc_type']
+        dimensions = []
+        while hasattr(uc_type, "size"):
+            dimensions.append(uc_type)
+            uc_type = uc_type.type
+        terms = []
+        offset = 0
+        for subscript, dimension in zip(subscripts, dimensions):
+            stride = uc_runtime.flat_size(dimension.type)
+            bound = dimension.size
+            if isinstance(subscript, Constant) and 0 <= uc_runtime.constant_value(subscript) \
+                    and (bound is None or uc_runtime.constant_value(subscript) < bound):
+                offset += uc_runtime.constant_value(subscript) * stride
+                continue
+            index = self.expr(subscript)
+            if not index.isidentifier():
+                # the value is read twice, a name is read the same
+                index = "(_i := %s)" % index
+                name = "_i"
+            else:
+                name = index
+            if bound is None:
+                # the end of the array bounds an outer dimension of
+                # unknown size
+                index = "(%s if %s >= 0 else _out_of_range())" % (name, index)
+            else:
+                index = "(%s if 0 <= %s < %d else _out_of_range())" % (name, index, bound)
+            terms.append(index if stride == 1 else "%s * %d" % (index, stride))
+        if offset or not terms:
+            terms.append(str(offset))
+        size = None
+        if len(subscripts) < len(dimensions):
+            size = uc_runtime.flat_size(dimensions[len(subscripts) - 1].type)
+        return base, " + ".join(terms), size
+
+    def expr_ArrayRef(self, node):
+        base, index, size = self.element(node)
+        if size is None:
+            return "%s[%s]" % (base, index)
+        return "_row(%s, %s, %d)" % (base, index, size)
+
+    def expr_FuncCall(self, node):
+        if node.args is None:
+            args = []
+        elif isinstance(node.args, ExprList):
+            args = node.args.exprs
+        else:
+            args = [node.args]
+        return "%s(%s)" % (self.lookup(node.name.name)[1], ", ".join(self.expr(arg) for arg in args))
@@ -0,0 +1,236 @@
+"""Run-time support of the engines that execute checked uC programs: the
+values of the constants, the operations whose C semantics Python does not
+share, print and read, and the errors that stop a running program.
+
+Values are Python ints for int and char (the code of the character), bools
+and strs for string constants. An int is 32 bits: an arithmetic operation
+or a read whose value is out of its range stops the program, as storing
+such a value in an int array does. Arrays hold their elements flattened in
+row-major order, in an array('i') for int and a bytearray for char. Like
+the constants of the source, strings are not unescaped: a char array has
+one element per character between the quotes, as the semantic analysis
+counts them.
+
+print writes its values one after the other, with nothing between them,
+and a print with no arguments writes a newline. read takes one word of the
+input for each variable, an int or a char (the first character of the
+word). A failed assert writes "assertion_fail on <line>:<column>" and
+stops the program with exit status 1, as does a run-time error, written
+as "RuntimeError: <message>".
+"""
+import sys
+from array import array
+
+# Frames of Python per nested uC call are engine specific, this limit
+# lets the recursive programs of the benchmarks run
+RECURSION_LIMIT = 20000
+
+# the range of the values of int
+INT_MIN = -2 ** 31
+INT_MAX = 2 ** 31 - 1
+
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "0": "\0", "a": "\a", "b": "\b", "f": "\f", "v": "\v"}
+
+
+class UCRuntimeError(Exception):
+    """An error of the running program, stopping it."""
+
+
+class AssertionFailed(Exception):
+    """A failed assert, at coord."""
+
+    def __init__(self, coord):
+        super().__init__(coord)
+        self.coord = coord
+
+
+def char_code(value):
+    """The code of the char Constant value, as "'a'" or "'\\n'"."""
+    text = value[1:-1]
+    if text.startswith("\\") and len(text) > 1:
+        text = _ESCAPES.get(text[1], text[1])
+    return text[:1].encode("latin-1", "replace")[0] if text else 0
+
+
+def string_text(value):
+    """The text of the string Constant value, without its quotes."""
+    return value[1:-1]
+
+
+def constant_value(node):
+    """The value of the Constant node."""
+    if node.type == "int":
+        return int(node.value)
+    if node.type == "char":
+        return char_code(node.value)
+    return string_text(node.value)
+
+
+def c_int(value):
+    """value, raising OverflowError when it is out of the range of int."""
+    if not INT_MIN <= value <= INT_MAX:
+        raise OverflowError
+    return value
+
+
+def c_div(a, b):
+    """a / b of C, rounding towards zero. Only INT_MIN / -1 is out of the
+    range of int."""
+    q = abs(a) // abs(b)
+    if (a < 0) != (b < 0):
+        return -q
+    if q > INT_MAX:
+        raise OverflowError
+    return q
+
+
+def c_mod(a, b):
+    """a % b of C, with the sign of a."""
+    r = abs(a) % abs(b)
+    return -r if a < 0 else r
+
+
+def format_bool(value):
+    return "true" if value else "false"
+
+
+# print of the values of each basic type, by typename
+FORMATS = {"int": str, "char": chr, "string": str, "bool": format_bool}
+
+
+def element_typename(uc_type):
+    """The typename of the elements of the (nested) array type uc_type."""
+    while hasattr(uc_type, "size"):
+        uc_type = uc_type.type
+    return uc_type.typename
+
+
+def flat_size(uc_type):
+    """The number of elements of the array type uc_type, flattened, or None
+    when its size is not known."""
+    size = 1
+    while hasattr(uc_type, "size"):
+        if uc_type.size is None:
+            return None
+        size *= uc_type.size
+        uc_type = uc_type.type
+    return size
+
+
+def new_array(uc_type, values=()):
+    """The storage of an array of uc_type holding values, then zeros."""
+    size = flat_size(uc_type)
+    if element_typename(uc_type) == "char":
+        storage = bytearray(size)
+        storage[:len(values)] = bytes(values)
+    else:
+        storage = array("i", bytes(4 * size))
+        storage[:len(values)] = array("i", values)
+    return storage
+
+
+def initial_values(init):
+    """The elements of the array initializer init (an InitList or a string
+    Constant), flattened."""
+    if hasattr(init, "exprs"):
+        values = []
+        for expr in init.exprs:
+            values.extend(initial_values(expr) if hasattr(expr, "exprs") or expr.type == "string"
+                          else (constant_value(expr),))
+        return values
+    return list(string_text(init.value).encode("latin-1", "replace"))
+
+
+class Output:
+    """The text printed by a running program, kept in chunks and written to
+    file when it is flushed: before reading, at the end and every LIMIT
+    chunks."""
+
+    LIMIT = 4096
+
+    def __init__(self, file=None):
+        self.file = file
+        self.chunks = []
+
+    def flush(self):
+        if self.chunks:
+            (self.file or sys.stdout).write("".join(self.chunks))
+            del self.chunks[:]
+
+
+class Input:
+    """The words of the input of a running program."""
+
+    def __init__(self, output, file=None):
+        self.output = output
+        self.file = file
+        self.words = []
+
+    def word(self):
+        words = self.words
+        if not words:
+            # the prompt printed before reading is shown first
+            self.output.flush()
+            file = self.file or sys.stdin
+            while not words:
+                line = file.readline()
+                if not line:
+                    raise UCRuntimeError("read: end of input")
+                words.extend(reversed(line.split()))
+        return words.pop()
+
+    def read_int(self):
+        word = self.word()
+        try:
+            value = int(word)
+        except ValueError:
+            raise UCRuntimeError("read: %r is not an int" % word) from None
+        return c_int(value)
+
+    def read_char(self):
+        return self.word()[:1].encode("latin-1", "replace")[0]
+
+    def read_bool(self):
+        return self.word() not in ("0", "false")
+
+
+def reader(input, typename):
+    """The method of input reading a value of typename."""
+    return {"int": input.read_int, "char": input.read_char, "bool": input.read_bool}[typename]
+
+
+def run(main, output, input, stdin=None, stdout=None):
+    """Call main, the entry point of a program, writing to stdout and reading
+    from stdin (by default sys.stdout and sys.stdin) through output and
+    input. Returns the exit status: the int main returns, or 1 when the
+    program is stopped by a failed assert or a run-time error."""
+    output.file, input.file = stdout, stdin
+    del output.chunks[:]
+    del input.words[:]
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, RECURSION_LIMIT))
+    try:
+        status = main()
+    except AssertionFailed as e:
+        output.chunks.append("assertion_fail on %s:%s\n" % (e.coord.line, e.coord.column))
+        status = 1
+    except (UCRuntimeError, ZeroDivisionError, IndexError, OverflowError, RecursionError) as e:
+        output.chunks.append("RuntimeError: %s\n" % runtime_message(e))
+        status = 1
+    finally:
+        sys.setrecursionlimit(limit)
+        output.flush()
+    return status if isinstance(status, int) else 0
+
+
+def runtime_message(error):
+    """The message of the exception error stopping a program."""
+    if isinstance(error, ZeroDivisionError):
+        return "division by zero"
+    if isinstance(error, IndexError):
+        return "array index out of range"
+    if isinstance(error, OverflowError):
+        return "value out of the range of its type"
+    if isinstance(error, RecursionError):
+        return "too many nested calls"
+    return str(error)
@@ -0,0 +1,849 @@
+"""Semantic analysis of the uC language: the type system, the symbol
+table and the Visitor that checks and decorates the AST built by the
+parser (exported from P4_Semantic.ipynb).
+"""
+import sys
+from types import GeneratorType
+
+from uc_ast_correto import ID, ArrayRef, Constant, ExprList, InitList, child_names
+
+
+class Type:
+    """
+    Class that represents a type in the language. Basic
+    Types are declared as singleton instances of this type.
+    """
+
+    def __init__(self, name):
+        self.typename = name
+
+    def __repr__(self):
+        return self.typename
+
+class uCType(Type):
+
+    def __init__(self, name, binary_ops=set(), unary_ops=set(), rel_ops=set(), assign_ops=set()):
+        super().__init__(name)
+        self.binary_ops = binary_ops
+        self.unary_ops = unary_ops
+        self.rel_ops = rel_ops
+        self.assign_ops = assign_ops
+
+    def __reduce__(self):
+        # the basic types are singletons, unpickled as the same objects
+        return _basic_type, (self.typename,)
+
+# Create specific instances of basic types. You will need to add
+# appropriate arguments depending on your definition of Type
+IntType = uCType(
+    "int",
+    unary_ops  = {"-", "+"},
+    binary_ops = {"+", "-", "*", "/", "%"},
+    rel_ops    = {"==", "!=", "<", ">", "<=", ">="},
+    assign_ops = {"="}
+)
+
+CharType = uCType(
+    "char",
+    rel_ops    = {"==", "!=", "&&", "||"},
+    assign_ops = {"="}
+)
+
+StringType = uCType(
+    "string",
+    binary_ops = {"+"},
+    rel_ops    = {"==", "!="},
+)
+
+BoolType = uCType(
+    "bool",
+    unary_ops  = {"!"},
+    rel_ops    = {"==", "!=", "&&", "||"},
+    assign_ops = {"="}
+)
+
+VoidType = uCType("void")
+
+# Type of the expressions with semantic errors, it is accepted by every
+# check so each error is reported once
+ErrorType = uCType("<error>")
+
+
+def _basic_type(typename):
+    """The basic type named typename, for unpickling."""
+    for uc_type in (IntType, CharType, StringType, BoolType, VoidType, ErrorType):
+        if uc_type.typename == typename:
+            return uc_type
+    raise ValueError("unknown type %r" % (typename,))
+
+
+# Array & Function types are interned: the types with the same structure
+# are one object, made the first time, so they are compared by identity
+def represent_array(obj):
+    def _repr(obj):
+        if isinstance(obj.type, ArrayType):
+            return '['+(str(obj.size) if obj.size is not None else '')+']'+_repr(obj.type)
+        else:
+            return '['+(str(obj.size) if obj.size is not None else '')+']'
+
+    if isinstance(obj, ArrayType):
+        return obj.typename+_repr(obj)
+    
+class ArrayType(uCType):
+
+    _interned = {}
+
+    def __new__(cls, element_type, size=None):
+        key = (element_type, size)
+        self = cls._interned.get(key)
+        if self is None:
+            self = cls._interned[key] = super().__new__(cls)
+            uCType.__init__(self, element_type.typename, rel_ops={"==", "!="}, assign_ops = {"="})
+            self.type = element_type
+            self.size = size
+        return self
+
+    def __init__(self, element_type, size=None):
+        """
+        type: Any of the uCTypes can be used as the array's type. This
+              means that there's support for nested types, like matrices.
+        size: Integer with the length of the array.
+        The attributes are set once, by __new__.
+        """
+
+    def __reduce__(self):
+        return ArrayType, (self.type, self.size)
+
+    def __repr__(self):
+        return represent_array(self)
+
+class FunctionType(uCType):
+
+    _interned = {}
+
+    def __new__(cls, return_type, param_list=()):
+        params = tuple(param_list or ())
+        key = (return_type, params)
+        self = cls._interned.get(key)
+        if self is None:
+            self = cls._interned[key] = super().__new__(cls)
+            uCType.__init__(self, return_type.typename)
+            self.type = return_type
+            self.params = params
+        return self
+
+    def __init__(self, return_type, param_list=()):
+        """
+        type: Any of the uCTypes can be used as the function's type.
+        params: Tuple of the uCTypes of all parameters of the function.
+        """
+
+    def __reduce__(self):
+        return FunctionType, (self.type, self.params)
+
+    def __repr__(self):
+        return self.typename+' ('+', '.join(map(str, self.params))+')' 
+
+
+class _Scopes:
+    """State shared by the scopes of one symbol table: the stack of bindings
+    of each name in the open scopes, innermost last, and the innermost scope."""
+
+    __slots__ = ("stacks", "current", "root")
+
+    def __init__(self, root):
+        self.stacks = {}
+        self.current = None
+        self.root = root
+
+
+class SymbolTable(dict):
+    """ Class representing a symbol table. It should provide functionality
+        for adding and looking up nodes associated with identifiers.
+
+        Each SymbolTable is a scope holding its own names, and the scopes of
+        a program share one map from every name to the stack of its
+        bindings in the open scopes, so looking a name up from the
+        innermost scope takes one dict access at any nesting depth. The
+        names of a scope are its undo log: close() pops them from the
+        stacks and returns the parent scope.
+    """
+    __slots__ = ("parent", "_scopes")
+
+    def __init__(self, parent=None):
+        super().__init__()
+        self.parent = parent
+        self._scopes = _Scopes(self) if parent is None else parent._scopes
+        self._activate()
+
+    def _activate(self):
+        """Make this scope the innermost one of the stacks, undoing the
+        scopes that are not its ancestors and redoing its ancestors."""
+        scopes = self._scopes
+        if scopes.current is self:
+            return
+        stacks = scopes.stacks
+        applied = set()
+        scope = scopes.current
+        while scope is not None:
+            applied.add(id(scope))
+            scope = scope.parent
+        redo = []
+        scope = self
+        while scope is not None and id(scope) not in applied:
+            redo.append(scope)
+            scope = scope.parent
+        undo = scopes.current
+        while undo is not scope:
+            for name in undo:
+                stack = stacks[name]
+                stack.pop()
+                if not stack:
+                    del stacks[name]
+            undo = undo.parent
+        for scope in reversed(redo):
+            for name, value in scope.items():
+                stacks.setdefault(name, []).append(value)
+        scopes.current = self
+
+    def add(self, name, value):
+        self._activate()
+        stack = self._scopes.stacks.setdefault(name, [])
+        if name in self:
+            stack[-1] = value
+        else:
+            stack.append(value)
+        self[name] = value
+
+    def lookup(self, name):
+        if self._scopes.current is self:
+            stack = self._scopes.stacks.get(name)
+            return stack[-1] if stack else None
+        # a scope that is not the innermost one walks its own chain
+        scope = self
+        while scope is not None:
+            if name in scope:
+                return scope[name]
+            scope = scope.parent
+        return None
+
+    def close(self):
+        """Leave this scope, returning its parent."""
+        if self.parent is not None:
+            self.parent._activate()
+        else:
+            self._activate()
+            for name in self:
+                del self._scopes.stacks[name]
+            self._scopes.current = None
+        return self.parent
+
+    def root(self):
+        return self._scopes.root
+
+def _make_pusher(node_class):
+    """Generate the function that pushes the children of the nodes of
+    node_class on a stack, the last one first, so they are popped in the
+    order of children()."""
+    lines = ["def push(node, stack):"]
+    for name in reversed(child_names(node_class)):
+        lines += [
+            "    child = node.%s" % name,
+            "    if child is not None:",
+            "        if isinstance(child, list):",
+            "            stack.extend(reversed(child))",
+            "        else:",
+            "            stack.append(child)",
+        ]
+    if len(lines) == 1:
+        lines.append("    pass")
+    namespace = {}
+    exec("\n".join(lines), namespace)
+    push = namespace["push"]
+    push.__name__ = push.__qualname__ = "push_" + node_class.__name__
+    return push
+
+
+class _Pushers(dict):
+    # node class -> function pushing the children of its nodes: its
+    # push_children, as the views of uc_arena have, or a generated one
+    def __missing__(self, node_class):
+        pusher = getattr(node_class, "push_children", None) or _make_pusher(node_class)
+        self[node_class] = pusher
+        return pusher
+
+
+_pushers = _Pushers()
+
+
+class _DispatchTable(dict):
+    """Node class -> function visiting its nodes for one visitor class: its
+    visit_<class name> method, or else generic_visit."""
+
+    def __init__(self, visitor_class):
+        super().__init__()
+        self.visitor_class = visitor_class
+
+    def __missing__(self, node_class):
+        visit = getattr(self.visitor_class, "visit_" + node_class.__name__, None)
+        if visit is None:
+            visit = self.visitor_class.generic_visit
+        self[node_class] = visit
+        return visit
+
+
+class NodeVisitor:
+    """ A base NodeVisitor class for visiting uc_ast nodes.
+        Subclass it and define your own visit_XXX methods, where
+        XXX is the class name you want to visit with these
+        methods.
+
+        A visit_XXX method can be a generator that yields the children
+        it visits, instead of calling self.visit on them: each yield
+        gives back the result of the visit of the child. The visits are
+        then run from an explicit stack, as generic_visit does, so deep
+        trees do not exhaust the Python stack.
+
+        Each visitor class has a dispatch table from node classes to the
+        functions visiting them, filled the first time a class is
+        visited, and the children of a node are read straight from the
+        slots that hold them (see child_names) by generated functions.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._dispatch = _DispatchTable(cls)
+
+    def visit(self, node):
+        """ Visit a node.
+        """
+        result = self._dispatch[node.__class__](self, node)
+        if result.__class__ is GeneratorType:
+            return self._resume(result)
+        return result
+
+    def _resume(self, visit):
+        """Run the generator visit of a node, and the visits of the
+        children it yields, to the end. Returns its result."""
+        dispatch = self._dispatch
+        stack = [visit]
+        value = None
+        while stack:
+            try:
+                node = stack[-1].send(value)
+            except StopIteration as stop:
+                stack.pop()
+                value = stop.value
+                continue
+            value = dispatch[node.__class__](self, node)
+            if value.__class__ is GeneratorType:
+                stack.append(value)
+                value = None
+        return value
+
+    def generic_visit(self, node):
+        """ Called if no explicit visitor function exists for a
+            node. Implements preorder visiting of the node.
+        """
+        dispatch = self._dispatch
+        stack = []
+        _pushers[node.__class__](node, stack)
+        while stack:
+            node = stack.pop()
+            visit = dispatch[node.__class__]
+            if visit is _generic_visit:
+                _pushers[node.__class__](node, stack)
+            else:
+                result = visit(self, node)
+                if result.__class__ is GeneratorType:
+                    self._resume(result)
+
+
+_generic_visit = NodeVisitor.generic_visit
+NodeVisitor._dispatch = _DispatchTable(NodeVisitor)
+
+
+class ConstantVisitor(NodeVisitor):
+    def __init__(self):
+        self.values = []
+
+    def visit_Constant(self, node):
+        self.values.append(node.value)
+
+
+# Messages of the semantic errors, formatted with the name and the types
+# involved in the error
+ERROR_MSGS = {
+     1: "'{name}' is not defined",
+     2: "subscript must be of type 'int', not type '{ltype}'",
+     3: "Expression must be of type 'bool', not type '{ltype}'",
+     4: "Cannot assign type '{rtype}' to type '{ltype}'",
+     5: "Assignment operator '{name}' is not supported by type '{ltype}'",
+     6: "Binary operator '{name}' does not have matching LHS/RHS types",
+     7: "Binary operator '{name}' is not supported by type '{ltype}'",
+     8: "Break statement must be inside a loop",
+     9: "Array has incomplete element type '{ltype}'",
+    10: "Size mismatch on '{name}' initialization",
+    11: "'{name}' initialization type mismatch",
+    12: "'{name}' initialization must be a single element",
+    13: "Lists have different sizes",
+    14: "List & variable have different sizes",
+    15: "Variable declared as array of functions of type '{ltype}'",
+    16: "'{name}' is not a function",
+    17: "no. arguments to call '{name}' function mismatch",
+    18: "Type mismatch with parameter '{name}'",
+    19: "The condition expression must be of type(bool), not type '{ltype}'",
+    20: "Expression must be a constant",
+    21: "Expression is not of basic type",
+    22: "'{name}' does not reference a variable of basic type",
+    23: "'{name}' is not a variable",
+    24: "Return of type '{ltype}' is incompatible with type '{rtype}' function definition",
+    25: "Name '{name}' is already defined in this scope",
+    26: "Unary operator '{name}' is not supported by type '{ltype}'",
+    27: "Conflicting declarations for function '{name}'",
+    28: "'{name}' initialization must be a list or string literal",
+    29: "Lists have different types",
+    30: "Subscripted value is not an array",
+    31: "Expression must be a variable",
+    32: "Expression is not assignable",
+    33: "Variable has incomplete type '{ltype}'",
+    34: "'{name}' initialization must be a list",
+    35: "Undefined error",
+}
+
+# Basic types accepted by print and read
+BASIC_TYPES = (IntType, CharType, StringType, BoolType)
+
+
+class Diagnostic:
+    """A semantic error: the code of its message in ERROR_MSGS, where it
+    happened and the name and types the message refers to."""
+
+    __slots__ = ("code", "coord", "name", "ltype", "rtype")
+
+    def __init__(self, code, coord, name="", ltype="", rtype=""):
+        self.code = code
+        self.coord = coord
+        self.name = name
+        self.ltype = ltype
+        self.rtype = rtype
+
+    @property
+    def message(self):
+        return ERROR_MSGS[self.code].format(name=self.name, ltype=self.ltype, rtype=self.rtype)
+
+    def __str__(self):
+        return "SemanticError: %s %s" % (self.message, self.coord)
+
+    def __repr__(self):
+        return "Diagnostic(%d, %r)" % (self.code, str(self))
+
+
+def _same_type(expected, actual):
+    """Whether a value of type actual can be used where expected is required.
+    Arrays of unknown size, as parameters, take arrays of any size."""
+    if isinstance(expected, ArrayType) and isinstance(actual, ArrayType):
+        return (expected.size is None or expected.size == actual.size) and _same_type(expected.type, actual.type)
+    return expected == actual
+
+
+class Visitor(NodeVisitor):
+    '''
+    Program visitor class. This class uses the visitor pattern. You need to define methods
+    of the form visit_NodeName() for each kind of AST node that you want to process.
+
+    By default the first semantic error is printed and the program exits.
+    With collect=True the errors are kept in self.diagnostics instead, and
+    the analysis goes on giving ErrorType to the erroneous expressions, so
+    one pass reports every error (see check).
+
+    The visit methods yield the children they visit, which NodeVisitor
+    runs from an explicit stack.
+    '''
+    def __init__(self, collect=False):
+        # Keep a reference to current symbol table
+        self.symtab = None
+
+        # Keep a reference to current function
+        self.func = None
+
+        # Enclosing loops of the current statement
+        self.loops = []
+
+        self.collect = collect
+        self.diagnostics = []
+
+        # Add built-in type names (int, char, void)
+        self.typemap = {
+            "int": IntType,
+            "char": CharType,
+            "string": StringType,
+            "bool": BoolType,
+            "void": VoidType,
+        }
+
+    def check(self, node):
+        """Visit the program node and return the list of its semantic errors."""
+        self.diagnostics = []
+        self.visit(node)
+        return self.diagnostics
+
+    def _assert_semantic(self, condition, msg_code, coord, name="", ltype="", rtype=""):
+        """Check condition, if false report the selected error message:
+        exit, or record it when collecting. Returns condition."""
+        if not condition:
+            diagnostic = Diagnostic(msg_code, coord, name, ltype, rtype)
+            if not self.collect:
+                print(diagnostic, file=sys.stdout)
+                sys.exit(1)
+            self.diagnostics.append(diagnostic)
+        return condition
+
+    def _expr_name(self, node):
+        # name of the variable an ID or ArrayRef refers to
+        while isinstance(node, ArrayRef):
+            node = node.name
+        return node.name if isinstance(node, ID) else ""
+
+    def _declare(self, node):
+        """Add the declaration node, already visited, to the current scope."""
+        name = node.name.name
+        ltype = node.attrs['uc_type']
+        previous = self.symtab.get(name)
+        if previous is not None:
+            ptype = previous.attrs['uc_type']
+            # functions can be declared again with the same type
+            if isinstance(ltype, FunctionType) and isinstance(ptype, FunctionType):
+                self._assert_semantic(ltype == ptype, 27, node.name.coord, name=name)
+            else:
+                self._assert_semantic(False, 25, node.name.coord, name=name)
+        self._assert_semantic(ltype is not VoidType, 33, node.name.coord, ltype=ltype)
+        self.symtab.add(name, node.name)
+        node.name.attrs['scope'] = self.symtab
+        node.name.attrs['uc_type'] = ltype
+        if isinstance(ltype, FunctionType):
+            node.name.attrs['params'] = node.type.args.params if node.type.args is not None else []
+
+    def _visit_block(self, node):
+        for _decl in node.dcls:
+            yield _decl
+        for _stmt in node.stmts:
+            yield _stmt
+
+    def _visit_cond(self, node):
+        yield node.cond
+        ctype = node.cond.attrs['uc_type']
+        self._assert_semantic(ctype is BoolType or ctype is ErrorType, 19, node.cond.coord, ltype=ctype)
+
+    def _check_init(self, node, ltype, init, itype):
+        """Check the initializer init, of type itype, of the declaration of
+        node with type ltype. Returns ltype, or for an array without size
+        the array type with the size of the initializer."""
+        name = node.name.name
+        if isinstance(ltype, ArrayType):
+            if isinstance(init, Constant) and itype is StringType:
+                if not self._assert_semantic(not isinstance(ltype.type, ArrayType), 34, node.name.coord, name=name):
+                    return ltype
+                if not self._assert_semantic(ltype.type is CharType, 11, node.name.coord, name=name):
+                    return ltype
+                length = len(init.value) - 2
+                if ltype.size is None:
+                    ltype = ArrayType(ltype.type, length)
+                self._assert_semantic(ltype.size == length, 10, node.name.coord, name=name)
+            elif isinstance(itype, ArrayType):
+                if ltype.size is None:
+                    ltype = ArrayType(ltype.type, itype.size)
+                if not self._assert_semantic(ltype.size == itype.size, 14, node.name.coord):
+                    return ltype
+                for expr in init.exprs:
+                    self._check_init(node, ltype.type, expr, expr.attrs['uc_type'])
+            else:
+                self._assert_semantic(itype is ErrorType, 28, node.name.coord, name=name)
+        elif isinstance(init, InitList):
+            if self._assert_semantic(len(init.exprs) == 1, 12, node.name.coord, name=name):
+                self._check_init(node, ltype, init.exprs[0], init.exprs[0].attrs['uc_type'])
+        elif itype is not ErrorType:
+            self._assert_semantic(ltype == itype, 11 if isinstance(itype, ArrayType) else 4,
+                                  node.name.coord, name=name, ltype=ltype, rtype=itype)
+        return ltype
+
+    def visit_ArrayDecl(self, node):
+        yield node.type
+        etype = node.type.attrs['uc_type']
+        self._assert_semantic(not isinstance(etype, FunctionType), 15, node.coord, ltype=etype)
+        self._assert_semantic(not isinstance(etype, ArrayType) or etype.size is not None, 9,
+                              node.coord, ltype=etype)
+        size = None
+        if node.size is not None:
+            yield node.size
+            stype = node.size.attrs['uc_type']
+            if (stype is not ErrorType
+                    and self._assert_semantic(stype is IntType, 2, node.size.coord, ltype=stype)
+                    and self._assert_semantic(isinstance(node.size, Constant), 20, node.size.coord)):
+                size = int(node.size.value)
+        node.attrs['uc_type'] = ArrayType(etype, size)
+
+    def visit_ArrayRef(self, node):
+        yield node.subscript
+        stype = node.subscript.attrs['uc_type']
+        self._assert_semantic(stype is IntType or stype is ErrorType, 2, node.subscript.coord, ltype=stype)
+        yield node.name
+        ntype = node.name.attrs['uc_type']
+        if ntype is ErrorType or not self._assert_semantic(isinstance(ntype, ArrayType), 30, node.coord):
+            node.attrs['uc_type'] = ErrorType
+        else:
+            node.attrs['uc_type'] = ntype.type
+
+    def visit_Assert(self, node):
+        yield node.expr
+        etype = node.expr.attrs['uc_type']
+        self._assert_semantic(etype is BoolType or etype is ErrorType, 3, node.expr.coord, ltype=etype)
+
+    def visit_Assignment(self, node):
+        # Visit the right side
+        yield node.rvalue
+        rtype = node.rvalue.attrs['uc_type']
+        # Visit the left side
+        yield node.lvalue
+        ltype = node.lvalue.attrs['uc_type']
+        node.attrs['uc_type'] = ltype
+        # Only variables and array elements can be assigned
+        if not self._assert_semantic(isinstance(node.lvalue, (ID, ArrayRef)), 32, node.lvalue.coord):
+            return
+        if not self._assert_semantic(not isinstance(ltype, FunctionType), 23, node.lvalue.coord,
+                                     name=self._expr_name(node.lvalue)):
+            return
+        if ltype is ErrorType or rtype is ErrorType:
+            return
+        # Check that the assignment is allowed otherwise return a type error (code 4)
+        self._assert_semantic(ltype == rtype, 4, node.coord, ltype=ltype, rtype=rtype)
+        # Check that assign_ops is supported by the type or return an error (code 5)
+        self._assert_semantic("=" in ltype.assign_ops, 5, node.coord, name="=", ltype=ltype)
+
+    def visit_BinaryOp(self, node):
+        # Visit the left and right expression
+        yield node.left
+        ltype = node.left.attrs['uc_type']
+        yield node.right
+        rtype = node.right.attrs['uc_type']
+        node.attrs['uc_type'] = ErrorType
+        if ltype is ErrorType or rtype is ErrorType:
+            return
+        # Make sure left and right operands have the same type
+        if not self._assert_semantic(ltype == rtype, 6, node.coord, name=node.op):
+            return
+        # Make sure the operation is supported and assign the result type
+        if node.op in ltype.binary_ops:
+            node.attrs['uc_type'] = ltype
+        elif self._assert_semantic(node.op in ltype.rel_ops, 7, node.coord, name=node.op, ltype=ltype):
+            node.attrs['uc_type'] = BoolType
+
+    def visit_Break(self, node):
+        if self._assert_semantic(bool(self.loops), 8, node.coord):
+            node.attrs['loop'] = self.loops[-1]
+
+    def visit_Compound(self, node):
+        node.attrs['symtab'] = self.symtab = SymbolTable(self.symtab)
+        yield from self._visit_block(node)
+        self.symtab = self.symtab.close()
+
+    def visit_Constant(self, node):
+        node.attrs['uc_type'] = self.typemap[node.type]
+
+    def visit_Decl(self, node):
+        yield node.type
+        ltype = node.attrs['uc_type'] = node.type.attrs['uc_type']
+        self._declare(node)
+        if node.init is not None:
+            yield node.init
+            if self._assert_semantic(not isinstance(ltype, FunctionType), 23, node.name.coord, name=node.name.name):
+                ltype = self._check_init(node, ltype, node.init, node.init.attrs['uc_type'])
+                node.attrs['uc_type'] = node.name.attrs['uc_type'] = node.type.attrs['uc_type'] = ltype
+        elif isinstance(ltype, ArrayType):
+            self._assert_semantic(ltype.size is not None, 9, node.name.coord, ltype=ltype)
+
+    def visit_DeclList(self, node):
+        for _decl in node.decls:
+            yield _decl
+
+    def visit_EmptyStatement(self, node):
+        pass
+
+    def visit_ExprList(self, node):
+        for expr in node.exprs:
+            yield expr
+        node.attrs['uc_type'] = node.exprs[-1].attrs['uc_type']
+
+    def visit_For(self, node):
+        # declarations in the initialization belong to the loop
+        node.attrs['symtab'] = self.symtab = SymbolTable(self.symtab)
+        if node.init is not None:
+            yield node.init
+        if node.cond is not None:
+            yield from self._visit_cond(node)
+        if node.next is not None:
+            yield node.next
+        self.loops.append(node)
+        yield node.statements
+        self.loops.pop()
+        self.symtab = self.symtab.close()
+
+    def visit_FuncCall(self, node):
+        yield node.name
+        ftype = node.name.attrs['uc_type']
+        if node.args is None:
+            args = []
+        elif isinstance(node.args, ExprList):
+            args = node.args.exprs
+        else:
+            args = [node.args]
+        for arg in args:
+            yield arg
+
+        node.attrs['uc_type'] = ErrorType
+        if ftype is ErrorType:
+            return
+        name = self._expr_name(node.name)
+        if not self._assert_semantic(isinstance(ftype, FunctionType), 16, node.coord, name=name):
+            return
+        node.attrs['uc_type'] = ftype.type
+        if not self._assert_semantic(len(args) == len(ftype.params), 17, node.coord, name=name):
+            return
+        params = self.symtab.lookup(name).attrs['params']
+        for param, ptype, arg in zip(params, ftype.params, args):
+            atype = arg.attrs['uc_type']
+            self._assert_semantic(atype is ErrorType or _same_type(ptype, atype), 18, arg.coord,
+                                  name=param.name.name)
+
+    def visit_FuncDecl(self, node):
+        yield node.type
+        params = []
+        if node.args is not None:
+            yield node.args
+            params = [param.attrs['uc_type'] for param in node.args.params]
+        node.attrs['uc_type'] = FunctionType(node.type.attrs['uc_type'], params)
+
+    def visit_FuncDef(self, node):
+        yield node.spec
+        yield node.decl
+        node.attrs['uc_type'] = node.decl.attrs['uc_type']
+        func, self.func = self.func, node
+        # the parameters and the declarations of the body share a scope
+        node.attrs['symtab'] = self.symtab = SymbolTable(self.symtab)
+        if node.decl.type.args is not None:
+            # the types of the parameters were set visiting the FuncDecl
+            for param in node.decl.type.args.params:
+                self._declare(param)
+        node.statements.attrs['symtab'] = self.symtab
+        yield from self._visit_block(node.statements)
+        self.symtab = self.symtab.close()
+        self.func = func
+
+    def visit_GlobalDecl(self, node):
+        for decls in node.decls:
+            yield decls
+
+    def visit_ID(self, node):
+        symbol = self.symtab.lookup(node.name)
+        if self._assert_semantic(symbol is not None, 1, node.coord, name=node.name):
+            node.attrs['uc_type'] = symbol.attrs['uc_type']
+            node.attrs['scope'] = symbol.attrs['scope']
+        else:
+            node.attrs['uc_type'] = ErrorType
+
+    def visit_If(self, node):
+        yield from self._visit_cond(node)
+        yield node.if_statements
+        if node.else_statements is not None:
+            yield node.else_statements
+
+    def visit_InitList(self, node):
+        sizes = []
+        types = []
+        for expr in node.exprs:
+            yield expr
+            etype = expr.attrs['uc_type']
+            if isinstance(expr, InitList):
+                sizes.append(etype.size if isinstance(etype, ArrayType) else None)
+            elif not self._assert_semantic(isinstance(expr, Constant), 20, expr.coord):
+                etype = ErrorType
+            elif etype is StringType:
+                etype = ArrayType(CharType, len(expr.value) - 2)
+                sizes.append(etype.size)
+            else:
+                sizes.append(None)
+            types.append(etype)
+
+        node.attrs['uc_type'] = ErrorType
+        if ErrorType in types:
+            return
+        for expr, size in zip(node.exprs, sizes):
+            if not self._assert_semantic(size == sizes[0], 13, expr.coord):
+                return
+        for expr, etype in zip(node.exprs, types):
+            if not self._assert_semantic(etype == types[0], 29, expr.coord):
+                return
+        node.attrs['uc_type'] = ArrayType(types[0], len(types))
+
+    def visit_ParamList(self, node):
+        for param in node.params:
+            yield param.type
+            param.attrs['uc_type'] = param.type.attrs['uc_type']
+
+    def visit_Print(self, node):
+        if node.expr is None:
+            return
+        yield node.expr
+        exprs = node.expr.exprs if isinstance(node.expr, ExprList) else [node.expr]
+        for expr in exprs:
+            etype = expr.attrs['uc_type']
+            self._assert_semantic(etype in BASIC_TYPES or etype is ErrorType, 21, expr.coord)
+
+    def visit_Program(self, node):
+        # Create a symbol table for the file scope and assign it to current node
+        node.attrs['symtab'] = SymbolTable()
+        # Set the reference to current symbol table to the new symbol table
+        self.symtab = node.attrs['symtab']
+        # Visit all of the global declarations
+        for _decl in node.gdecls:
+            yield _decl
+
+    def visit_Read(self, node):
+        exprs = node.expr.exprs if isinstance(node.expr, ExprList) else [node.expr]
+        for expr in exprs:
+            yield expr
+            if not self._assert_semantic(isinstance(expr, (ID, ArrayRef)), 31, expr.coord):
+                continue
+            etype = expr.attrs['uc_type']
+            self._assert_semantic(etype in BASIC_TYPES or etype is ErrorType, 22, expr.coord,
+                                  name=self._expr_name(expr))
+
+    def visit_Return(self, node):
+        if node.expr is not None:
+            yield node.expr
+            rtype = node.expr.attrs['uc_type']
+        else:
+            rtype = VoidType
+        node.attrs['uc_type'] = rtype
+        ftype = self.func.attrs['uc_type'].type
+        self._assert_semantic(rtype is ErrorType or rtype == ftype, 24, node.coord, ltype=rtype, rtype=ftype)
+
+    def visit_Type(self, node):
+        node.attrs['uc_type'] = self.typemap[node.name]
+
+    def visit_UnaryOp(self, node):
+        yield node.expr
+        etype = node.attrs['uc_type'] = node.expr.attrs['uc_type']
+        if etype is not ErrorType:
+            if not self._assert_semantic(node.op in etype.unary_ops, 26, node.coord, name=node.op, ltype=etype):
+                node.attrs['uc_type'] = ErrorType
+
+    def visit_VarDecl(self, node):
+        yield node.type
+        node.attrs['uc_type'] = node.type.attrs['uc_type']
+
+    def visit_While(self, node):
+        yield from self._visit_cond(node)
+        self.loops.append(node)
+        yield node.statements
+        self.loops.pop()
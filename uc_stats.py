@@ -0,0 +1,307 @@
+"""Instrumentation of the compiler stages, reported by ucc --stats.
+
+    stats = Stats(profile=True)
+    lexer = stats.timed_lexer(UCLexer)(print_error)
+    stats.instrument_parser(parser)
+    stats.instrument_visitor(visitor)
+    with stats.stage("sema"), stats.counting_lookups():
+        visitor.check(ast)
+    stats.write(sys.stderr)
+
+A stage accumulates its wall and CPU time. Stages can be nested, and the
+time of a nested stage is only counted in it: the tokens are made while
+the parser runs, so the time spent in the tokenizer is the lex stage and
+the rest of parsing is the parse stage.
+
+The counters are the tokens, the reductions of each grammar rule, the
+Coords made by _token_coord, the visits of each node class and the symbol
+table lookups. ucc adds the hits and misses of its compilation cache and
+the throughput of a run over several files, so that --stats writes only
+JSON. They are gathered by the instrumented objects only, so a
+compiler that was not given a Stats runs the code it runs without one.
+Optionally the top-level stages are run under cProfile, and tracemalloc
+records their peak memory and the largest allocations.
+"""
+import collections
+import contextlib
+import copy
+import json
+import time
+
+# number of entries of the profile and of the allocations in a report
+TOP = 30
+
+
+class _CountingDispatch(dict):
+    """Dispatch table of an instrumented visitor: the functions of the
+    table of its class, counting the visits of each node class."""
+
+    def __init__(self, dispatch, counts):
+        super().__init__()
+        self.dispatch = dispatch
+        self.counts = counts
+
+    def __missing__(self, node_class):
+        visit = self.dispatch[node_class]
+        name = node_class.__name__
+        counts = self.counts
+
+        def counted(visitor, node):
+            counts[name] += 1
+            return visit(visitor, node)
+
+        self[node_class] = counted
+        return counted
+
+
+class Stats:
+    """Timers and counters of the stages run over one or more files. With
+    profile the top-level stages run under cProfile, with memory they are
+    traced by tracemalloc."""
+
+    def __init__(self, profile=False, memory=False):
+        self.profile = profile
+        self.memory = memory
+        self.files = 0
+        # name -> [wall, cpu, peak memory of the top-level runs or None]
+        self.stages = {}
+        self.tokens = 0
+        self.lookups = 0
+        self.coords = 0
+        self.reductions = collections.Counter()
+        self.visits = collections.Counter()
+        # (file, line, function) -> [calls, tottime, cumtime]
+        self.functions = {}
+        # file:line -> bytes held by the memory allocated there
+        self.allocations = collections.Counter()
+        # (hits, misses) of the compilation cache, and the files, tokens,
+        # wall time and jobs of compiling several files, set by ucc
+        self.cache = None
+        self.throughput = None
+        self._profiler = None
+        if profile:
+            import cProfile
+
+            self._profiler = cProfile.Profile()
+        # the open stages: name, start wall and cpu, time of nested stages
+        self._open = []
+        if memory:
+            import tracemalloc
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    def reset(self):
+        """Clear what was measured, keeping the instrumented objects."""
+        self.files = self.tokens = self.lookups = self.coords = 0
+        self.stages.clear()
+        self.reductions.clear()
+        self.visits.clear()
+        self.functions.clear()
+        self.allocations.clear()
+        self.cache = self.throughput = None
+        if self.profile:
+            import cProfile
+
+            self._profiler = cProfile.Profile()
+
+    def start(self, name):
+        """Start timing the stage name, inside the open stage if any."""
+        if not self._open:
+            if self._profiler is not None:
+                self._profiler.enable()
+            if self.memory:
+                import tracemalloc
+
+                tracemalloc.reset_peak()
+        self._open.append([name, time.perf_counter(), time.process_time(), 0.0, 0.0])
+
+    def stop(self):
+        """Stop timing the innermost open stage."""
+        name, wall, cpu, nested_wall, nested_cpu = self._open.pop()
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        entry = self.stages.get(name)
+        if entry is None:
+            entry = self.stages[name] = [0.0, 0.0, None]
+        entry[0] += wall - nested_wall
+        entry[1] += cpu - nested_cpu
+        if self._open:
+            self._open[-1][3] += wall
+            self._open[-1][4] += cpu
+            return
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self.memory:
+            import tracemalloc
+
+            entry[2] = max(entry[2] or 0, tracemalloc.get_traced_memory()[1])
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop()
+
+    def _functions(self):
+        # the functions merged and the ones of the profiler
+        import pstats
+
+        functions = {key: list(entry) for key, entry in self.functions.items()}
+        profile = pstats.Stats(self._profiler).stats if self._profiler.getstats() else {}
+        for key, (_, calls, tottime, cumtime, _) in profile.items():
+            entry = functions.setdefault(key, [0, 0.0, 0.0])
+            entry[0] += calls
+            entry[1] += tottime
+            entry[2] += cumtime
+        return functions
+
+    def timed_lexer(self, lexer_class):
+        """Subclass of lexer_class whose tokenize counts the tokens and
+        times making each one as the lex stage."""
+        stats = self
+
+        class TimedLexer(lexer_class):
+            tokens = lexer_class.tokens
+
+            def tokenize(self, text, lineno=1, index=0):
+                tokens = super().tokenize(text, lineno, index)
+                while True:
+                    stats.start("lex")
+                    try:
+                        tok = next(tokens)
+                    except StopIteration:
+                        return
+                    finally:
+                        stats.stop()
+                    stats.tokens += 1
+                    yield tok
+
+        TimedLexer.__name__ = TimedLexer.__qualname__ = "Timed" + lexer_class.__name__
+        return TimedLexer
+
+    def instrument_parser(self, parser):
+        """Count the reductions of each rule and the calls of _token_coord
+        of the sly parser instance parser. Its class is not changed."""
+        reductions = self.reductions
+        productions = []
+        for production in parser._grammar.Productions:
+            production = copy.copy(production)
+            if production.func is not None:
+                production.func = _counted_reduction(production.func, str(production), reductions)
+            productions.append(production)
+        parser._grammar = copy.copy(parser._grammar)
+        parser._grammar.Productions = productions
+
+        token_coord = getattr(parser, "_token_coord", None)
+        if token_coord is not None:
+            def counted_coord(p):
+                self.coords += 1
+                return token_coord(p)
+
+            parser._token_coord = counted_coord
+
+    def instrument_visitor(self, visitor):
+        """Count the visits of each node class by visitor."""
+        visitor._dispatch = _CountingDispatch(type(visitor)._dispatch, self.visits)
+
+    @contextlib.contextmanager
+    def counting_lookups(self):
+        """Count the calls of SymbolTable.lookup in the block."""
+        from uc_sema import SymbolTable
+
+        lookup = SymbolTable.lookup
+
+        def counted_lookup(symtab, name):
+            self.lookups += 1
+            return lookup(symtab, name)
+
+        SymbolTable.lookup = counted_lookup
+        try:
+            yield
+        finally:
+            SymbolTable.lookup = lookup
+
+    def report(self):
+        """What was measured, as a dictionary that can be written as JSON."""
+        report = {
+            "files": self.files,
+            "stages": {name: {"wall": wall, "cpu": cpu} for name, (wall, cpu, _) in self.stages.items()},
+            "counters": {
+                "tokens": self.tokens,
+                "reductions": dict(self.reductions.most_common()),
+                "coords": self.coords,
+                "visits": dict(self.visits.most_common()),
+                "lookups": self.lookups,
+            },
+        }
+        if self.cache is not None:
+            report["cache"] = {"hits": self.cache[0], "misses": self.cache[1]}
+        if self.throughput is not None:
+            report["throughput"] = dict(self.throughput)
+        if self.profile:
+            functions = sorted(self._functions().items(), key=lambda item: item[1][2], reverse=True)
+            report["profile"] = [
+                {"function": "%s:%d(%s)" % key, "calls": calls, "tottime": tottime, "cumtime": cumtime}
+                for key, (calls, tottime, cumtime) in functions[:TOP]]
+        if self.memory:
+            import tracemalloc
+
+            allocations = collections.Counter(self.allocations)
+            for stat in tracemalloc.take_snapshot().statistics("lineno")[:TOP]:
+                frame = stat.traceback[0]
+                location = "%s:%d" % (frame.filename, frame.lineno)
+                allocations[location] = max(allocations[location], stat.size)
+            for name, (_, _, peak) in self.stages.items():
+                if peak is not None:
+                    report["stages"][name]["peak_memory"] = peak
+            report["allocations"] = dict(allocations.most_common(TOP))
+        return report
+
+    def merge(self, report):
+        """Add a report of another Stats, such as one of a worker process."""
+        self.files += report["files"]
+        for name, stage in report["stages"].items():
+            entry = self.stages.get(name)
+            if entry is None:
+                entry = self.stages[name] = [0.0, 0.0, None]
+            entry[0] += stage["wall"]
+            entry[1] += stage["cpu"]
+            if "peak_memory" in stage:
+                entry[2] = max(entry[2] or 0, stage["peak_memory"])
+        counters = report["counters"]
+        self.tokens += counters["tokens"]
+        self.coords += counters["coords"]
+        self.lookups += counters["lookups"]
+        self.reductions.update(counters["reductions"])
+        self.visits.update(counters["visits"])
+        for function in report.get("profile", ()):
+            entry = self.functions.setdefault(tuple(_split_function(function["function"])), [0, 0.0, 0.0])
+            entry[0] += function["calls"]
+            entry[1] += function["tottime"]
+            entry[2] += function["cumtime"]
+        # the allocations are the memory held by each line at the end of
+        # a run, a process runs many files
+        for location, size in report.get("allocations", {}).items():
+            self.allocations[location] = max(self.allocations[location], size)
+
+    def write(self, f):
+        """Write the report as JSON to the text file object f."""
+        json.dump(self.report(), f, indent=2)
+        f.write("\n")
+
+
+def _counted_reduction(func, rule, reductions):
+    def counted(parser, p):
+        reductions[rule] += 1
+        return func(parser, p)
+    return counted
+
+
+def _split_function(text):
+    # the (file, line, function) key of a function of a report
+    location, function = text[:-1].rsplit("(", 1)
+    filename, line = location.rsplit(":", 1)
+    return filename, int(line), function
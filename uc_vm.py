@@ -0,0 +1,1073 @@
+"""Register bytecode of checked uC programs, its file format and its
+interpreter.
+
+    diagnostics = Visitor(collect=True).check(program)   # none
+    module = compile_program(program)
+    data = dumps(module)            # or dump(module, f)
+    status = loads(data).run()      # or load(f)
+
+Each function is lowered to flat code: its opcodes followed by their
+operands, ints packed in an array('i'). Most operands are registers, the
+slots of the frame of the running call: the parameters (registers 0, 1,
+...), then the local variables and the temporaries of the function, which
+are reused once the statement or the block using them ends. The constants
+of a function are kept at the end of its frames and addressed from the
+end, as the registers -1, -2...: a frame is a copy of the template of its
+function, which holds them, so an instruction reads a constant like any
+other register. The layout of the frames is the one of Function.
+
+The constant pool of a module has the values of the constants, the names
+of the functions and the initial arrays, which NEWARR copies. The globals
+are the slots of a list, read by GLOAD and written by GSTORE. Function 0
+sets their initial values and runs before main. A call pushes the state
+of its caller on a stack of the interpreter, so nested uC calls do not
+nest Python calls.
+
+An array of several dimensions is one flat array, its elements in row
+order. CHECK checks each subscript against its own dimension before the
+element or the row is indexed, as the flat index alone could still be
+in range.
+
+dumps and loads convert a module to and from bytes, in the layout below,
+which ucc --cache keeps so that an unchanged program runs without being
+lexed, parsed and checked again. See uc_runtime.py for the values, print
+and read.
+"""
+import struct
+import sys
+from array import array
+
+import uc_runtime
+from uc_ast_correto import (ArrayRef, BinaryOp, Constant, Coord, Decl, DeclList, ExprList, FuncDecl, GlobalDecl, ID,
+                            InitList, UnaryOp)
+from uc_runtime import AssertionFailed, FORMATS, Input, Output, UCRuntimeError
+
+# The opcodes. Their operands are written d for a register written, a, b
+# and i for registers read, t for a jump target (the position of an
+# instruction in the code of the function), g for a global, k for an
+# index of the constant pool, f for a function, n for a count and x for
+# an index of the tables of print and read.
+(ADD, SUB, MUL, DIV, MOD,             # d a b: on ints, in the range of int
+ CONCAT,                              # d a b: on strings
+ LT, LE, GT, GE, EQ, NE, IS, ISNOT,   # d a b
+ NEG, NOT, MOVE,                      # d a
+ JLT, JLE, JGT, JGE, JEQ, JNE,        # a b t: jump if a <op> b
+ JT, JF,                              # a t: jump if a is true, false
+ JUMP,                                # t
+ GLOAD, GSTORE,                       # d g, g a
+ ALOAD, ASTORE,                       # d a i, a i b: a[i]
+ GALOAD, GASTORE,                     # d g i, g i b: the same for a global a
+ SLICE,                               # d a i b: the b elements of a from i
+ CHECK,                               # a b: fail unless 0 <= a < b
+ NEWARR,                              # d k: a copy of the array k
+ CALL,                                # d f n a1 ... an
+ RET,                                 # a
+ PRINT, PRINTNL,                      # x a, -
+ READ,                                # x d
+ FAIL,                                # line column: a failed assert
+ UNDEFINED,                           # a: call of the function named a
+ ) = range(42)
+
+# name and operands of each opcode, for disassemble
+OPCODES = {
+    ADD: ("ADD", "dab"), SUB: ("SUB", "dab"), MUL: ("MUL", "dab"), DIV: ("DIV", "dab"),
+    MOD: ("MOD", "dab"), CONCAT: ("CONCAT", "dab"), LT: ("LT", "dab"), LE: ("LE", "dab"), GT: ("GT", "dab"),
+    GE: ("GE", "dab"), EQ: ("EQ", "dab"), NE: ("NE", "dab"), IS: ("IS", "dab"),
+    ISNOT: ("ISNOT", "dab"), NEG: ("NEG", "da"), NOT: ("NOT", "da"), MOVE: ("MOVE", "da"),
+    JLT: ("JLT", "abt"), JLE: ("JLE", "abt"), JGT: ("JGT", "abt"), JGE: ("JGE", "abt"),
+    JEQ: ("JEQ", "abt"), JNE: ("JNE", "abt"), JT: ("JT", "at"), JF: ("JF", "at"),
+    JUMP: ("JUMP", "t"), GLOAD: ("GLOAD", "dg"), GSTORE: ("GSTORE", "ga"),
+    ALOAD: ("ALOAD", "dai"), ASTORE: ("ASTORE", "aib"), GALOAD: ("GALOAD", "dgi"),
+    GASTORE: ("GASTORE", "gib"), SLICE: ("SLICE", "daib"), CHECK: ("CHECK", "ab"),
+    NEWARR: ("NEWARR", "dk"), CALL: ("CALL", "dfn"), RET: ("RET", "a"),
+    PRINT: ("PRINT", "xa"), PRINTNL: ("PRINTNL", ""), READ: ("READ", "xd"),
+    FAIL: ("FAIL", "nn"), UNDEFINED: ("UNDEFINED", "a"),
+}
+
+# the typenames of the operand x of PRINT and READ
+PRINT_TYPES = ("int", "char", "string", "bool")
+READ_TYPES = ("int", "char", "bool")
+
+_ARITHMETIC = {"+": ADD, "-": SUB, "*": MUL, "/": DIV, "%": MOD}
+_COMPARISONS = {"<": LT, "<=": LE, ">": GT, ">=": GE, "==": EQ, "!=": NE}
+_JUMPS = {"<": JLT, "<=": JLE, ">": JGT, ">=": JGE, "==": JEQ, "!=": JNE}
+_NEGATED = {"<": ">=", "<=": ">", ">": "<=", ">=": "<", "==": "!=", "!=": "=="}
+
+# The calls a program can nest, the interpreter does not nest Python
+# calls for them
+MAX_DEPTH = 100000
+
+
+class Function:
+    """A function of a module: its name, the number of its parameters, of
+    the registers of its frames before the constants, the indices in the
+    pool of the constants (of the registers -1, -2...) and its code."""
+
+    __slots__ = ("name", "nparams", "nregs", "constants", "code")
+
+    def __init__(self, name, nparams, nregs, constants, code):
+        self.name = name
+        self.nparams = nparams
+        self.nregs = nregs
+        self.constants = constants
+        self.code = code
+
+    def template(self, pool):
+        """The initial frame of a call."""
+        return [0] * self.nregs + [pool[k] for k in reversed(self.constants)]
+
+
+class Module:
+    """A compiled program, see compile_program. It can be run many times."""
+
+    def __init__(self, constants, functions, nglobals, entry):
+        self.constants = constants
+        self.functions = functions
+        self.nglobals = nglobals
+        # the index of main, or -1
+        self.entry = entry
+        self.globals = []
+        self.output = Output()
+        self.input = Input(self.output)
+        self._codes = [decode(function.code) for function in functions]
+        self._templates = [function.template(constants) for function in functions]
+
+    def main(self):
+        """Initialize the globals and call main, returning its value."""
+        if self.entry < 0:
+            raise UCRuntimeError("the program has no main function")
+        self.globals = [0] * self.nglobals
+        execute(self, 0)
+        return execute(self, self.entry)
+
+    def run(self, stdin=None, stdout=None):
+        """Run the program reading stdin and writing stdout (by default
+        sys.stdin and sys.stdout). Returns its exit status."""
+        return uc_runtime.run(self.main, self.output, self.input, stdin, stdout)
+
+
+def decode(code):
+    """The instructions of the code of a function, as the interpreter runs
+    them: tuples of the opcode and three operands, with the jump targets
+    converted to the index of their instruction. The operands of CALL
+    are its destination, function and registers of the arguments, the
+    ones of SLICE its destination, array, and index and size."""
+    starts = {}
+    instructions = []
+    pc = 0
+    while pc < len(code):
+        op = code[pc]
+        size = 1 + len(OPCODES[op][1])
+        if op == CALL:
+            size += code[pc + 3]
+        starts[pc] = len(instructions)
+        instructions.append(code[pc:pc + size].tolist())
+        pc += size
+    starts[pc] = len(instructions)
+    for instruction in instructions:
+        op = instruction[0]
+        operands = OPCODES[op][1]
+        if operands.endswith("t"):
+            instruction[len(operands)] = starts[instruction[len(operands)]]
+        if op == CALL:
+            instruction[3:] = [tuple(instruction[4:])]
+        elif op == SLICE:
+            instruction[3:] = [tuple(instruction[3:])]
+        instruction.extend([0] * (4 - len(instruction)))
+    return [tuple(instruction) for instruction in instructions]
+
+
+def execute(module, index):
+    """Run the function index of module, without arguments, returning the
+    value it returns."""
+    g = module.globals
+    pool = module.constants
+    codes = module._codes
+    templates = module._templates
+    output = module.output
+    chunks = output.chunks
+    append = chunks.append
+    limit = output.LIMIT
+    formats = [FORMATS[typename] for typename in PRINT_TYPES]
+    readers = [uc_runtime.reader(module.input, typename) for typename in READ_TYPES]
+    lowest = uc_runtime.INT_MIN
+    highest = uc_runtime.INT_MAX
+    # the instructions, position and frame of the callers, and their
+    # register receiving the value returned
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    code = codes[index]
+    r = templates[index][:]
+    pc = 0
+    # the opcodes run most are tested first
+    while True:
+        op, x, y, z = code[pc]
+        pc += 1
+        if op == ADD:
+            v = r[y] + r[z]
+            if not lowest <= v <= highest:
+                raise OverflowError
+            r[x] = v
+        elif op == ALOAD:
+            r[x] = r[y][r[z]]
+        elif op == CHECK:
+            if not 0 <= r[x] < r[y]:
+                raise IndexError
+        elif op == JLT:
+            if r[x] < r[y]:
+                pc = z
+        elif op == JLE:
+            if r[x] <= r[y]:
+                pc = z
+        elif op == GALOAD:
+            r[x] = g[y][r[z]]
+        elif op == ASTORE:
+            r[x][r[y]] = r[z]
+        elif op == GASTORE:
+            g[x][r[y]] = r[z]
+        elif op == MUL:
+            v = r[y] * r[z]
+            if not lowest <= v <= highest:
+                raise OverflowError
+            r[x] = v
+        elif op == SUB:
+            v = r[y] - r[z]
+            if not lowest <= v <= highest:
+                raise OverflowError
+            r[x] = v
+        elif op == JGT:
+            if r[x] > r[y]:
+                pc = z
+        elif op == JGE:
+            if r[x] >= r[y]:
+                pc = z
+        elif op == JEQ:
+            if r[x] == r[y]:
+                pc = z
+        elif op == JNE:
+            if r[x] != r[y]:
+                pc = z
+        elif op == JUMP:
+            pc = x
+        elif op == MOVE:
+            r[x] = r[y]
+        elif op == GLOAD:
+            r[x] = g[y]
+        elif op == CALL:
+            frame = templates[y][:]
+            i = 0
+            for register in z:
+                frame[i] = r[register]
+                i += 1
+            push((code, pc, r, x))
+            if len(stack) > MAX_DEPTH:
+                raise RecursionError
+            code = codes[y]
+            r = frame
+            pc = 0
+        elif op == RET:
+            value = r[x]
+            if not stack:
+                return value
+            code, pc, r, x = pop()
+            r[x] = value
+        elif op == GSTORE:
+            g[x] = r[y]
+        elif op == DIV:
+            a = r[y]
+            b = r[z]
+            q = abs(a) // abs(b)
+            if (a < 0) != (b < 0):
+                q = -q
+            elif q > highest:
+                raise OverflowError
+            r[x] = q
+        elif op == MOD:
+            a = r[y]
+            m = abs(a) % abs(r[z])
+            r[x] = -m if a < 0 else m
+        elif op == JT:
+            if r[x]:
+                pc = y
+        elif op == JF:
+            if not r[x]:
+                pc = y
+        elif op == PRINT:
+            append(formats[x](r[y]))
+            if len(chunks) > limit:
+                output.flush()
+        elif op == PRINTNL:
+            append("\n")
+            if len(chunks) > limit:
+                output.flush()
+        elif op == LT:
+            r[x] = r[y] < r[z]
+        elif op == LE:
+            r[x] = r[y] <= r[z]
+        elif op == GT:
+            r[x] = r[y] > r[z]
+        elif op == GE:
+            r[x] = r[y] >= r[z]
+        elif op == EQ:
+            r[x] = r[y] == r[z]
+        elif op == NE:
+            r[x] = r[y] != r[z]
+        elif op == NEG:
+            v = -r[y]
+            if v > highest:
+                raise OverflowError
+            r[x] = v
+        elif op == NOT:
+            r[x] = not r[y]
+        elif op == SLICE:
+            a = r[y]
+            o = r[z[0]]
+            n = r[z[1]]
+            # a slice past the end of a would be cut short
+            if o + n > len(a):
+                raise IndexError
+            r[x] = memoryview(a)[o:o + n]
+        elif op == NEWARR:
+            r[x] = pool[y][:]
+        elif op == READ:
+            r[y] = readers[x]()
+        elif op == CONCAT:
+            r[x] = r[y] + r[z]
+        elif op == IS:
+            r[x] = r[y] is r[z]
+        elif op == ISNOT:
+            r[x] = r[y] is not r[z]
+        elif op == FAIL:
+            raise AssertionFailed(Coord(x, y))
+        elif op == UNDEFINED:
+            raise UCRuntimeError("function '%s' is declared but not defined" % r[x])
+        else:
+            raise ValueError("invalid opcode %d" % op)
+
+
+def compile_program(program):
+    """The Module of the Program program, checked by the semantic analysis
+    without errors."""
+    generator = _Generator()
+    generator.program(program)
+    return generator.module()
+
+
+class _Code:
+    """The code of a function being generated: its registers in use (top),
+    the most it used, its constants and the break jumps of its loops."""
+
+    def __init__(self, nparams):
+        self.code = []
+        self.nparams = self.top = self.nregs = nparams
+        self.constants = []
+        self.registers = {}
+        self.loops = []
+
+
+class _Generator:
+    """Lowers a program to a Module, see the module documentation. The
+    scopes map the names visible to their location: ("local", register),
+    ("global", slot) or ("function", index)."""
+
+    def __init__(self):
+        self.pool = []
+        self.pooled = {}
+        self.functions = [None]
+        self.indices = {}
+        self.nglobals = 0
+        self.scopes = [{}]
+        # the code of function 0, the initialization of the globals
+        self.init = self.f = _Code(0)
+
+    def module(self):
+        self.f = self.init
+        self.emit(RET, self.const(0))
+        self.functions[0] = self.function_of("<globals>", self.init)
+        return Module(self.pool, self.functions, self.nglobals, self.indices.get("main", -1))
+
+    def function_of(self, name, f):
+        return Function(name, f.nparams, f.nregs, f.constants, array("i", f.code))
+
+    def lookup(self, name):
+        for scope in reversed(self.scopes):
+            location = scope.get(name)
+            if location is not None:
+                return location
+        raise UCRuntimeError("'%s' is not defined" % name)
+
+    # the registers and the code
+
+    def constant(self, value):
+        """The index of value in the constant pool."""
+        if isinstance(value, (array, bytearray)):
+            self.pool.append(value)
+            return len(self.pool) - 1
+        key = (type(value), value)
+        index = self.pooled.get(key)
+        if index is None:
+            index = self.pooled[key] = len(self.pool)
+            self.pool.append(value)
+        return index
+
+    def const(self, value):
+        """The register holding the constant value."""
+        f = self.f
+        key = (type(value), value)
+        register = f.registers.get(key)
+        if register is None:
+            f.constants.append(self.constant(value))
+            register = f.registers[key] = -len(f.constants)
+        return register
+
+    def temp(self):
+        f = self.f
+        f.top += 1
+        f.nregs = max(f.nregs, f.top)
+        return f.top - 1
+
+    def emit(self, *words):
+        self.f.code.extend(words)
+
+    def jump(self, op, *operands):
+        """Emit the jump op, returning the position of its target."""
+        self.f.code.extend((op,) + operands + (-1,))
+        return len(self.f.code) - 1
+
+    def patch(self, positions, target=None):
+        """Set the targets of the jumps at positions to target, by default
+        the next instruction."""
+        code = self.f.code
+        if target is None:
+            target = len(code)
+        for position in positions:
+            code[position] = target
+
+    def move(self, register, dst):
+        # the register of a value computed in register, moved to dst if any
+        if dst is None or dst == register:
+            return register
+        self.emit(MOVE, dst, register)
+        return dst
+
+    # declarations
+
+    def program(self, node):
+        for gdecl in node.gdecls:
+            if isinstance(gdecl, GlobalDecl):
+                for decl in gdecl.decls:
+                    self.global_decl(decl)
+            else:
+                self.function(gdecl)
+
+    def declare_function(self, name, decl):
+        index = self.indices.get(name)
+        if index is None:
+            args = decl.type.args
+            nparams = len(args.params) if args is not None else 0
+            index = self.indices[name] = len(self.functions)
+            self.functions.append(None)
+            # the code of a function that is not defined, see function
+            self.f, f = _Code(nparams), self.f
+            self.emit(UNDEFINED, self.const(name))
+            self.functions[index] = self.function_of(name, self.f)
+            self.f = f
+        self.scopes[-1][name] = ("function", index)
+        return index
+
+    def global_decl(self, node):
+        if isinstance(node.type, FuncDecl):
+            self.declare_function(node.name.name, node)
+            return
+        slot = self.nglobals
+        self.nglobals += 1
+        self.scopes[0][node.name.name] = ("global", slot)
+        top = self.init.top
+        self.emit(GSTORE, slot, self.initial(node))
+        self.init.top = top
+
+    def initial(self, node, dst=None):
+        """The register of the initial value of the variable declared by
+        the Decl node, or dst."""
+        uc_type = node.attrs['uc_type']
+        init = node.init
+        if hasattr(uc_type, "size"):
+            values = uc_runtime.initial_values(init) if init is not None else ()
+            register = self.temp() if dst is None else dst
+            self.emit(NEWARR, register, self.constant(uc_runtime.new_array(uc_type, values)))
+            return register
+        if init is None:
+            return self.move(self.const(0), dst)
+        if isinstance(init, InitList):
+            init = init.exprs[0]
+        return self.expr(init, dst)
+
+    def function(self, node):
+        name = node.decl.name.name
+        index = self.declare_function(name, node.decl)
+        args = node.decl.type.args
+        params = args.params if args is not None else ()
+        self.f = f = _Code(len(params))
+        # the parameters and the declarations of the body share a scope
+        self.scopes.append({param.name.name: ("local", i) for i, param in enumerate(params)})
+        for statement in node.statements.dcls + node.statements.stmts:
+            self.statement(statement)
+        self.emit(RET, self.const(0))
+        self.scopes.pop()
+        self.functions[index] = self.function_of(name, f)
+        self.f = self.init
+
+    # statements
+
+    def statement(self, node):
+        """Emit the code of the statement node. The temporaries it used are
+        free after it, the variables it declares at the end of their
+        block."""
+        f = self.f
+        top = f.top
+        compile = getattr(self, "stmt_" + node.__class__.__name__, None)
+        if compile is None:
+            self.expr(node)
+        else:
+            compile(node)
+        if not isinstance(node, (Decl, DeclList)):
+            f.top = top
+
+    def stmt_Decl(self, node):
+        if isinstance(node.type, FuncDecl):
+            self.declare_function(node.name.name, node)
+            return
+        # the name is visible in its initializer, as in the semantic analysis
+        register = self.temp()
+        self.scopes[-1][node.name.name] = ("local", register)
+        top = self.f.top
+        self.initial(node, register)
+        self.f.top = top
+
+    def stmt_DeclList(self, node):
+        for decl in node.decls:
+            self.statement(decl)
+
+    def stmt_Compound(self, node):
+        self.scopes.append({})
+        for statement in node.dcls + node.stmts:
+            self.statement(statement)
+        self.scopes.pop()
+
+    def stmt_EmptyStatement(self, node):
+        pass
+
+    def stmt_If(self, node):
+        skip = []
+        self.branch(node.cond, False, skip)
+        self.statement(node.if_statements)
+        if node.else_statements is not None:
+            end = self.jump(JUMP)
+            self.patch(skip)
+            self.statement(node.else_statements)
+            self.patch([end])
+        else:
+            self.patch(skip)
+
+    def loop(self, cond, body, next):
+        """Emit a loop running the statement body and the expression next
+        while the expression cond is true. The condition is tested at the
+        end, after a jump to it before the first iteration."""
+        f = self.f
+        breaks = []
+        f.loops.append(breaks)
+        start = self.jump(JUMP) if cond is not None else None
+        top = len(f.code)
+        self.statement(body)
+        if next is not None:
+            self.statement(next)
+        if cond is None:
+            self.emit(JUMP, top)
+        else:
+            self.patch([start])
+            again = []
+            self.branch(cond, True, again)
+            self.patch(again, top)
+        f.loops.pop()
+        self.patch(breaks)
+
+    def stmt_While(self, node):
+        self.loop(node.cond, node.statements, None)
+
+    def stmt_For(self, node):
+        # the declarations of the initialization belong to the loop
+        self.scopes.append({})
+        if node.init is not None:
+            self.statement(node.init)
+        self.loop(node.cond, node.statements, node.next)
+        self.scopes.pop()
+
+    def stmt_Break(self, node):
+        self.f.loops[-1].append(self.jump(JUMP))
+
+    def stmt_Return(self, node):
+        self.emit(RET, self.expr(node.expr) if node.expr is not None else self.const(0))
+
+    def stmt_Assert(self, node):
+        passed = []
+        self.branch(node.expr, True, passed)
+        coord = node.expr.coord
+        self.emit(FAIL, coord.line, coord.column)
+        self.patch(passed)
+
+    def stmt_Print(self, node):
+        if node.expr is None:
+            self.emit(PRINTNL)
+            return
+        exprs = node.expr.exprs if isinstance(node.expr, ExprList) else [node.expr]
+        # the values are all computed before the first one is written
+        values = []
+        for expr in exprs:
+            typename = expr.attrs['uc_type'].typename
+            if isinstance(expr, Constant):
+                text = FORMATS[typename](uc_runtime.constant_value(expr))
+                values.append((PRINT_TYPES.index("string"), self.const(text)))
+            else:
+                values.append((PRINT_TYPES.index(typename), self.expr(expr)))
+        for kind, register in values:
+            self.emit(PRINT, kind, register)
+
+    def stmt_Read(self, node):
+        exprs = node.expr.exprs if isinstance(node.expr, ExprList) else [node.expr]
+        for expr in exprs:
+            kind = READ_TYPES.index(expr.attrs['uc_type'].typename)
+            if isinstance(expr, ID):
+                location, slot = self.lookup(expr.name)
+                if location == "local":
+                    self.emit(READ, kind, slot)
+                    continue
+                value = self.temp()
+                self.emit(READ, kind, value, GSTORE, slot, value)
+                continue
+            value = self.temp()
+            self.emit(READ, kind, value)
+            self.store_element(expr, value)
+
+    # conditions
+
+    def branch(self, node, when, jumps):
+        """Emit a jump taken when the value of the bool expression node is
+        when, adding the position of its target (and of the ones of the
+        operands of && and ||) to jumps."""
+        if isinstance(node, BinaryOp):
+            op = node.op
+            if op in _JUMPS and not hasattr(node.left.attrs['uc_type'], "size"):
+                left = self.expr(node.left)
+                right = self.expr(node.right)
+                jumps.append(self.jump(_JUMPS[op if when else _NEGATED[op]], left, right))
+                return
+            if op in ("&&", "||"):
+                if (op == "&&") != when:
+                    # either operand decides
+                    self.branch(node.left, when, jumps)
+                    self.branch(node.right, when, jumps)
+                else:
+                    skip = []
+                    self.branch(node.left, not when, skip)
+                    self.branch(node.right, when, jumps)
+                    self.patch(skip)
+                return
+        elif isinstance(node, UnaryOp) and node.op == "!":
+            self.branch(node.expr, not when, jumps)
+            return
+        jumps.append(self.jump(JT if when else JF, self.expr(node)))
+
+    # expressions
+
+    def expr(self, node, dst=None):
+        """Emit the code of the expression node, returning the register of
+        its value: dst if it is given."""
+        return self.move(getattr(self, "expr_" + node.__class__.__name__)(node, dst), dst)
+
+    def result(self, dst):
+        # the register receiving the value of an operation
+        return self.temp() if dst is None else dst
+
+    def expr_Constant(self, node, dst):
+        return self.const(uc_runtime.constant_value(node))
+
+    def expr_ID(self, node, dst):
+        location, slot = self.lookup(node.name)
+        if location == "local":
+            return slot
+        register = self.result(dst)
+        self.emit(GLOAD, register, slot)
+        return register
+
+    def expr_BinaryOp(self, node, dst):
+        op = node.op
+        if op in ("&&", "||"):
+            # the operands are conditions, the value is made by jumps
+            register = self.temp()
+            false = []
+            self.emit(MOVE, register, self.const(False))
+            self.branch(node, False, false)
+            self.emit(MOVE, register, self.const(True))
+            self.patch(false)
+            return register
+        uc_type = node.left.attrs['uc_type']
+        if hasattr(uc_type, "size"):
+            opcode = IS if op == "==" else ISNOT
+        elif uc_type.typename == "string":
+            opcode = CONCAT if op == "+" else _COMPARISONS[op]
+        else:
+            opcode = _COMPARISONS.get(op) or _ARITHMETIC[op]
+        left = self.expr(node.left)
+        right = self.expr(node.right)
+        register = self.result(dst)
+        self.emit(opcode, register, left, right)
+        return register
+
+    def expr_UnaryOp(self, node, dst):
+        if node.op == "+":
+            return self.expr(node.expr, dst)
+        value = self.expr(node.expr)
+        register = self.result(dst)
+        self.emit(NEG if node.op == "-" else NOT, register, value)
+        return register
+
+    def expr_ExprList(self, node, dst):
+        for expr in node.exprs[:-1]:
+            self.expr(expr)
+        return self.expr(node.exprs[-1], dst)
+
+    def expr_Assignment(self, node, dst):
+        lvalue = node.lvalue
+        if isinstance(lvalue, ID):
+            location, slot = self.lookup(lvalue.name)
+            if location == "local":
+                return self.expr(node.rvalue, slot)
+            value = self.expr(node.rvalue)
+            self.emit(GSTORE, slot, value)
+            return value
+        return self.store_element(lvalue, self.expr(node.rvalue))
+
+    def store_element(self, node, value):
+        # store the register value in the element of the ArrayRef node
+        (location, slot), index, _ = self.element(node)
+        self.emit(ASTORE if location == "local" else GASTORE, slot, index, value)
+        return value
+
+    def element(self, node):
+        """The location of the array of the element of the ArrayRef node,
+        the register of its index and the number of elements of its value
+        when it is an array itself, or None."""
+        subscripts = []
+        while isinstance(node, ArrayRef):
+            subscripts.append(node.subscript)
+            node = node.name
+        subscripts.reverse()
+        base = self.lookup(node.name)
+        # the arrays of each dimension, outer to inner
+        uc_type = node.attrs['uc_type']
+        dimensions = []
+        while hasattr(uc_type, "size"):
+            dimensions.append(uc_type)
+            uc_type = uc_type.type
+        index = None
+        for subscript, dimension in zip(subscripts, dimensions):
+            stride = uc_runtime.flat_size(dimension.type)
+            bound = dimension.size
+            if isinstance(subscript, Constant) and 0 <= uc_runtime.constant_value(subscript) \
+                    and (bound is None or uc_runtime.constant_value(subscript) < bound):
+                term = self.const(uc_runtime.constant_value(subscript) * stride)
+            else:
+                term = self.expr(subscript)
+                # the end of the array bounds an outer dimension of
+                # unknown size
+                self.emit(CHECK, term, self.const(sys.maxsize if bound is None else bound))
+                if stride != 1:
+                    product = self.temp()
+                    self.emit(MUL, product, term, self.const(stride))
+                    term = product
+            if index is not None:
+                total = self.temp()
+                self.emit(ADD, total, index, term)
+                term = total
+            index = term
+        size = None
+        if len(subscripts) < len(dimensions):
+            size = uc_runtime.flat_size(dimensions[len(subscripts) - 1].type)
+        return base, index, size
+
+    def expr_ArrayRef(self, node, dst):
+        (location, slot), index, size = self.element(node)
+        register = self.result(dst)
+        if size is None:
+            self.emit(ALOAD if location == "local" else GALOAD, register, slot, index)
+            return register
+        if location == "global":
+            self.emit(GLOAD, register, slot)
+            slot = register
+        self.emit(SLICE, register, slot, index, self.const(size))
+        return register
+
+    def expr_FuncCall(self, node, dst):
+        _, function = self.lookup(node.name.name)
+        if node.args is None:
+            args = []
+        elif isinstance(node.args, ExprList):
+            args = node.args.exprs
+        else:
+            args = [node.args]
+        registers = [self.expr(arg) for arg in args]
+        register = self.result(dst)
+        self.emit(CALL, register, function, len(registers), *registers)
+        return register
+
+
+def disassemble(module):
+    """The code of the functions of module, as text."""
+    pool = module.constants
+    lines = ["globals: %d" % module.nglobals]
+    for index, function in enumerate(module.functions):
+        lines.append("function %d %s: %d params, %d registers, %d constants"
+                     % (index, function.name, function.nparams, function.nregs, len(function.constants)))
+        code = function.code
+        pc = 0
+        while pc < len(code):
+            name, operands = OPCODES[code[pc]]
+            words = []
+            for kind, word in zip(operands, code[pc + 1:pc + 1 + len(operands)]):
+                if kind in "dabi" and word < 0:
+                    words.append(repr(pool[function.constants[-word - 1]]))
+                elif kind in "dabi":
+                    words.append("r%d" % word)
+                elif kind == "g":
+                    words.append("g%d" % word)
+                elif kind == "f":
+                    words.append(module.functions[word].name)
+                elif kind == "x":
+                    words.append((READ_TYPES if name == "READ" else PRINT_TYPES)[word])
+                else:
+                    words.append(str(word))
+            size = 1 + len(operands)
+            if code[pc] == CALL:
+                words.extend("r%d" % word if word >= 0 else repr(pool[function.constants[-word - 1]])
+                             for word in code[pc + 4:pc + 4 + code[pc + 3]])
+                size += code[pc + 3]
+            lines.append("%6d  %-9s %s" % (pc, name, " ".join(words)))
+            pc += size
+    return "\n".join(lines)
+
+
+# The layout of a module in bytes, little-endian:
+#
+#   HEADER      magic, version, the number of constants, of functions and
+#               of globals, the index of main or -1
+#   constants   each one a tag and its value:
+#                   INT     an int64
+#                   BIGINT  U32 length and the digits of the int
+#                   BOOL    a byte
+#                   STR     U32 length and the UTF-8 of the string
+#                   INTS    U32 count of the elements of an array('i'),
+#                           U32 count of the ones before its trailing
+#                           zeros and their int32 values
+#                   CHARS   the same for a bytearray, with bytes
+#   functions   each one U32 length and the UTF-8 of its name, FUNCTION,
+#               the U32 indices of its constants and its int32 code
+
+MAGIC = b"UCVM\0\0"
+
+# Bump when the layout or the meaning of the code changes
+FORMAT_VERSION = 3
+
+HEADER = struct.Struct("<6sHIIIi")
+FUNCTION = struct.Struct("<IIII")
+U32 = struct.Struct("<I")
+PAIR = struct.Struct("<II")
+INT64 = struct.Struct("<q")
+
+# loads rejects modules with more registers in a frame or globals, or
+# larger arrays, than these, rather than allocate them
+MAX_SLOTS = 1 << 24
+MAX_ELEMENTS = 1 << 28
+
+# tags of the constants
+INT, BIGINT, BOOL, STR, INTS, CHARS = range(6)
+
+
+def _int32_bytes(values):
+    # the array('i') values as little-endian bytes
+    if sys.byteorder == "big":
+        values = array("i", values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _int32_array(data):
+    values = array("i")
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _stored(values):
+    # the number of values of the array before its trailing zeros
+    itemsize = getattr(values, "itemsize", 1)
+    return (len(bytes(values).rstrip(b"\0")) + itemsize - 1) // itemsize
+
+
+def _text(value):
+    data = value.encode("utf-8", "surrogatepass")
+    return U32.pack(len(data)) + data
+
+
+def dumps(module):
+    """The bytes of module."""
+    parts = [HEADER.pack(MAGIC, FORMAT_VERSION, len(module.constants), len(module.functions),
+                         module.nglobals, module.entry)]
+    for value in module.constants:
+        if isinstance(value, bool):
+            parts.append(bytes((BOOL, value)))
+        elif isinstance(value, int):
+            if -2 ** 63 <= value < 2 ** 63:
+                parts.append(bytes((INT,)) + INT64.pack(value))
+            else:
+                parts.append(bytes((BIGINT,)) + _text(str(value)))
+        elif isinstance(value, str):
+            parts.append(bytes((STR,)) + _text(value))
+        elif isinstance(value, array):
+            stored = _stored(value)
+            parts.append(bytes((INTS,)) + PAIR.pack(len(value), stored) + _int32_bytes(value[:stored]))
+        else:
+            stored = _stored(value)
+            parts.append(bytes((CHARS,)) + PAIR.pack(len(value), stored) + bytes(value[:stored]))
+    for function in module.functions:
+        parts.append(_text(function.name))
+        parts.append(FUNCTION.pack(function.nparams, function.nregs, len(function.constants),
+                                   len(function.code)))
+        parts.append(struct.pack("<%dI" % len(function.constants), *function.constants))
+        parts.append(_int32_bytes(function.code))
+    return b"".join(parts)
+
+
+def loads(data):
+    """The Module of the bytes data made by dumps. Raises ValueError when
+    data is not one."""
+    data = memoryview(data)
+    try:
+        magic, version, nconstants, nfunctions, nglobals, entry = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("not a uC bytecode file")
+        if version != FORMAT_VERSION:
+            raise ValueError("uC bytecode version %d, not %d" % (version, FORMAT_VERSION))
+        if nglobals > MAX_SLOTS:
+            raise ValueError("too many globals in uC bytecode")
+        position = HEADER.size
+
+        def text():
+            nonlocal position
+            length, = U32.unpack_from(data, position)
+            position += U32.size + length
+            return str(data[position - length:position], "utf-8", "surrogatepass")
+
+        constants = []
+        for _ in range(nconstants):
+            tag = data[position]
+            position += 1
+            if tag == INT:
+                constants.append(INT64.unpack_from(data, position)[0])
+                position += INT64.size
+            elif tag == BIGINT:
+                constants.append(int(text()))
+            elif tag == BOOL:
+                constants.append(bool(data[position]))
+                position += 1
+            elif tag == STR:
+                constants.append(text())
+            elif tag in (INTS, CHARS):
+                count, stored = PAIR.unpack_from(data, position)
+                position += PAIR.size
+                size = 4 * stored if tag == INTS else stored
+                chunk = data[position:position + size]
+                if len(chunk) != size or stored > count or count > MAX_ELEMENTS:
+                    raise ValueError("truncated uC bytecode")
+                if tag == INTS:
+                    value = _int32_array(chunk)
+                    value.frombytes(bytes(4 * (count - stored)))
+                else:
+                    value = bytearray(chunk)
+                    value.extend(bytes(count - stored))
+                constants.append(value)
+                position += size
+            else:
+                raise ValueError("invalid constant tag %d" % tag)
+        functions = []
+        for _ in range(nfunctions):
+            name = text()
+            nparams, nregs, nfunction_constants, ncode = FUNCTION.unpack_from(data, position)
+            position += FUNCTION.size
+            if nparams > nregs or nregs + nfunction_constants > MAX_SLOTS:
+                raise ValueError("invalid frame of function '%s'" % name)
+            function_constants = struct.unpack_from("<%dI" % nfunction_constants, data, position)
+            position += U32.size * nfunction_constants
+            chunk = data[position:position + 4 * ncode]
+            if len(chunk) != 4 * ncode:
+                raise ValueError("truncated uC bytecode")
+            position += 4 * ncode
+            functions.append(Function(name, nparams, nregs, function_constants, _int32_array(chunk)))
+        if not functions or not -1 <= entry < len(functions):
+            raise ValueError("invalid entry function %d" % entry)
+        module = Module(constants, functions, nglobals, entry)
+    except (struct.error, IndexError, KeyError, UnicodeDecodeError) as e:
+        raise ValueError("invalid uC bytecode: %s" % e) from None
+    _check_operands(module)
+    return module
+
+
+def _check_operands(module):
+    """Raise ValueError unless every instruction of module reads and writes
+    registers of its frame, jumps to an instruction and refers to globals,
+    constants, functions and tables that exist, and the code of every
+    function ends in a jump, a return or an error, so the interpreter can
+    not run off the code."""
+    functions = module.functions
+    tables = {PRINT: len(PRINT_TYPES), READ: len(READ_TYPES)}
+    for function, code in zip(functions, module._codes):
+        registers = range(-len(function.constants), function.nregs)
+        if not code or code[-1][0] not in (JUMP, RET, FAIL, UNDEFINED):
+            raise ValueError("invalid code of function '%s'" % function.name)
+        for op, x, y, z in code:
+            operands = OPCODES[op][1]
+            if op == CALL:
+                values = (x, y) + z
+                operands = "df" + "a" * len(z)
+                if not (0 <= y < len(functions) and len(z) == functions[y].nparams):
+                    raise ValueError("invalid call in function '%s'" % function.name)
+            elif op == SLICE:
+                values = (x, y) + z
+            else:
+                values = (x, y, z)
+            for kind, value in zip(operands, values):
+                if kind in "dabi":
+                    valid = value in registers
+                elif kind == "t":
+                    valid = 0 <= value < len(code)
+                elif kind == "g":
+                    valid = 0 <= value < module.nglobals
+                elif kind == "k":
+                    valid = 0 <= value < len(module.constants)
+                elif kind == "x":
+                    valid = 0 <= value < tables[op]
+                else:
+                    valid = True
+                if not valid:
+                    raise ValueError("invalid operand of %s in function '%s'" % (OPCODES[op][0], function.name))
+
+
+def dump(module, f):
+    """Write module to the binary file object f."""
+    f.write(dumps(module))
+
+
+def load(f):
+    """The Module in the binary file object f."""
+    return loads(f.read())
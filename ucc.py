@@ -0,0 +1,624 @@
+"""Driver of the uC compiler.
+
+    python ucc.py [--lex | --parse | --ast | --sema | --ir | --run] [--engine E] [-j N] [--cache] [--stats]
+                  [file | dir ...]
+
+Each stage only loads the code it needs: a --lex run does not import the
+parsers, the AST classes or the semantic analysis. The lexer and parsers
+are kept in the files of their projects (P1, P2, P3), which are run in a
+shared namespace the same way the notebook cells are.
+
+Given several files, or directories (searched for *.uc files), ucc
+compiles them over a pool of processes and prints the output of each file
+in the order of the command line.
+
+With --ir a program without semantic errors is printed as the three-address
+code of uc_ir.py, its functions in basic blocks.
+
+With --run a program without semantic errors is run instead of printed,
+reading stdin, and its exit status is the one of ucc. It is run by the
+--engine closures of uc_exec.py (the default), lowered to the register
+bytecode of uc_vm.py (vm), written as Python code by uc_pygen.py
+(python) or written as C by uc_cgen.py and built by the C compiler (c).
+
+With --cache the results of each stage are kept on disk (see uc_cache.py)
+and an unchanged source is not compiled again. The programs compiled by
+the vm, python and c engines are cached too, so running an unchanged
+program only loads them.
+
+With --stats a JSON report of the time of each stage and of counters of
+the lexer, the parser and the semantic analysis is written to stderr, or
+to --stats-file (see uc_stats.py), optionally with a profile (--profile)
+and the memory used (--trace-memory). Without it the stages are not
+instrumented.
+"""
+import contextlib
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+LEXER_FILE = "P1_correto análise léxica.py"
+PARSER_FILE = "P2_atualizado.py"          # builds a tuple parse tree
+AST_PARSER_FILE = "P3 correto - UCParse"  # builds the uc_ast_correto AST
+
+STAGES = ("lex", "parse", "ast", "sema", "ir", "run")
+
+# the modules of the engines running the programs of --run
+ENGINES = {"closures": "uc_exec", "vm": "uc_vm", "python": "uc_pygen", "c": "uc_cgen"}
+
+_loaded = {}
+
+
+def load_fragment(filename, **init_globals):
+    """Run one of the source files of the repository and return its globals."""
+    import runpy
+
+    if HERE not in sys.path:
+        sys.path.insert(0, HERE)
+    return runpy.run_path(os.path.join(HERE, filename), init_globals)
+
+
+def load_lexer():
+    """Namespace of the lexer file (UCLexer, UCDispatchLexer, ...)."""
+    if LEXER_FILE not in _loaded:
+        _loaded[LEXER_FILE] = load_fragment(LEXER_FILE)
+    return _loaded[LEXER_FILE]
+
+
+def load_parser(filename=AST_PARSER_FILE):
+    """Namespace of a parser file, run on top of the lexer (and of the AST
+    classes for the AST parser)."""
+    if filename not in _loaded:
+        from sly import Parser
+
+        ns = dict(load_lexer(), Parser=Parser, sys=sys)
+        if filename == AST_PARSER_FILE:
+            import uc_ast_correto
+
+            ns.update((name, value) for name, value in vars(uc_ast_correto).items()
+                      if not name.startswith("__"))
+        _loaded[filename] = load_fragment(filename, **ns)
+    return _loaded[filename]
+
+
+def load_sema():
+    """The semantic analysis module."""
+    if HERE not in sys.path:
+        sys.path.insert(0, HERE)
+    import uc_sema
+
+    return uc_sema
+
+
+def print_error(msg, x, y):
+    # use stdout to match with the output in the .out test files
+    print("Lexical error: %s at %d:%d" % (msg, x, y), file=sys.stdout)
+
+
+def build_tree(root):
+    return '\n'.join(_build_tree(root))
+
+
+def _build_tree(node):
+    if isinstance(node, list):
+        if not node: return
+        node = tuple(node)
+
+    if not isinstance(node, tuple):
+        yield " "+str(node)
+        return
+
+    values = [_build_tree(n) for n in node]
+    if len(values) == 1:
+        yield from build_lines('──', '  ', values[0])
+        return
+
+    start, *mid, end = values
+    yield from build_lines('┬─', '│ ', start)
+    for value in mid:
+        yield from build_lines('├─', '│ ', value)
+    yield from build_lines('└─', '  ', end)
+
+
+def build_lines(first, other, values):
+    try:
+        yield first + next(values)
+        for value in values:
+            yield other + value
+    except StopIteration:
+        return
+
+
+def _counting_lexer(lexer_class):
+    """Subclass of lexer_class that counts the tokens it produces."""
+
+    class CountingLexer(lexer_class):
+        tokens = lexer_class.tokens
+        ntokens = 0
+
+        def tokenize(self, text, lineno=1, index=0):
+            for tok in super().tokenize(text, lineno, index):
+                self.ntokens += 1
+                yield tok
+
+    return CountingLexer
+
+
+_compilers = {}
+
+# whether the lexers count their tokens without stats, as the workers of
+# compile_files do for its report
+_count_tokens = False
+
+
+def get_compiler(stage, stats=None, count=False):
+    """The lexer or parser, and the Visitor, of stage. They are created once
+    per process and reused for every file. Given a uc_stats.Stats, they are
+    instrumented to report to it. The lexer counts the tokens in ntokens
+    with count, stats or _count_tokens."""
+    count = count or stats is not None or _count_tokens
+    if (stage, stats, count) not in _compilers:
+        visitor = None
+        if stage == "lex":
+            lexer_class = load_lexer()["UCLexer"]
+            if count:
+                lexer_class = _counting_lexer(lexer_class)
+            if stats is not None:
+                lexer_class = stats.timed_lexer(lexer_class)
+            _compilers[stage, stats, count] = (lexer_class(print_error), None, None)
+        else:
+            ns = load_parser(PARSER_FILE if stage == "parse" else AST_PARSER_FILE)
+            lexer_class = ns["UCLexer"]
+            if count:
+                lexer_class = _counting_lexer(lexer_class)
+            if stats is not None:
+                lexer_class = stats.timed_lexer(lexer_class)
+            parser = ns["UCParser"](print_error, lexer_class=lexer_class)
+            if stage in ("sema", "ir", "run"):
+                visitor = load_sema().Visitor(collect=True)
+            if stats is not None:
+                stats.instrument_parser(parser)
+                if visitor is not None:
+                    stats.instrument_visitor(visitor)
+            _compilers[stage, stats, count] = (parser.lexer, parser, visitor)
+    return _compilers[stage, stats, count]
+
+
+_no_stage = contextlib.nullcontext()
+
+
+def _stage(stats, name):
+    # the timer of the stage name, or nothing without stats
+    return _no_stage if stats is None else stats.stage(name)
+
+
+def _sema_stage(stats):
+    # the timer of the semantic analysis, counting the lookups
+    if stats is None:
+        return _no_stage
+    stack = contextlib.ExitStack()
+    stack.enter_context(stats.stage("sema"))
+    stack.enter_context(stats.counting_lookups())
+    return stack
+
+
+def load_engine(engine):
+    """The module of engine, compiling programs with compile_program, and
+    saving and loading them with dumps and loads if it can."""
+    import importlib
+
+    if HERE not in sys.path:
+        sys.path.insert(0, HERE)
+    return importlib.import_module(ENGINES[engine])
+
+
+def compile_program(ast, engine="closures"):
+    """The checked Program ast compiled for engine, with a run method."""
+    return load_engine(engine).compile_program(ast)
+
+
+def run_executable(executable, stats=None):
+    """Run a compiled program, exiting with its status if not 0."""
+    with _stage(stats, "run"):
+        status = executable.run()
+    if status:
+        sys.exit(status)
+
+
+def run_program(ast, stats=None, engine="closures"):
+    """Run the checked Program ast with engine, exiting with its status if
+    not 0."""
+    with _stage(stats, "run"):
+        executable = compile_program(ast, engine)
+    run_executable(executable, stats)
+
+
+def print_ir(ast, stats=None):
+    """Print the three-address code of the checked Program ast."""
+    import uc_ir
+
+    with _stage(stats, "ir"):
+        module = uc_ir.generate(ast)
+    with _stage(stats, "output"):
+        print(uc_ir.dump(module))
+
+
+def compile_file(f, stage="sema", cache=None, stats=None, engine="closures"):
+    """Run the stages up to stage over the source in the file object f and
+    print the result of the last one, or run the program with engine.
+    Returns the number of tokens, which are only counted with a cache,
+    stats or _count_tokens (0 otherwise). With a uc_cache.CompilationCache
+    the results are taken from it when the source was compiled before.
+    With a uc_stats.Stats the stages are timed and counted in it."""
+    lexer, parser, visitor = get_compiler(stage, stats, cache is not None)
+    lexer.ntokens = 0
+    if stats is not None:
+        stats.files += 1
+    if cache is not None:
+        return _compile_cached(f.read(), stage, cache, stats, engine)
+    if stage == "lex":
+        # the time of the tokenizer is the lex stage, the rest is output
+        with _stage(stats, "output"):
+            for tok in lexer.tokenize(f):
+                print(tok)
+    elif stage == "parse":
+        with _stage(stats, "parse"):
+            st = parser.parse(f)
+        if st is not None:
+            with _stage(stats, "output"):
+                print(build_tree(st))
+    else:
+        with _stage(stats, "parse"):
+            ast = parser.parse(f)
+        if ast is not None:
+            if stage in ("sema", "ir", "run"):
+                with _sema_stage(stats):
+                    diagnostics = visitor.check(ast)
+                for diagnostic in diagnostics:
+                    print(diagnostic)
+                if diagnostics:
+                    sys.exit(1)
+            if stage == "ir":
+                print_ir(ast, stats)
+                return lexer.ntokens
+            if stage == "run":
+                run_program(ast, stats, engine)
+                return lexer.ntokens
+            with _stage(stats, "output"):
+                ast.show(buf=sys.stdout, showcoord=True)
+    return lexer.ntokens
+
+
+def _captured(func, *args):
+    # func(*args) and what it printed
+    import contextlib
+    import io
+
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        result = func(*args)
+    return result, out.getvalue()
+
+
+def _lex_events(lexer, text):
+    # the tokens of text as tuples, and the errors printed between them
+    import contextlib
+    import io
+
+    events = []
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        for tok in lexer.tokenize(text):
+            if out.tell():
+                events.append(out.getvalue())
+                out.seek(0)
+                out.truncate()
+            events.append((tok.type, tok.value, tok.lineno, tok.index, tok.end))
+    if out.tell():
+        events.append(out.getvalue())
+    return events
+
+
+def _cached_program(text, key, parser, cache, stats=None):
+    """The number of tokens, the errors printed parsing, the Program of
+    text and its nodes in the order of the cache, from the cache or parsed
+    and stored."""
+    with _stage(stats, "cache"):
+        entry = cache.load(key, "ast")
+        if entry is not None:
+            if not entry["program"]:
+                return entry["ntokens"], entry["messages"], None, None
+            loaded = cache.load_program(key)
+            if loaded is not None:
+                return (entry["ntokens"], entry["messages"]) + loaded
+    with _stage(stats, "parse"):
+        ast, messages = _captured(parser.parse, text)
+    nodes = None
+    if ast is not None:
+        with _stage(stats, "cache"):
+            nodes = cache.store_program(key, ast)
+    if entry is None and (ast is None or nodes is not None):
+        cache.store(key, "ast", {"messages": messages, "program": ast is not None,
+                                 "ntokens": parser.lexer.ntokens})
+    return parser.lexer.ntokens, messages, ast, nodes
+
+
+def _compile_cached(text, stage, cache, stats=None, engine="closures"):
+    """compile_file over the source text, reusing and filling cache."""
+    from sly.lex import Token
+
+    lexer, parser, visitor = get_compiler(stage, stats, True)
+    key = cache.key(text)
+    if stage == "lex":
+        with _stage(stats, "cache"):
+            events = cache.load(key, "lex")
+        if events is None:
+            events = _lex_events(lexer, text)
+            with _stage(stats, "cache"):
+                cache.store(key, "lex", events)
+        ntokens = 0
+        for event in events:
+            if isinstance(event, str):
+                sys.stdout.write(event)
+                continue
+            tok = Token()
+            tok.type, tok.value, tok.lineno, tok.index, tok.end = event
+            print(tok)
+            ntokens += 1
+        lexer.ntokens = ntokens
+        return ntokens
+
+    if stage == "parse":
+        with _stage(stats, "cache"):
+            entry = cache.load(key, "parse")
+        if entry is None:
+            with _stage(stats, "parse"):
+                st, messages = _captured(parser.parse, text)
+            entry = {"messages": messages, "tree": st, "ntokens": lexer.ntokens}
+            with _stage(stats, "cache"):
+                cache.store(key, "parse", entry)
+        lexer.ntokens = entry["ntokens"]
+        sys.stdout.write(entry["messages"])
+        if entry["tree"] is not None:
+            print(build_tree(entry["tree"]))
+        return lexer.ntokens
+
+    saved = stage == "run" and hasattr(load_engine(engine), "dumps")
+    if saved:
+        with _stage(stats, "cache"):
+            loaded = cache.load_executable(key, load_engine(engine))
+        if loaded is not None:
+            executable, messages, lexer.ntokens = loaded
+            sys.stdout.write(messages)
+            run_executable(executable, stats)
+            return lexer.ntokens
+
+    if stage in ("sema", "ir", "run"):
+        from uc_cache import decode_type, encode_type
+
+        with _stage(stats, "cache"):
+            entry = cache.load(key, "sema")
+        if entry is not None and entry["diagnostics"]:
+            # the errors are all the output, the AST is not needed
+            lexer.ntokens = entry["ntokens"]
+            sys.stdout.write(entry["messages"])
+            for diagnostic in entry["diagnostics"]:
+                print(diagnostic)
+            sys.exit(1)
+
+    lexer.ntokens, messages, ast, nodes = _cached_program(text, key, parser, cache, stats)
+    sys.stdout.write(messages)
+    if ast is None:
+        return lexer.ntokens
+    if stage in ("sema", "ir", "run"):
+        if entry is None:
+            with _sema_stage(stats):
+                diagnostics = [str(diagnostic) for diagnostic in visitor.check(ast)]
+            if nodes is not None:
+                with _stage(stats, "cache"):
+                    types = [(index, encode_type(node.attrs['uc_type']))
+                             for index, node in enumerate(nodes) if 'uc_type' in node.attrs]
+                    cache.store(key, "sema", {"messages": messages, "diagnostics": diagnostics,
+                                              "types": types, "ntokens": lexer.ntokens})
+            for diagnostic in diagnostics:
+                print(diagnostic)
+            if diagnostics:
+                sys.exit(1)
+        elif nodes is not None:
+            with _stage(stats, "cache"):
+                for index, uc_type in entry["types"]:
+                    nodes[index].attrs['uc_type'] = decode_type(uc_type)
+    if stage == "ir":
+        print_ir(ast, stats)
+        return lexer.ntokens
+    if stage == "run":
+        with _stage(stats, "run"):
+            executable = compile_program(ast, engine)
+        if saved:
+            with _stage(stats, "cache"):
+                cache.store_executable(key, load_engine(engine), executable, messages, lexer.ntokens)
+        run_executable(executable, stats)
+        return lexer.ntokens
+    with _stage(stats, "output"):
+        ast.show(buf=sys.stdout, showcoord=True)
+    return lexer.ntokens
+
+
+_cache = None
+_stats = None
+
+
+def _init_worker(stage, cache_options, stats_options=None):
+    global _cache, _stats, _count_tokens
+    _count_tokens = True
+    if stats_options is not None:
+        from uc_stats import Stats
+
+        _stats = Stats(*stats_options)
+    get_compiler(stage, _stats)
+    if cache_options is not None:
+        from uc_cache import CompilationCache
+
+        _cache = CompilationCache(*cache_options)
+
+
+def _compile_path(path, stage, engine="closures"):
+    """Compile the file path capturing its output, for the worker processes.
+    Returns the output, the number of tokens, the exit status, the hits
+    and misses of the cache and the report of the stats of the file."""
+    import contextlib
+    import io
+    import traceback
+
+    out = io.StringIO()
+    status = 0
+    counts = (_cache.hits, _cache.misses) if _cache is not None else (0, 0)
+    if _stats is not None:
+        _stats.reset()
+    with contextlib.redirect_stdout(out):
+        try:
+            with open(path, 'r') as f:
+                compile_file(f, stage, _cache, _stats, engine)
+        except SystemExit as e:
+            # semantic errors exit 1, a program run exits with its status
+            status = e.code if isinstance(e.code, int) else 1
+        except Exception:
+            traceback.print_exc(file=out)
+            status = 1
+    if _cache is not None:
+        counts = (_cache.hits - counts[0], _cache.misses - counts[1])
+    report = _stats.report() if _stats is not None else None
+    return out.getvalue(), get_compiler(stage, _stats)[0].ntokens, status, counts, report
+
+
+def find_sources(paths):
+    """The files in paths, with the directories replaced by the *.uc files
+    under them in sorted order."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                files.extend(os.path.join(dirpath, name) for name in sorted(filenames)
+                             if name.endswith(".uc"))
+        else:
+            files.append(path)
+    return files
+
+
+def compile_files(paths, stage="sema", jobs=None, cache_options=None, stats=None, engine="closures"):
+    """Compile the files in paths over a pool of jobs processes (default:
+    one per CPU). The output of each file is printed after a header line,
+    in the order of paths, and the throughput is reported on stderr, or
+    in stats when it is given.
+    cache_options are the arguments of the CompilationCache of the
+    workers, None to compile without a cache. The reports of the workers
+    are merged into the uc_stats.Stats stats. Returns the highest exit
+    status of the files."""
+    from concurrent.futures import ProcessPoolExecutor
+    from itertools import repeat
+
+    jobs = jobs or os.cpu_count() or 1
+    chunksize = max(1, len(paths) // (jobs * 4))
+    ntokens = status = hits = misses = 0
+    stats_options = (stats.profile, stats.memory) if stats is not None else None
+    start = time.perf_counter()
+    with ProcessPoolExecutor(jobs, initializer=_init_worker,
+                             initargs=(stage, cache_options, stats_options)) as executor:
+        results = executor.map(_compile_path, paths, repeat(stage), repeat(engine), chunksize=chunksize)
+        for path, (output, file_tokens, file_status, (file_hits, file_misses), report) in zip(paths, results):
+            sys.stdout.write("==> %s <==\n" % path)
+            sys.stdout.write(output)
+            if output and not output.endswith("\n"):
+                # a program may print without a final newline
+                sys.stdout.write("\n")
+            ntokens += file_tokens
+            status = max(status, file_status)
+            hits += file_hits
+            misses += file_misses
+            if report is not None:
+                stats.merge(report)
+    elapsed = time.perf_counter() - start
+    if stats is not None:
+        # stderr holds the JSON report alone
+        stats.throughput = {"files": len(paths), "tokens": ntokens, "wall": elapsed, "jobs": jobs}
+        if cache_options is not None:
+            stats.cache = (hits, misses)
+        return status
+    print("%d files, %d tokens in %.2f s: %.1f files/s, %.0f tokens/s (%d jobs)"
+          % (len(paths), ntokens, elapsed, len(paths) / elapsed, ntokens / elapsed, jobs),
+          file=sys.stderr)
+    if cache_options is not None:
+        print("cache: %d hits, %d misses" % (hits, misses), file=sys.stderr)
+    return status
+
+
+def main(args):
+    import argparse
+
+    argparser = argparse.ArgumentParser(prog="ucc", description="uC compiler")
+    group = argparser.add_mutually_exclusive_group()
+    for stage in STAGES:
+        group.add_argument("--" + stage, dest="stage", action="store_const", const=stage,
+                           help="run the checked program" if stage == "run" else "stop after the %s stage" % stage)
+    argparser.add_argument("--engine", choices=list(ENGINES), default="closures",
+                           help="engine running the programs of --run (default: closures)")
+    argparser.add_argument("-j", "--jobs", type=int, help="worker processes for several files")
+    argparser.add_argument("--cache", action="store_true",
+                           help="reuse the results of unchanged sources from the compilation cache")
+    argparser.add_argument("--cache-dir", help="directory of the compilation cache (implies --cache)")
+    argparser.add_argument("--cache-size", type=float, default=256,
+                           help="size limit of the compilation cache in MB (default: 256)")
+    argparser.add_argument("--stats", action="store_true",
+                           help="write a JSON report of the time and counters of the stages, the cache "
+                                "and the throughput to stderr")
+    argparser.add_argument("--stats-file", help="write the --stats report to this file instead")
+    argparser.add_argument("--profile", action="store_true",
+                           help="add the functions taking the most time to the --stats report")
+    argparser.add_argument("--trace-memory", action="store_true",
+                           help="add the peak memory of the stages and the largest allocations "
+                                "to the --stats report")
+    argparser.add_argument("files", nargs="*", help="uC source files or directories (default: stdin)")
+    args = argparser.parse_args(args)
+    stage = args.stage or "sema"
+
+    stats = None
+    if args.stats or args.stats_file or args.profile or args.trace_memory:
+        from uc_stats import Stats
+
+        stats = Stats(args.profile, args.trace_memory)
+
+    cache_options = cache = None
+    if args.cache or args.cache_dir:
+        from uc_cache import CompilationCache
+
+        cache_options = (args.cache_dir, int(args.cache_size * 1024 * 1024))
+        cache = CompilationCache(*cache_options)
+    try:
+        if not args.files:
+            compile_file(sys.stdin, stage, cache, stats, args.engine)
+        elif len(args.files) == 1 and not os.path.isdir(args.files[0]):
+            with open(args.files[0], 'r') as f:
+                compile_file(f, stage, cache, stats, args.engine)
+        else:
+            return compile_files(find_sources(args.files), stage, args.jobs, cache_options, stats,
+                                 args.engine)
+    finally:
+        if cache is not None:
+            if stats is not None and (cache.hits or cache.misses):
+                stats.cache = (cache.hits, cache.misses)
+            elif cache.hits or cache.misses:
+                print("cache: %d hits, %d misses" % (cache.hits, cache.misses), file=sys.stderr)
+            cache.evict()
+        if stats is not None:
+            if args.stats_file:
+                with open(args.stats_file, "w") as f:
+                    stats.write(f)
+            else:
+                stats.write(sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))